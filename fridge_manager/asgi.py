@@ -3,6 +3,12 @@ ASGI config for fridge_manager project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The notification stream (notifications:stream) is an async view - in production
+serve the project with an ASGI server, e.g. ``uvicorn fridge_manager.asgi:application``.
+Streaming report exports and downloads switch to async iterators for ASGI
+requests (fridge_manager.streaming), so they are sent chunk by chunk instead
+of being buffered in memory.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
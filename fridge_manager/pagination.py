@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+class InvalidCursor(ValueError):
+    pass
+
+class CursorPage:
+    """Strona wyników paginacji po kluczu - z kursorami do sąsiednich stron."""
+    def __init__(self, object_list, next_cursor, previous_cursor, paginator):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+class CursorPaginator:
+    """
+    Paginacja po kluczu (keyset): kolejna strona to warunek WHERE na wartościach
+    sortowania ostatniego wiersza zamiast OFFSET, więc strona tysięczna kosztuje
+    tyle co pierwsza i nie wymaga COUNT(*).
+
+    `ordering` to pola sortowania, np. ('expiry_date', 'id') lub ('-created_at', '-id');
+    ostatnie pole musi jednoznacznie wyznaczać wiersz, a pola nie mogą być NULL.
+    `estimate_cap` włącza szacowanie liczby wyników - COUNT ograniczony do tylu wierszy.
+    """
+    def __init__(self, queryset, ordering, per_page, estimate_cap=None):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.per_page = per_page
+        self.estimate_cap = estimate_cap
+
+    def encode_cursor(self, obj, direction):
+        values = [str(getattr(obj, field)) for field, descending in self.ordering]
+        raw = json.dumps([direction, values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('next', 'prev') or len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            model = self.queryset.model
+            return direction, [
+                model._meta.get_field(field).to_python(value)
+                for (field, descending), value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def _after(self, values, backwards=False):
+        """Warunek: wiersze za `values` w kolejności sortowania (lub przed nimi)."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def page(self, cursor=None):
+        if not cursor:
+            direction, queryset = 'next', self.queryset
+        else:
+            direction, values = self.decode_cursor(cursor)
+            backwards = direction == 'prev'
+            queryset = self.queryset.filter(self._after(values, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+
+        # Jeden wiersz więcej mówi, czy istnieje strona dalej w tym kierunku
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+            has_next, has_previous = bool(rows), has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor) and bool(rows)
+
+        return CursorPage(
+            rows,
+            self.encode_cursor(rows[-1], 'next') if has_next else None,
+            self.encode_cursor(rows[0], 'prev') if has_previous else None,
+            self,
+        )
+
+    def estimated_total(self):
+        """
+        (liczba, dokładna) - COUNT po najwyżej `estimate_cap` + 1 wierszach,
+        np. (1000, False) znaczy „ponad 1000”. None, gdy szacowanie wyłączone.
+        """
+        if self.estimate_cap is None:
+            return None
+        count = self.queryset[:self.estimate_cap + 1].count()
+        return min(count, self.estimate_cap), count <= self.estimate_cap
+
+class CursorPaginationMixin:
+    """
+    Paginacja po kluczu dla ListView: parametr ?cursor= zamiast ?page=.
+    Widok ustawia `paginate_by` i `cursor_ordering` (albo własny paginator
+    w get_cursor_paginator); w szablonie dostępne są
+    page_obj.next_cursor/previous_cursor, `pagination_query` (parametry adresu bez
+    kursora) i `estimated_total`, jeśli ustawiono `estimate_cap`.
+    """
+    cursor_ordering = None
+    estimate_cap = None
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(queryset, self.cursor_ordering, page_size, self.estimate_cap)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Nieprawidłowy kursor strony')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if context.get('paginator') is not None:
+            context['estimated_total'] = context['paginator'].estimated_total()
+        # Pozostałe parametry (filtry, wyszukiwanie) przechodzą do linków kolejnych stron
+        query = self.request.GET.copy()
+        query.pop('cursor', None)
+        context['pagination_query'] = query.urlencode()
+        return context
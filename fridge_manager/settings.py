@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'shopping_list.apps.ShoppingListConfig',
     'reports',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
@@ -165,6 +167,68 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:8000",
 ]
 
+# Cache: 'locmem' (domyślnie, osobny w każdym procesie) albo 'file'
+# (wspólny dla serwera i procesów run_jobs). Wersje danych raportów są w bazie
+# (ReportDataVersion), więc także osobne cache procesów nie zwracają nieaktualnych wyników.
+CACHE_BACKEND = os.environ.get('FRIDGE_CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fridge-manager',
+    } if CACHE_BACKEND == 'locmem' else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Wyniki raportów w cache (w sekundach); blokada chroni przed równoległym
+# liczeniem tej samej wartości przez wiele żądań
+REPORT_CACHE_TIMEOUT = 60 * 15
+REPORT_CACHE_LOCK_TIMEOUT = 10
+
+# Lokalna kolejka zadań (python manage.py run_jobs)
+JOBS_WORKER_PROCESSES = 2
+JOBS_RETENTION_DAYS = 7
+
+# Powiadomienia raportowe są liczone w tle, najwyżej raz na okno (w sekundach)
+REPORT_NOTIFICATIONS_DEBOUNCE_SECONDS = 60
+
+# Komenda sweep_notifications (cron) - liczba procesów roboczych
+NOTIFICATION_SWEEP_PROCESSES = 2
+
+# Przeczytane powiadomienia są archiwizowane i usuwane po tylu dniach
+# (python manage.py archive_notifications); '*' - pozostałe typy, None - bez limitu.
+# Użytkownik może nadpisać wartości w notification_preferences['retention_days'].
+NOTIFICATION_RETENTION_DAYS = {
+    'expiry': 30,
+    'low_stock': 14,
+    'wastage': 90,
+    'report': 90,
+    '*': 60,
+}
+NOTIFICATION_ARCHIVE_ROOT = BASE_DIR / 'archive' / 'notifications'
+
+# Komenda run_expiry_scheduler śpi do najbliższego progu, ale najwyżej tyle sekund
+EXPIRY_SCHEDULER_MAX_SLEEP = 60
+
+# Strumienie SSE procesu sprawdzają bazę (zmiany z innych procesów) jednym
+# zapytaniem co tyle sekund; bezczynny strumień wysyła komentarz podtrzymujący
+# połączenie co NOTIFICATION_STREAM_KEEPALIVE_SECONDS
+NOTIFICATION_STREAM_POLL_SECONDS = 15
+NOTIFICATION_STREAM_KEEPALIVE_SECONDS = 30
+
+# Generowanie PDF raportów: liczba procesów (0 - w procesie żądania),
+# limit czasu renderowania i czas życia gotowych plików w cache (w sekundach)
+REPORT_PDF_WORKERS = 2
+REPORT_PDF_TIMEOUT = 60
+REPORT_PDF_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Eksporty w tle są przechowywane w MEDIA_ROOT/exports przez tyle sekund
+REPORT_EXPORT_TTL = 60 * 60 * 24
+# Limit czasu PDF w eksporcie w tle - nikt nie czeka na odpowiedź, a duże
+# zakresy dat renderują się dłużej niż REPORT_PDF_TIMEOUT żądania
+REPORT_EXPORT_PDF_TIMEOUT = 60 * 15
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
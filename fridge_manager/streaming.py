@@ -0,0 +1,26 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_EXHAUSTED = object()
+
+async def _iter_in_thread(iterator):
+    # thread_sensitive=True - kolejne porcje (i zapytania ORM w generatorze)
+    # idą w tym samym wątku co reszta synchronicznego kodu żądania
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(iterator, _EXHAUSTED)
+        if chunk is _EXHAUSTED:
+            break
+        yield chunk
+
+def stream_for_request(request, response):
+    """
+    Pod ASGI Django czyta synchroniczny iterator StreamingHttpResponse przez
+    sync_to_async(list), czyli buforuje całą odpowiedź w pamięci, zanim wyśle
+    pierwszy bajt. Dla żądania ASGI podmienia więc treść na iterator
+    asynchroniczny, który pobiera porcje po jednej. Zamknięcie źródła (pliku,
+    generatora) zostaje w response.close(), jak pod WSGI.
+    """
+    if response.streaming and not response.is_async and isinstance(request, ASGIRequest):
+        response.streaming_content = _iter_in_thread(iter(response.streaming_content))
+    return response
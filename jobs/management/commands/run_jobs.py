@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from jobs.pool import init_worker_process
+from jobs.queue import claim_jobs, run_job, purge_finished_jobs, requeue_stale_jobs
+
+class Command(BaseCommand):
+    help = 'Przetwarza zadania z lokalnej kolejki w puli procesów.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=getattr(settings, 'JOBS_WORKER_PROCESSES', 2),
+            help='Liczba procesów roboczych (0 - wykonuj w bieżącym procesie)'
+        )
+        parser.add_argument('--batch-size', type=int, default=20, help='Liczba zadań pobieranych naraz')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Przerwa między sprawdzeniami kolejki (s)')
+        parser.add_argument('--once', action='store_true', help='Przetwórz zaległe zadania i zakończ')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        pool = None
+        if processes > 0:
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=processes, initializer=init_worker_process)
+        self.stdout.write(f'Uruchomiono obsługę kolejki (procesy: {processes or "w bieżącym procesie"}).')
+
+        retention = timedelta(days=getattr(settings, 'JOBS_RETENTION_DAYS', 7))
+        last_purge = None
+        try:
+            while True:
+                try:
+                    job_ids = claim_jobs(options['batch_size'])
+                    if job_ids:
+                        runner = pool.map if pool else map
+                        statuses = list(runner(run_job, job_ids))
+                        self.stdout.write(f'Przetworzono zadań: {len(job_ids)} ({", ".join(statuses)})')
+                        continue
+                except OperationalError as e:
+                    # Np. "database is locked" przy równoległym zapisie w SQLite - zadania,
+                    # które utkną w stanie 'running', przywróci requeue_stale_jobs
+                    self.stderr.write(f'Błąd bazy danych, ponowienie za chwilę: {e}')
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                # Kolejka pusta - raz na godzinę porządki: utknięte i stare zadania
+                if last_purge is None or time.monotonic() - last_purge > 3600:
+                    requeued = requeue_stale_jobs(timedelta(hours=1))
+                    if requeued:
+                        self.stdout.write(f'Przywrócono utkniętych zadań: {requeued}')
+                    purged = purge_finished_jobs(retention)
+                    last_purge = time.monotonic()
+                    if purged:
+                        self.stdout.write(f'Usunięto zakończonych zadań: {purged}')
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='claim_token',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils import timezone
+
+class Job(models.Model):
+    """Zadanie w lokalnej kolejce przetwarzanej przez komendę run_jobs."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Oczekujące'),
+        (RUNNING, 'W trakcie'),
+        (DONE, 'Zakończone'),
+        (FAILED, 'Błąd'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Zadania z tym samym kluczem są łączone, dopóki jedno z nich czeka
+    dedupe_key = models.CharField(max_length=200, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Znacznik procesu run_jobs, który przejął zadanie - przejęte są tylko wiersze z jego znacznikiem
+    claim_token = models.CharField(max_length=32, blank=True, null=True, editable=False)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_after']
+        verbose_name = 'Zadanie'
+        verbose_name_plural = 'Zadania'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_dedupe_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
@@ -0,0 +1,8 @@
+from django.db import connections
+
+def init_worker_process():
+    """Przygotowuje proces puli: Django i własne połączenia z bazą."""
+    import django
+    django.setup()
+    # Połączenia odziedziczone po procesie-rodzicu nie mogą być współdzielone
+    connections.close_all()
@@ -0,0 +1,121 @@
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+def task(name):
+    """
+    Rejestruje funkcję jako zadanie kolejki pod podaną nazwą.
+    Argumenty zadania przekazywane są jako słownik `payload` (musi dać się zapisać jako JSON).
+    """
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+def get_task(name):
+    return _registry[name]
+
+def enqueue(name, payload=None, delay=0, dedupe_key=None, max_attempts=3):
+    """
+    Dodaje zadanie do kolejki.
+
+    Jeśli podano `dedupe_key`, a zadanie z tym kluczem już czeka, nowe nie jest
+    dodawane - kolejne wywołania w oknie `delay` sekund dają jedno wykonanie.
+    Wstawienie z pominięciem konfliktu to jedno zapytanie INSERT.
+    Zwraca utworzone zadanie albo None dla zadań z `dedupe_key`.
+    """
+    job = Job(
+        name=name,
+        payload=payload or {},
+        run_after=timezone.now() + timedelta(seconds=delay),
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts,
+    )
+    if dedupe_key is None:
+        job.save()
+        return job
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+    return None
+
+def due_job_ids(limit):
+    """ID do `limit` zaległych zadań, od najstarszego terminu."""
+    due = Job.objects.filter(status=Job.PENDING, run_after__lte=timezone.now())
+    if connection.features.has_select_for_update_skip_locked:
+        due = due.select_for_update(skip_locked=True)
+    return list(due.order_by('run_after').values_list('pk', flat=True)[:limit])
+
+def claim_jobs(limit):
+    """
+    Oznacza do `limit` zaległych zadań jako przetwarzane i zwraca ID przejętych.
+    Bez SKIP LOCKED (SQLite) dwa procesy mogą wybrać te same zadania, więc UPDATE
+    sprawdza ponownie status, a zwracane są tylko wiersze z własnym znacznikiem.
+    """
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        job_ids = due_job_ids(limit)
+        Job.objects.filter(pk__in=job_ids, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+            claim_token=token,
+        )
+    claimed = set(Job.objects.filter(pk__in=job_ids, claim_token=token).values_list('pk', flat=True))
+    return [pk for pk in job_ids if pk in claimed]
+
+def run_job(job_id):
+    """
+    Wykonuje jedno zadanie. Nieudane zadania wracają do kolejki z rosnącym
+    opóźnieniem, aż wyczerpią `max_attempts`. Zwraca końcowy status.
+    """
+    job = Job.objects.get(pk=job_id)
+    try:
+        get_task(job.name)(**job.payload)
+    except Exception:
+        logger.exception('Zadanie %s (%s) zakończone błędem', job.pk, job.name)
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** job.attempts)
+            try:
+                with transaction.atomic():
+                    job.save(update_fields=['status', 'run_after', 'error'])
+                return job.status
+            except IntegrityError:
+                # W kolejce czeka już nowsze zadanie z tym samym dedupe_key
+                pass
+        job.status = Job.FAILED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return job.status
+
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now(), error='')
+    return Job.DONE
+
+def purge_finished_jobs(older_than):
+    """Usuwa zakończone zadania starsze niż `older_than` (timedelta)."""
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        finished_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
+
+def requeue_stale_jobs(older_than):
+    """
+    Przywraca do kolejki zadania, które utknęły w stanie 'running' (np. po awarii
+    procesu). Zadania zastąpione przez nowsze z tym samym dedupe_key są oznaczane jako błąd.
+    """
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=timezone.now() - older_than)
+    superseded = stale.filter(
+        dedupe_key__in=Job.objects.filter(status=Job.PENDING, dedupe_key__isnull=False).values('dedupe_key')
+    )
+    superseded.update(status=Job.FAILED, finished_at=timezone.now(), error='Zastąpione nowszym zadaniem')
+    return stale.update(status=Job.PENDING, run_after=timezone.now())
@@ -0,0 +1,141 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from notifications.models import Notification
+from products.models import Product, Category
+from shopping_list.models import ShoppingList
+from reports.models import ShoppingExpense
+from .models import Job
+from .queue import task, enqueue, claim_jobs, run_job
+
+User = get_user_model()
+
+calls = []
+
+@task('jobs.tests.record')
+def record_task(value):
+    calls.append(value)
+
+@task('jobs.tests.fail')
+def failing_task():
+    raise ValueError('błąd')
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Zadanie jest wykonywane z zapisanymi argumentami"""
+        job = enqueue('jobs.tests.record', payload={'value': 7})
+        self.assertEqual(claim_jobs(10), [job.pk])
+        self.assertEqual(run_job(job.pk), Job.DONE)
+        self.assertEqual(calls, [7])
+
+    def test_delayed_job_is_not_claimed_early(self):
+        """Zadanie z opóźnieniem czeka na swój termin"""
+        enqueue('jobs.tests.record', payload={'value': 1}, delay=60)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_dedupe_key_coalesces_pending_jobs(self):
+        """Zadania z tym samym kluczem są łączone, dopóki czekają"""
+        for value in range(3):
+            enqueue('jobs.tests.record', payload={'value': value}, dedupe_key='klucz')
+        self.assertEqual(Job.objects.filter(dedupe_key='klucz').count(), 1)
+
+        job_ids = claim_jobs(10)
+        enqueue('jobs.tests.record', payload={'value': 9}, dedupe_key='klucz')
+        self.assertEqual(Job.objects.filter(dedupe_key='klucz').count(), 2)
+        run_job(job_ids[0])
+        self.assertEqual(calls, [0])
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        """Nieudane zadanie wraca do kolejki aż do wyczerpania prób"""
+        job = enqueue('jobs.tests.fail', max_attempts=2)
+        claim_jobs(10)
+        self.assertEqual(run_job(job.pk), Job.PENDING)
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        claim_jobs(10)
+        self.assertEqual(run_job(job.pk), Job.FAILED)
+        self.assertIn('ValueError', Job.objects.get(pk=job.pk).error)
+
+    def test_job_claimed_by_another_worker_is_skipped(self):
+        """Bez SKIP LOCKED wybrane zadanie mogło już zostać przejęte - wykonywane są tylko własne"""
+        taken = enqueue('jobs.tests.record', payload={'value': 1})
+        free = enqueue('jobs.tests.record', payload={'value': 2})
+        Job.objects.filter(pk=taken.pk).update(status=Job.RUNNING, claim_token='inny')
+        with mock.patch('jobs.queue.due_job_ids', return_value=[taken.pk, free.pk]):
+            self.assertEqual(claim_jobs(10), [free.pk])
+        self.assertEqual(Job.objects.get(pk=taken.pk).claim_token, 'inny')
+
+    def test_worker_survives_locked_database(self):
+        """Błąd "database is locked" nie kończy pracy run_jobs"""
+        enqueue('jobs.tests.record', payload={'value': 3})
+        attempts = []
+
+        def flaky_claim(limit):
+            attempts.append(limit)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return claim_jobs(limit)
+
+        with mock.patch('jobs.management.commands.run_jobs.claim_jobs', flaky_claim):
+            call_command('run_jobs', processes=0, once=True, poll_interval=0, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(calls, [3])
+
+class ReportNotificationJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_dashboard_only_enqueues_debounced_job(self):
+        """Dashboard nie liczy powiadomień, tylko zleca jedno zadanie na użytkownika"""
+        for _ in range(3):
+            self.client.get(reverse('reports:dashboard'))
+        jobs = Job.objects.filter(name='reports.generate_report_notifications')
+        self.assertEqual(jobs.count(), 1)
+        self.assertEqual(jobs.get().payload, {'user_id': self.user.pk})
+        self.assertGreater(jobs.get().run_after, timezone.now())
+
+    def test_dashboard_refresh_does_not_write(self):
+        """Kolejne odświeżenia w oknie łączenia nie wykonują INSERT do kolejki"""
+        self.client.get(reverse('reports:dashboard'))
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('reports:dashboard'))
+        self.assertFalse([query for query in context.captured_queries if 'jobs_job' in query['sql']])
+
+    @override_settings(REPORT_NOTIFICATIONS_DEBOUNCE_SECONDS=0)
+    def test_worker_generates_report_notifications(self):
+        """Komenda run_jobs wykonuje zleconą kontrolę progów"""
+        category = Category.objects.create(name='Nabiał')
+        Product.objects.create(
+            name='Mleko', category=category, expiry_date=timezone.localdate() + timedelta(days=5),
+            quantity=2, unit='l', user=self.user
+        )
+        ShoppingExpense.objects.create(
+            user=self.user,
+            shopping_list=ShoppingList.objects.create(name='Zakupy', user=self.user),
+            total_amount=Decimal('1500.00'),
+            shopping_date=timezone.localdate()
+        )
+        self.client.get(reverse('reports:dashboard'))
+        self.assertFalse(Notification.objects.filter(user=self.user, notification_type='budget').exists())
+
+        call_command('run_jobs', processes=0, once=True, stdout=StringIO())
+
+        self.assertTrue(Notification.objects.filter(user=self.user, notification_type='budget').exists())
+        self.assertEqual(Job.objects.get().status, Job.DONE)
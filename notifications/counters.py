@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+def _publish(user_ids):
+    """Budzi strumienie SSE użytkowników po zatwierdzeniu transakcji."""
+    from .stream import broker
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: [broker.publish(user_id) for user_id in user_ids])
+
+def database_unread_count(user_id):
+    """Liczba nieprzeczytanych policzona w bazie, z pominięciem licznika."""
+    from .models import Notification
+    return Notification.objects.filter(user_id=user_id, read=False).count()
+
+def _create_counter(user_id):
+    """
+    Tworzy brakujący licznik z wartością z bazy (w transakcji wywołującego, więc
+    z jego własnymi zmianami). Jeśli w międzyczasie utworzył go inny proces,
+    wygrywa tamten - ewentualną różnicę poprawi reconcile_unread_counts.
+    """
+    from .models import UnreadNotificationCounter
+    count = database_unread_count(user_id)
+    UnreadNotificationCounter.objects.bulk_create(
+        [UnreadNotificationCounter(user_id=user_id, count=count)], ignore_conflicts=True
+    )
+    return count
+
+def unread_count(user_id):
+    """
+    Liczba nieprzeczytanych powiadomień użytkownika - odczyt jednego wiersza
+    licznika po kluczu głównym; COUNT w bazie tylko przy pierwszym odczycie.
+    """
+    from .models import UnreadNotificationCounter
+    count = UnreadNotificationCounter.objects.filter(user_id=user_id).values_list('count', flat=True).first()
+    if count is None:
+        count = _create_counter(user_id)
+    return max(count, 0)
+
+def change_unread_count(user_id, delta):
+    """Zmienia licznik atomowo (UPDATE z F()) w bieżącej transakcji."""
+    from .models import UnreadNotificationCounter
+    if not UnreadNotificationCounter.objects.filter(user_id=user_id).update(count=F('count') + delta):
+        _create_counter(user_id)
+    _publish([user_id])
+
+def _unread_subquery():
+    from .models import Notification
+    return Coalesce(Subquery(
+        Notification.objects.filter(user=OuterRef('user'), read=False).order_by()
+        .values('user').annotate(count=Count('pk')).values('count')
+    ), 0)
+
+def recount_unread_counts(user_ids):
+    """
+    Liczy liczniki od nowa jednym UPDATE z podzapytaniem, gdy nie wiadomo,
+    ile wierszy przybyło (bulk_create z ignore_conflicts) lub ubyło.
+    """
+    from .models import UnreadNotificationCounter
+    user_ids = set(user_ids)
+    UnreadNotificationCounter.objects.filter(user_id__in=user_ids).update(count=_unread_subquery())
+    _publish(user_ids)
+
+def reconcile_unread_counts(user_ids):
+    """
+    Porównuje liczniki z bazą (jedno zapytanie grupujące) i poprawia rozbieżne,
+    tworząc też brakujące. Zwraca listę (user_id, licznik albo None, wartość z bazy).
+    """
+    from .models import Notification, UnreadNotificationCounter
+    user_ids = list(user_ids)
+    actual = dict(
+        Notification.objects.filter(user_id__in=user_ids, read=False)
+        .values_list('user_id').annotate(count=Count('id')).order_by()
+    )
+    stored = dict(UnreadNotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'count'))
+    fixed = [
+        (user_id, stored.get(user_id), actual.get(user_id, 0))
+        for user_id in user_ids if stored.get(user_id) != actual.get(user_id, 0)
+    ]
+    if fixed:
+        with transaction.atomic():
+            UnreadNotificationCounter.objects.bulk_create(
+                [UnreadNotificationCounter(user_id=user_id) for user_id, current, expected in fixed if current is None],
+                ignore_conflicts=True,
+            )
+            recount_unread_counts(user_id for user_id, current, expected in fixed)
+    return fixed
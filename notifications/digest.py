@@ -0,0 +1,170 @@
+from datetime import timedelta
+from itertools import groupby
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from jobs.queue import enqueue
+from .counters import recount_unread_counts
+from .models import Notification, NotificationEvent
+
+# Preferencje w CustomUser.notification_preferences:
+#     {"digest": {"expiry": "day", "low_stock": "hour"}, "digest_email": true}
+# Typy bez wpisu w "digest" trafiają do użytkownika od razu.
+DIGEST_PERIODS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+# Tyle zdarzeń trafia do treści powiadomienia; payload zawiera wszystkie
+DIGEST_MESSAGE_ITEMS = 5
+
+def period_start(period, moment):
+    """Początek godziny lub doby (czas lokalny), w której wypada `moment`."""
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if period == 'day' else moment
+
+def digest_preferences(user_ids):
+    """{user_id: {typ: okres}} dla użytkowników, którzy włączyli podsumowania."""
+    users = get_user_model().objects.filter(pk__in=user_ids, notification_preferences__has_key='digest')
+    preferences = {}
+    for user_id, user_preferences in users.values_list('pk', 'notification_preferences'):
+        digest = user_preferences.get('digest')
+        if isinstance(digest, dict):
+            preferences[user_id] = {
+                notification_type: period for notification_type, period in digest.items()
+                if period in DIGEST_PERIODS
+            }
+    return preferences
+
+def split_digest_notifications(notifications):
+    """
+    Dzieli powiadomienia na te do zapisania od razu i zdarzenia (NotificationEvent)
+    do podsumowania, wg preferencji użytkowników. Jedno zapytanie o preferencje.
+    """
+    preferences = digest_preferences({notification.user_id for notification in notifications})
+    if not preferences:
+        return notifications, []
+    immediate, events = [], []
+    for notification in notifications:
+        period = preferences.get(notification.user_id, {}).get(notification.notification_type)
+        if period is None:
+            immediate.append(notification)
+            continue
+        events.append(NotificationEvent(
+            user_id=notification.user_id,
+            notification_type=notification.notification_type,
+            title=notification.title,
+            message=notification.message,
+            link=notification.link,
+            product_id=notification.product_id,
+            dedupe_key=notification.dedupe_key,
+            period=period,
+        ))
+    return immediate, events
+
+def save_events(events):
+    """Zapisuje zdarzenia (bez duplikatów kluczy) i planuje dostarczenie podsumowań."""
+    NotificationEvent.objects.bulk_create(events, ignore_conflicts=True)
+    schedule_digest_delivery()
+
+def schedule_digest_delivery(now=None):
+    """Dostarczanie rusza z początkiem kolejnej godziny; w kolejce czeka najwyżej jedno."""
+    now = now or timezone.now()
+    next_hour = period_start('hour', now) + DIGEST_PERIODS['hour']
+    enqueue('notifications.deliver_digests', delay=(next_hour - now).total_seconds(), dedupe_key='notification-digests')
+
+def _digest_notification(user_id, notification_type, period, start, events):
+    from .services import notification_key
+    label = dict(Notification.NOTIFICATION_TYPES).get(notification_type, notification_type)
+    titles = [event.title for event in events[:DIGEST_MESSAGE_ITEMS]]
+    if len(events) > DIGEST_MESSAGE_ITEMS:
+        titles.append(f'i {len(events) - DIGEST_MESSAGE_ITEMS} więcej')
+    return Notification(
+        user_id=user_id,
+        notification_type=notification_type,
+        title=f'{label}: {len(events)} nowych powiadomień',
+        message='; '.join(titles),
+        link=reverse('notifications:list'),
+        payload={
+            'digest': period,
+            'period_start': start.isoformat(),
+            'count': len(events),
+            'items': [
+                {
+                    'title': event.title,
+                    'message': event.message,
+                    'link': event.link,
+                    'product_id': event.product_id,
+                    'created_at': event.created_at.isoformat(),
+                }
+                for event in events
+            ],
+        },
+        dedupe_key=notification_key('digest', notification_type, f'{period}:{start.isoformat()}'),
+    )
+
+def deliver_digests(now=None, batch_size=500):
+    """
+    Składa zdarzenia z zakończonych okresów w jedno powiadomienie na użytkownika,
+    typ i okres, a użytkownikom z "digest_email" wysyła je e-mailem - wszystkie
+    wiadomości jednym połączeniem SMTP. Zwraca {'digests', 'events', 'emails'}.
+    """
+    now = now or timezone.now()
+    ready = NotificationEvent.objects.filter(digest__isnull=True).filter(
+        Q(period='hour', created_at__lt=period_start('hour', now))
+        | Q(period='day', created_at__lt=period_start('day', now))
+    ).order_by('user_id', 'notification_type', 'period', 'created_at')
+
+    def group_key(event):
+        return event.user_id, event.notification_type, event.period, period_start(event.period, event.created_at)
+
+    digests = []
+    stats = {'digests': 0, 'events': 0, 'emails': 0}
+    groups = groupby(ready.iterator(), key=group_key)
+    while True:
+        batch = []
+        for (user_id, notification_type, period, start), events in groups:
+            events = list(events)
+            batch.append((_digest_notification(user_id, notification_type, period, start, events), events))
+            if len(batch) >= batch_size:
+                break
+        if not batch:
+            break
+        with transaction.atomic():
+            Notification.objects.bulk_create([digest for digest, events in batch])
+            for digest, events in batch:
+                NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(digest=digest)
+        digests += [digest for digest, events in batch]
+        stats['digests'] += len(batch)
+        stats['events'] += sum(len(events) for digest, events in batch)
+
+    recount_unread_counts({digest.user_id for digest in digests})
+    stats['emails'] = send_digest_emails(digests)
+    if NotificationEvent.objects.filter(digest__isnull=True).exists():
+        schedule_digest_delivery(now)
+    return stats
+
+def send_digest_emails(digests):
+    """Jeden e-mail na użytkownika; całą partię wysyła jedno połączenie backendu poczty."""
+    digests_by_user = {}
+    for digest in digests:
+        digests_by_user.setdefault(digest.user_id, []).append(digest)
+    recipients = get_user_model().objects.filter(
+        pk__in=list(digests_by_user), notification_preferences__digest_email=True
+    ).exclude(email='')
+    messages = [
+        EmailMessage(
+            subject='Podsumowanie powiadomień',
+            body='\n\n'.join(
+                f'{digest.title}\n{digest.message}' for digest in digests_by_user[user.pk]
+            ),
+            to=[user.email],
+        )
+        for user in recipients
+    ]
+    if not messages:
+        return 0
+    with get_connection() as connection:
+        return connection.send_messages(messages) or 0
@@ -0,0 +1,45 @@
+from fridge_manager.pagination import CursorPaginator, InvalidCursor
+from .models import Notification
+
+FEED_PAGE_SIZE = 10
+FEED_MAX_PAGE_SIZE = 50
+# Od najnowszych; id rozstrzyga powiadomienia z tym samym czasem
+NOTIFICATION_ORDERING = ('-created_at', '-id')
+
+def feed_page(user, cursor=None, limit=FEED_PAGE_SIZE):
+    """
+    Strona powiadomień od najnowszych. Paginacja po kluczu (created_at, id)
+    zamiast OFFSET - koszt nie rośnie z numerem strony, a nowe powiadomienia
+    nie przesuwają wyników między stronami. Zwraca CursorPage.
+    """
+    notifications = Notification.objects.filter(user=user).with_targets()
+    return CursorPaginator(notifications, NOTIFICATION_ORDERING, limit).page(cursor)
+
+def serialize_notification(notification):
+    """
+    Pola potrzebne liście w menu powiadomień (i zdarzeniom SSE).
+    Zapytanie powinno używać Notification.objects.with_targets().
+    """
+    return {
+        'id': notification.pk,
+        'type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'link': notification.link,
+        'read': notification.read,
+        'created_at': notification.created_at,
+        'payload': notification.payload,
+        'product': {
+            'id': notification.product.pk,
+            'name': notification.product.name,
+        } if notification.product else None,
+        'category': {
+            'id': notification.category.pk,
+            'name': notification.category.name,
+        } if notification.category else None,
+        'target': {
+            'type': notification.content_object._meta.label_lower,
+            'id': notification.content_object.pk,
+            'label': str(notification.content_object),
+        } if notification.content_object else None,
+    }
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from notifications.retention import archive_notifications, expired_notifications
+
+class Command(BaseCommand):
+    help = 'Archiwizuje i usuwa przeczytane powiadomienia starsze niż pozwala polityka przechowywania.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Liczba powiadomień na jedną porcję')
+        parser.add_argument('--no-archive', action='store_true', help='Usuń powiadomienia bez zapisu do archiwum')
+        parser.add_argument('--dry-run', action='store_true', help='Tylko policz powiadomienia do usunięcia')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'Powiadomień do usunięcia: {expired_notifications().count()}')
+            return
+
+        stats = archive_notifications(batch_size=options['batch_size'], archive=not options['no_archive'])
+        if stats['path'] and stats['rows']:
+            self.stdout.write(f"Archiwum: {stats['path']} (+{stats['archived_bytes']} B)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Usunięto powiadomień: {stats['rows']}, odzyskano ok. {stats['bytes']} B danych"
+        ))
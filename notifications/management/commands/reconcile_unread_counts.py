@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from notifications.counters import reconcile_unread_counts
+
+class Command(BaseCommand):
+    help = 'Porównuje liczniki nieprzeczytanych powiadomień z bazą i poprawia rozbieżności.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Liczba użytkowników na jedno zapytanie')
+
+    def handle(self, *args, **options):
+        user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        batch, fixed = [], []
+        for user_id in user_ids.iterator():
+            batch.append(user_id)
+            if len(batch) >= options['batch_size']:
+                fixed += reconcile_unread_counts(batch)
+                batch = []
+        if batch:
+            fixed += reconcile_unread_counts(batch)
+
+        for user_id, stored, actual in fixed:
+            self.stdout.write(f"Użytkownik {user_id}: {'brak' if stored is None else stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f'Poprawiono liczników: {len(fixed)}'))
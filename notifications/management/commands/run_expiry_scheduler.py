@@ -0,0 +1,39 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from notifications.scheduler import next_due_at, process_due, rebuild_expiry_schedule
+
+class Command(BaseCommand):
+    help = 'Wysyła powiadomienia o ważności produktów w chwili przekroczenia progów (7 dni, 1 dzień, po terminie).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Liczba progów obsługiwanych naraz')
+        parser.add_argument(
+            '--max-sleep', type=float, default=getattr(settings, 'EXPIRY_SCHEDULER_MAX_SLEEP', 60),
+            help='Najdłuższa przerwa (s) - po niej komenda zauważa terminy dodane przez inne procesy'
+        )
+        parser.add_argument('--rebuild', action='store_true', help='Najpierw zaplanuj progi dla wszystkich aktywnych produktów')
+        parser.add_argument('--once', action='store_true', help='Obsłuż zaległe progi i zakończ')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write(f'Zaplanowano produktów: {rebuild_expiry_schedule()}')
+
+        try:
+            while True:
+                processed = process_due(batch_size=options['batch_size'])
+                if processed:
+                    self.stdout.write(f'Obsłużono progów: {processed}')
+                if processed == options['batch_size']:
+                    continue
+                if options['once']:
+                    break
+                # Śpi do najbliższego terminu, ale nie dłużej niż --max-sleep
+                next_due = next_due_at()
+                delay = options['max_sleep']
+                if next_due is not None:
+                    delay = min(max((next_due - timezone.now()).total_seconds(), 0), delay)
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+from jobs.pool import init_worker_process
+from notifications.services import NOTIFICATION_RULES, sweep_notifications
+
+class Command(BaseCommand):
+    help = 'Generuje powiadomienia dla wszystkich użytkowników (do uruchamiania z crona).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=getattr(settings, 'NOTIFICATION_SWEEP_PROCESSES', 2),
+            help='Liczba procesów roboczych (0 - wykonuj w bieżącym procesie)'
+        )
+        parser.add_argument('--shard-size', type=int, default=500, help='Szerokość zakresu ID użytkowników na jeden fragment')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Liczba powiadomień na jeden INSERT')
+
+    def handle(self, *args, **options):
+        bounds = get_user_model().objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('Brak użytkowników.')
+            return
+
+        shard_size = options['shard_size']
+        shards = [
+            (first, min(first + shard_size - 1, bounds['last']))
+            for first in range(bounds['first'], bounds['last'] + 1, shard_size)
+        ]
+        totals = {name: [0.0, 0] for name in NOTIFICATION_RULES}
+        started = time.perf_counter()
+
+        processes = options['processes']
+        if processes > 0:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=processes, initializer=init_worker_process) as pool:
+                futures = {
+                    pool.submit(sweep_notifications, first, last, options['batch_size']): (first, last)
+                    for first, last in shards
+                }
+                results = ((futures[future], future.result()) for future in as_completed(futures))
+                self._collect(results, len(shards), totals)
+        else:
+            results = (
+                ((first, last), sweep_notifications(first, last, options['batch_size']))
+                for first, last in shards
+            )
+            self._collect(results, len(shards), totals)
+
+        for name, (seconds, written) in totals.items():
+            self.stdout.write(f'{name}: {written} powiadomień, {seconds:.2f} s')
+        written = sum(written for seconds, written in totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Zapisano powiadomień: {written} w {time.perf_counter() - started:.2f} s.'
+        ))
+
+    def _collect(self, results, shard_count, totals):
+        for done, ((first, last), stats) in enumerate(results, start=1):
+            for name, (seconds, written) in stats.items():
+                totals[name][0] += seconds
+                totals[name][1] += written
+            written = sum(written for seconds, written in stats.values())
+            self.stdout.write(f'[{done}/{shard_count}] użytkownicy {first}-{last}: {written} powiadomień')
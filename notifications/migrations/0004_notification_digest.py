@@ -0,0 +1,48 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_dedupe_key'),
+        ('products', '0004_product_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('link', models.CharField(blank=True, max_length=200, null=True)),
+                ('dedupe_key', models.CharField(blank=True, max_length=200, null=True)),
+                ('period', models.CharField(choices=[('hour', 'Co godzinę'), ('day', 'Codziennie')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('digest', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='notifications.notification')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie powiadomienia',
+                'verbose_name_plural': 'Zdarzenia powiadomień',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('digest__isnull', True)), fields=['created_at'], name='notification_event_pending_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationevent',
+            constraint=models.UniqueConstraint(fields=('user', 'dedupe_key'), name='unique_notification_event_dedupe_key'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 07:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_digest'),
+        ('products', '0004_product_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySchedule',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='expiry_schedule', serialize=False, to='products.product')),
+                ('threshold', models.CharField(choices=[('week', '7 dni do końca ważności'), ('day', '1 dzień do końca ważności'), ('expired', 'Przeterminowany')], max_length=10)),
+                ('due_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Termin progu ważności',
+                'verbose_name_plural': 'Terminy progów ważności',
+                'ordering': ['due_at'],
+                'indexes': [models.Index(fields=['due_at'], name='expiry_schedule_due_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,26 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+
+class NotificationQuerySet(models.QuerySet):
+    def with_targets(self):
+        """
+        Dołącza produkt, kategorię i obiekt powiązany (content_object) bez zapytań
+        na każdy wiersz: produkt i kategoria przez JOIN, obiekty powiązane - jedno
+        zapytanie na typ obiektu. Typy zawartości pochodzą z pamięci podręcznej
+        ContentType, więc nie kosztują zapytań.
+        """
+        from products.models import Product
+        from shopping_list.models import ShoppingList
+        return self.select_related('product', 'category').prefetch_related(
+            GenericPrefetch('content_object', [
+                Product.objects.all(),
+                # __str__ listy zakupów używa nazwy użytkownika
+                ShoppingList.objects.select_related('user'),
+            ])
+        )
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
@@ -26,14 +45,127 @@ class Notification(models.Model):
     object_id = models.PositiveIntegerField(null=True, blank=True)
     content_object = GenericForeignKey('content_type', 'object_id')
 
+    # Naturalny klucz (typ:obiekt:okres) - to samo powiadomienie nie powstaje
+    # dwa razy dla użytkownika, patrz services.notification_key
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+
+    # Dane strukturalne, np. lista zdarzeń podsumowania (patrz digest.py)
+    payload = models.JSONField(null=True, blank=True)
+
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # Licznik i oznaczanie nieprzeczytanych dotyczy niewielkiej części wierszy
+            models.Index(fields=['user', '-created_at'], condition=models.Q(read=False), name='notification_unread_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dedupe_key'], name='unique_notification_dedupe_key'),
+        ]
         verbose_name = 'Powiadomienie'
         verbose_name_plural = 'Powiadomienia'
 
     def __str__(self):
         return f"{self.get_notification_type_display()} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        # Licznik nieprzeczytanych (sygnał post_save) zmienia się w tej samej transakcji
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
     def mark_as_read(self):
+        from .counters import change_unread_count
+        # Warunek w UPDATE gwarantuje, że licznik zmniejszy tylko jedno z równoległych wywołań
+        with transaction.atomic():
+            if Notification.objects.filter(pk=self.pk, read=False).update(read=True):
+                change_unread_count(self.user_id, -1)
         self.read = True
-        self.save() 
\ No newline at end of file
+
+class NotificationEvent(models.Model):
+    """
+    Zdarzenie czekające na podsumowanie (tryb digest). Po dostarczeniu zostaje
+    powiązane z powiadomieniem-podsumowaniem i jest usuwane razem z nim,
+    więc klucz dedupe_key nie pozwala zgłosić tego samego zdarzenia ponownie.
+    """
+    PERIODS = [
+        ('hour', 'Co godzinę'),
+        ('day', 'Codziennie'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_events')
+    notification_type = models.CharField(max_length=20)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    link = models.CharField(max_length=200, blank=True, null=True)
+    product = models.ForeignKey('products.Product', on_delete=models.SET_NULL, null=True, blank=True)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    period = models.CharField(max_length=10, choices=PERIODS)
+    created_at = models.DateTimeField(auto_now_add=True)
+    digest = models.ForeignKey(Notification, on_delete=models.CASCADE, null=True, blank=True, related_name='events')
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # Dostarczanie przegląda tylko zdarzenia bez podsumowania
+            models.Index(fields=['created_at'], condition=models.Q(digest__isnull=True), name='notification_event_pending_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dedupe_key'], name='unique_notification_event_dedupe_key'),
+        ]
+        verbose_name = 'Zdarzenie powiadomienia'
+        verbose_name_plural = 'Zdarzenia powiadomień'
+
+    def __str__(self):
+        return f"{self.notification_type} - {self.title}"
+
+class ExpirySchedule(models.Model):
+    """
+    Kolejka priorytetowa progów ważności: jeden wiersz na aktywny produkt
+    z terminem najbliższego progu (7 dni, 1 dzień, przeterminowanie).
+    Obsługuje ją komenda run_expiry_scheduler, patrz scheduler.py.
+    """
+    WEEK = 'week'
+    DAY = 'day'
+    EXPIRED = 'expired'
+    THRESHOLDS = [
+        (WEEK, '7 dni do końca ważności'),
+        (DAY, '1 dzień do końca ważności'),
+        (EXPIRED, 'Przeterminowany'),
+    ]
+
+    product = models.OneToOneField('products.Product', on_delete=models.CASCADE, primary_key=True, related_name='expiry_schedule')
+    threshold = models.CharField(max_length=10, choices=THRESHOLDS)
+    due_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['due_at']
+        indexes = [
+            models.Index(fields=['due_at'], name='expiry_schedule_due_idx'),
+        ]
+        verbose_name = 'Termin progu ważności'
+        verbose_name_plural = 'Terminy progów ważności'
+
+    def __str__(self):
+        return f"{self.product_id} - {self.threshold} ({self.due_at})"
+
+class UnreadNotificationCounter(models.Model):
+    """
+    Liczba nieprzeczytanych powiadomień użytkownika (patrz counters.py).
+    Zmieniana przez F() w tej samej transakcji co powiadomienia, więc wspólna
+    dla wszystkich procesów; rozbieżności poprawia reconcile_unread_counts.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Licznik nieprzeczytanych powiadomień'
+        verbose_name_plural = 'Liczniki nieprzeczytanych powiadomień'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count}"
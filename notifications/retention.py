@@ -0,0 +1,116 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Notification
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'notification_type', 'title', 'message', 'created_at', 'read',
+    'link', 'product_id', 'category_id', 'content_type_id', 'object_id', 'dedupe_key', 'payload',
+)
+
+def retention_policy(user_preferences=None):
+    """
+    Czas przechowywania przeczytanych powiadomień w dniach, wg typu.
+    Domyślne wartości z NOTIFICATION_RETENTION_DAYS (klucz '*' dla pozostałych typów)
+    użytkownik może nadpisać w notification_preferences:
+        {"retention_days": {"expiry": 7, "report": null}}
+    None oznacza przechowywanie bez limitu. Niepoprawne wartości są pomijane.
+    """
+    policy = dict(settings.NOTIFICATION_RETENTION_DAYS)
+    overrides = (user_preferences or {}).get('retention_days')
+    if isinstance(overrides, dict):
+        for notification_type, days in overrides.items():
+            if days is None or (isinstance(days, int) and not isinstance(days, bool) and days > 0):
+                policy[notification_type] = days
+    return policy
+
+def _policy_condition(policy, now):
+    """Warunek na powiadomienia starsze niż pozwala polityka."""
+    condition = Q(pk__in=[])
+    for notification_type, days in policy.items():
+        if notification_type == '*' or days is None:
+            continue
+        condition |= Q(notification_type=notification_type, created_at__lt=now - timedelta(days=days))
+    if policy.get('*') is not None:
+        other_types = [notification_type for notification_type in policy if notification_type != '*']
+        condition |= ~Q(notification_type__in=other_types) & Q(created_at__lt=now - timedelta(days=policy['*']))
+    return condition
+
+def expired_notifications(now=None):
+    """
+    Przeczytane powiadomienia po terminie przechowywania. Użytkownicy są grupowani
+    wg polityki - każda różna polityka to jeden warunek user__in, więc rozmiar
+    zapytania zależy od liczby różnych ustawień, a nie od liczby użytkowników.
+    """
+    now = now or timezone.now()
+    default = retention_policy()
+    groups = defaultdict(list)
+    for user_id, preferences in get_user_model().objects.filter(
+        notification_preferences__has_key='retention_days'
+    ).values_list('pk', 'notification_preferences'):
+        policy = retention_policy(preferences)
+        if policy != default:
+            groups[tuple(sorted(policy.items()))].append(user_id)
+
+    custom_users = [user_id for user_ids in groups.values() for user_id in user_ids]
+    condition = ~Q(user__in=custom_users) & _policy_condition(default, now)
+    for policy, user_ids in groups.items():
+        condition |= Q(user__in=user_ids) & _policy_condition(dict(policy), now)
+    return Notification.objects.filter(condition, read=True)
+
+def archive_path(now=None):
+    now = now or timezone.now()
+    return os.path.join(settings.NOTIFICATION_ARCHIVE_ROOT, f'notifications-{now:%Y%m%d}.jsonl.gz')
+
+def archive_notifications(batch_size=1000, archive=True, now=None):
+    """
+    Przenosi przeczytane powiadomienia po terminie do pliku JSON Lines (gzip),
+    porcjami po `batch_size`. Każda porcja jest najpierw dopisywana do archiwum
+    (osobny człon gzip, zapis wymuszony fsync), a potem usuwana w krótkiej
+    transakcji - nie ma długich blokad, a przerwanie nie gubi danych.
+    Zwraca {'rows', 'bytes', 'archived_bytes', 'path'}: liczbę usuniętych wierszy,
+    rozmiar ich danych w JSON oraz przyrost pliku archiwum.
+    """
+    now = now or timezone.now()
+    expired = expired_notifications(now).order_by('pk')
+    path = archive_path(now) if archive else None
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    size_before = os.path.getsize(path) if path and os.path.exists(path) else 0
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    stats = {'rows': 0, 'bytes': 0, 'archived_bytes': 0, 'path': path}
+    last_pk = 0
+    while True:
+        rows = list(expired.filter(pk__gt=last_pk).values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1]['id']
+        lines = ''.join(encoder.encode(row) + '\n' for row in rows)
+        if path:
+            with open(path, 'ab') as file:
+                with gzip.GzipFile(fileobj=file, mode='wb') as archive_file:
+                    archive_file.write(lines.encode('utf-8'))
+                file.flush()
+                os.fsync(file.fileno())
+        with transaction.atomic():
+            # read=True - powiadomienie oznaczone w międzyczasie jako nieprzeczytane zostaje
+            deleted, _ = Notification.objects.filter(pk__in=[row['id'] for row in rows], read=True).delete()
+        stats['rows'] += deleted
+        stats['bytes'] += len(lines.encode('utf-8'))
+    if path and os.path.exists(path):
+        stats['archived_bytes'] = os.path.getsize(path) - size_before
+    return stats
+
+def read_archive(path):
+    """Odczytuje powiadomienia z pliku archiwum (wszystkie człony gzip)."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            yield json.loads(line)
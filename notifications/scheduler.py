@@ -0,0 +1,170 @@
+from datetime import datetime, time, timedelta
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from products.models import Product
+from .models import ExpirySchedule
+from .services import notification_key, save_notifications
+from .utils import product_notification
+
+# Progi w kolejności wystąpienia: (próg, dni przed datą ważności)
+THRESHOLD_OFFSETS = [
+    (ExpirySchedule.WEEK, 7),
+    (ExpirySchedule.DAY, 1),
+    (ExpirySchedule.EXPIRED, 0),
+]
+
+def threshold_time(expiry_date, days):
+    """Północ (czas lokalny) dnia, w którym produkt przekracza próg."""
+    return timezone.make_aware(datetime.combine(expiry_date - timedelta(days=days), time.min))
+
+def next_threshold(expiry_date, now=None, after=None):
+    """
+    Próg do obsłużenia jako (próg, termin) albo None.
+    Z `after` - pierwszy próg późniejszy niż ten termin (po wysłaniu powiadomienia).
+    Bez niego - ostatni już przekroczony próg (powiadomienie mogło jeszcze nie powstać;
+    duplikaty blokuje dedupe_key) albo najbliższy przyszły. Produkty przeterminowane
+    przed dzisiejszym dniem nie są planowane.
+    """
+    now = now or timezone.now()
+    if after is not None:
+        return next(
+            ((threshold, threshold_time(expiry_date, days)) for threshold, days in THRESHOLD_OFFSETS
+             if threshold_time(expiry_date, days) > after),
+            None
+        )
+    if expiry_date < timezone.localdate(now):
+        return None
+    crossed = None
+    for threshold, days in THRESHOLD_OFFSETS:
+        due_at = threshold_time(expiry_date, days)
+        if due_at > now:
+            return crossed or (threshold, due_at)
+        crossed = (threshold, due_at)
+    return crossed
+
+def crossed_threshold(expiry_date, now):
+    """Ostatni próg przekroczony do chwili `now` jako (próg, termin) albo None."""
+    crossed = None
+    for threshold, days in THRESHOLD_OFFSETS:
+        due_at = threshold_time(expiry_date, days)
+        if due_at > now:
+            break
+        crossed = (threshold, due_at)
+    return crossed
+
+def _upsert(schedules, batch_size=None):
+    ExpirySchedule.objects.bulk_create(
+        schedules, batch_size=batch_size,
+        update_conflicts=True, unique_fields=['product'], update_fields=['threshold', 'due_at']
+    )
+
+def schedule_product(product, now=None):
+    """Wstawia lub przesuwa termin produktu jednym zapytaniem; nieaktywne usuwa z kolejki."""
+    upcoming = next_threshold(product.expiry_date, now) if product.is_active else None
+    if upcoming is None:
+        ExpirySchedule.objects.filter(product=product).delete()
+        return
+    threshold, due_at = upcoming
+    _upsert([ExpirySchedule(product=product, threshold=threshold, due_at=due_at)])
+
+def schedule_products(products, now=None, batch_size=1000):
+    """
+    Planuje progi dla wielu produktów naraz (np. zaimportowanych przez bulk_create,
+    który pomija sygnały). Zwraca liczbę zaplanowanych produktów.
+    """
+    now = now or timezone.now()
+    # Importowane produkty dzielą kilkadziesiąt dat - próg liczony raz na datę
+    thresholds = {}
+    schedules = []
+    for product in products:
+        if not product.is_active:
+            continue
+        if product.expiry_date not in thresholds:
+            thresholds[product.expiry_date] = next_threshold(product.expiry_date, now)
+        upcoming = thresholds[product.expiry_date]
+        if upcoming is not None:
+            schedules.append(ExpirySchedule(product_id=product.pk, threshold=upcoming[0], due_at=upcoming[1]))
+    _upsert(schedules, batch_size=batch_size)
+    return len(schedules)
+
+def rebuild_expiry_schedule(batch_size=1000, now=None):
+    """
+    Odbudowuje kolejkę dla wszystkich aktywnych produktów (np. po imporcie przez
+    bulk_create, który pomija sygnały). Zwraca liczbę zaplanowanych produktów.
+    """
+    now = now or timezone.now()
+    ExpirySchedule.objects.filter(product__is_active=False).delete()
+    products = Product.objects.filter(
+        is_active=True, expiry_date__gte=timezone.localdate(now)
+    ).values_list('pk', 'expiry_date')
+    batch, count = [], 0
+    for product_id, expiry_date in products.iterator(chunk_size=batch_size):
+        threshold, due_at = next_threshold(expiry_date, now)
+        batch.append(ExpirySchedule(product_id=product_id, threshold=threshold, due_at=due_at))
+        if len(batch) >= batch_size:
+            _upsert(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        _upsert(batch)
+        count += len(batch)
+    return count
+
+def threshold_notification(product, threshold, now):
+    days_left = (product.expiry_date - timezone.localdate(now)).days
+    if threshold == ExpirySchedule.EXPIRED:
+        return product_notification(
+            product, 'expiry',
+            title='Produkt się przeterminował',
+            message=f'Produkt "{product.name}" się przeterminował.',
+            dedupe_key=notification_key('expiry', f'product:{product.pk}', f'expired:{product.expiry_date}')
+        )
+    # Próg tygodniowy ma ten sam klucz co reguła build_expiry_notifications
+    period = product.expiry_date if threshold == ExpirySchedule.WEEK else f'1d:{product.expiry_date}'
+    return product_notification(
+        product, 'expiry',
+        title='Produkt wkrótce się przeterminuje',
+        message=f'Produkt "{product.name}" przeterminuje się za {days_left} dni.',
+        dedupe_key=notification_key('expiry', f'product:{product.pk}', period)
+    )
+
+def process_due(now=None, batch_size=500):
+    """
+    Obsługuje do `batch_size` najwcześniejszych zaległych progów: zapisuje
+    powiadomienia jednym INSERT-em i przesuwa wiersze na kolejny próg.
+    Z kilku zaległych progów produktu obsługiwany jest tylko ostatni przekroczony.
+    Koszt zależy od liczby zaległych progów, a nie od liczby produktów.
+    Zwraca liczbę obsłużonych wierszy.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = ExpirySchedule.objects.filter(due_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True, of=('self',))
+        rows = list(due.select_related('product').order_by('due_at')[:batch_size])
+        if not rows:
+            return 0
+
+        notifications, advanced, finished = [], [], []
+        for row in rows:
+            product = row.product
+            upcoming = None
+            if product.is_active:
+                # Po przestoju mogło minąć kilka progów naraz - powiadamiamy tylko
+                # o ostatnim (np. "przeterminowany" zamiast "za -2 dni")
+                threshold, due_at = crossed_threshold(product.expiry_date, now) or (row.threshold, row.due_at)
+                notifications.append(threshold_notification(product, threshold, now))
+                upcoming = next_threshold(product.expiry_date, after=max(due_at, row.due_at))
+            if upcoming is None:
+                finished.append(row.pk)
+            else:
+                row.threshold, row.due_at = upcoming
+                advanced.append(row)
+        save_notifications(notifications)
+        ExpirySchedule.objects.bulk_update(advanced, ['threshold', 'due_at'])
+        ExpirySchedule.objects.filter(pk__in=finished).delete()
+    return len(rows)
+
+def next_due_at():
+    return ExpirySchedule.objects.aggregate(next_due=Min('due_at'))['next_due']
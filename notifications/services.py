@@ -1,95 +1,178 @@
+import time
+from itertools import chain
+from django.db import connection
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Q
+from .counters import recount_unread_counts
+from .digest import save_events, split_digest_notifications
 from .models import Notification
 from products.models import Product
 from reports.models import ProductWastage
 
-def generate_expiry_notifications(user):
-    """Generuje powiadomienia o kończących się produktach."""
-    # Produkty, których data ważności kończy się w ciągu 7 dni
-    expiry_threshold = timezone.now() + timedelta(days=7)
-    
+# Ten sam próg co w signals.check_low_stock
+LOW_STOCK_THRESHOLD = 1
+
+def notification_key(notification_type, subject, period=''):
+    """
+    Naturalny klucz powiadomienia: typ, czego dotyczy (np. 'product:12')
+    i okres, w którym ma się pojawić najwyżej raz (np. data).
+    """
+    return f'{notification_type}:{subject}:{period}'
+
+class _InsertedRows:
+    """Wrapper zapytań sumujący wiersze wstawione przez INSERT ... ON CONFLICT DO NOTHING."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.count += max(context['cursor'].rowcount, 0)
+        return result
+
+def save_notifications(notifications, batch_size=None):
+    """
+    Zapisuje powiadomienia jednym INSERT-em. Powiadomienia, których klucz
+    już istnieje dla użytkownika, są pomijane przez bazę. Typy, dla których
+    użytkownik wybrał podsumowania, trafiają do kolejki zdarzeń (digest.py).
+    Zwraca liczbę faktycznie wstawionych powiadomień (bez pominiętych duplikatów).
+    """
+    if not notifications:
+        return 0
+    notifications, events = split_digest_notifications(notifications)
+    inserted = _InsertedRows()
+    with connection.execute_wrapper(inserted):
+        Notification.objects.bulk_create(notifications, batch_size=batch_size, ignore_conflicts=True)
+    if events:
+        save_events(events)
+    recount_unread_counts(notification.user_id for notification in notifications)
+    return inserted.count
+
+# Reguły przyjmują warunek na użytkowników (Q), np. Q(user=user) albo
+# Q(user__gte=1, user__lte=500), i zwracają niezapisane powiadomienia
+
+def build_expiry_notifications(users):
+    """Powiadomienia o produktach tracących ważność w ciągu 7 dni."""
+    today = timezone.localdate()
     expiring_products = Product.objects.filter(
-        user=user,
-        expiry_date__lte=expiry_threshold,
-        expiry_date__gt=timezone.now(),
+        users,
+        expiry_date__lte=today + timedelta(days=7),
+        expiry_date__gt=today,
         is_active=True
     )
-    
-    for product in expiring_products:
-        days_left = (product.expiry_date - timezone.now()).days
-        Notification.objects.create(
-            user=user,
+    return [
+        Notification(
+            user_id=product.user_id,
             notification_type='expiry',
             title=f'Kończy się data ważności produktu {product.name}',
-            message=f'Produkt {product.name} straci ważność za {days_left} dni.',
+            message=f'Produkt {product.name} straci ważność za {(product.expiry_date - today).days} dni.',
             product=product,
-            link=f'/products/{product.id}/'
+            link=f'/products/{product.id}/',
+            dedupe_key=notification_key('expiry', f'product:{product.id}', product.expiry_date),
         )
+        for product in expiring_products
+    ]
 
-def generate_low_stock_notifications(user):
-    """Generuje powiadomienia o niskim stanie magazynowym."""
-    # Produkty z ilością mniejszą niż 1 jednostka
+def build_low_stock_notifications(users):
+    """Powiadomienia o niskim stanie magazynowym - najwyżej jedno dziennie na produkt."""
+    today = timezone.localdate()
     low_stock_products = Product.objects.filter(
-        user=user,
-        quantity__lte=1,
+        users,
+        quantity__lte=LOW_STOCK_THRESHOLD,
         is_active=True
     )
-    
-    for product in low_stock_products:
-        Notification.objects.create(
-            user=user,
+    return [
+        Notification(
+            user_id=product.user_id,
             notification_type='low_stock',
             title=f'Niski stan magazynowy produktu {product.name}',
             message=f'Produkt {product.name} ma niski stan magazynowy ({product.quantity} {product.unit}).',
             product=product,
-            link=f'/products/{product.id}/'
+            link=f'/products/{product.id}/',
+            dedupe_key=notification_key('low_stock', f'product:{product.id}', today),
         )
+        for product in low_stock_products
+    ]
 
-def generate_wastage_notifications(user):
-    """Generuje powiadomienia o marnowaniu produktów."""
-    # Produkty, które zostały oznaczone jako marnowane w ciągu ostatnich 24 godzin
-    wastage_threshold = timezone.now() - timedelta(days=1)
-    
+def build_wastage_notifications(users):
+    """Powiadomienia o produktach zmarnowanych w ciągu ostatniej doby."""
     recent_wastages = ProductWastage.objects.filter(
-        user=user,
-        wastage_date__gte=wastage_threshold
-    )
-    
-    for wastage in recent_wastages:
-        Notification.objects.create(
-            user=user,
+        users,
+        wastage_date__gte=timezone.localdate() - timedelta(days=1)
+    ).select_related('product')
+    return [
+        Notification(
+            user_id=wastage.user_id,
             notification_type='wastage',
             title=f'Marnowanie produktu {wastage.product.name}',
             message=f'Produkt {wastage.product.name} został oznaczony jako marnowany. Powód: {wastage.reason}',
             product=wastage.product,
-            link=f'/products/{wastage.product.id}/'
+            link=f'/products/{wastage.product.id}/',
+            dedupe_key=notification_key('wastage', f'wastage:{wastage.id}'),
         )
+        for wastage in recent_wastages
+    ]
 
-def generate_report_notifications(user):
-    """Generuje powiadomienia podsumowujące raporty."""
-    # Sprawdź, czy są jakieś istotne statystyki do zgłoszenia
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    
-    # Sprawdź marnowanie
-    wastage_count = ProductWastage.objects.filter(
-        user=user,
-        wastage_date__gte=thirty_days_ago
-    ).count()
-    
-    if wastage_count > 0:
-        Notification.objects.create(
-            user=user,
+def build_report_notifications(users):
+    """Dzienne podsumowanie marnowania z ostatnich 30 dni (jedno zapytanie grupujące)."""
+    today = timezone.localdate()
+    wastage_counts = ProductWastage.objects.filter(
+        users,
+        wastage_date__gte=today - timedelta(days=30)
+    ).values('user_id').annotate(wastage_count=Count('id')).order_by()
+    return [
+        Notification(
+            user_id=row['user_id'],
             notification_type='report',
             title='Podsumowanie marnowania produktów',
-            message=f'W ciągu ostatnich 30 dni odnotowano {wastage_count} przypadków marnowania produktów.',
-            link='/reports/wastage/'
+            message=f"W ciągu ostatnich 30 dni odnotowano {row['wastage_count']} przypadków marnowania produktów.",
+            link='/reports/wastage/',
+            dedupe_key=notification_key('report', 'wastage-summary', today),
         )
+        for row in wastage_counts
+    ]
+
+NOTIFICATION_RULES = {
+    'expiry': build_expiry_notifications,
+    'low_stock': build_low_stock_notifications,
+    'wastage': build_wastage_notifications,
+    'report': build_report_notifications,
+}
+
+def generate_expiry_notifications(user):
+    """Generuje powiadomienia o kończących się produktach."""
+    save_notifications(build_expiry_notifications(Q(user=user)))
+
+def generate_low_stock_notifications(user):
+    """Generuje powiadomienia o niskim stanie magazynowym."""
+    save_notifications(build_low_stock_notifications(Q(user=user)))
+
+def generate_wastage_notifications(user):
+    """Generuje powiadomienia o marnowaniu produktów."""
+    save_notifications(build_wastage_notifications(Q(user=user)))
+
+def generate_report_notifications(user):
+    """Generuje powiadomienia podsumowujące raporty."""
+    save_notifications(build_report_notifications(Q(user=user)))
 
 def generate_all_notifications(user):
-    """Generuje wszystkie typy powiadomień."""
-    generate_expiry_notifications(user)
-    generate_low_stock_notifications(user)
-    generate_wastage_notifications(user)
-    generate_report_notifications(user) 
\ No newline at end of file
+    """
+    Generuje wszystkie typy powiadomień: jedno zapytanie na regułę i jeden INSERT,
+    niezależnie od liczby produktów. Ponowne wywołanie nie tworzy duplikatów.
+    """
+    users = Q(user=user)
+    save_notifications(list(chain.from_iterable(rule(users) for rule in NOTIFICATION_RULES.values())))
+
+def sweep_notifications(first_user_id, last_user_id, batch_size=1000):
+    """
+    Wykonuje wszystkie reguły dla użytkowników o ID z zakresu [first_user_id, last_user_id].
+    Zwraca {reguła: (czas w sekundach, liczba zapisanych powiadomień)}.
+    """
+    users = Q(user__gte=first_user_id, user__lte=last_user_id)
+    stats = {}
+    for name, rule in NOTIFICATION_RULES.items():
+        started = time.perf_counter()
+        saved = save_notifications(rule(users), batch_size=batch_size)
+        stats[name] = (time.perf_counter() - started, saved)
+    return stats
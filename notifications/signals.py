@@ -1,44 +1,54 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
 from products.models import Product
 from shopping_list.models import ShoppingList
-from .utils import create_notification
+from .counters import change_unread_count
+from .models import Notification
+from .services import LOW_STOCK_THRESHOLD, notification_key
+from .scheduler import schedule_product
+from .utils import create_notification, product_notification, queue_notification
 
 @receiver(post_save, sender=Product)
-def check_product_expiry(sender, instance, created, **kwargs):
+def check_product_expiry(sender, instance, created, raw=False, **kwargs):
     """Sprawdza datę ważności produktu i tworzy powiadomienie jeśli jest bliska."""
-    if not created and instance.expiry_date:
-        days_until_expiry = (instance.expiry_date - timezone.now().date()).days
-        if days_until_expiry <= 7 and days_until_expiry > 0:
-            create_notification(
-                user=instance.user,
-                notification_type='expiry',
-                title='Produkt wkrótce się przeterminuje',
-                message=f'Produkt "{instance.name}" przeterminuje się za {days_until_expiry} dni.',
-                related_object=instance
-            )
-        elif days_until_expiry <= 0:
-            create_notification(
-                user=instance.user,
-                notification_type='expiry',
-                title='Produkt się przeterminował',
-                message=f'Produkt "{instance.name}" się przeterminował.',
-                related_object=instance
-            )
+    if raw or created or not instance.is_active or not instance.has_changed('expiry_date', 'is_active'):
+        return
+    days_until_expiry = (instance.expiry_date - timezone.now().date()).days
+    if days_until_expiry <= 7 and days_until_expiry > 0:
+        queue_notification(product_notification(
+            instance, 'expiry',
+            title='Produkt wkrótce się przeterminuje',
+            message=f'Produkt "{instance.name}" przeterminuje się za {days_until_expiry} dni.',
+            dedupe_key=notification_key('expiry', f'product:{instance.pk}', instance.expiry_date)
+        ))
+    elif days_until_expiry <= 0:
+        queue_notification(product_notification(
+            instance, 'expiry',
+            title='Produkt się przeterminował',
+            message=f'Produkt "{instance.name}" się przeterminował.',
+            dedupe_key=notification_key('expiry', f'product:{instance.pk}', f'expired:{instance.expiry_date}')
+        ))
 
 @receiver(post_save, sender=Product)
-def check_low_stock(sender, instance, created, **kwargs):
+def schedule_expiry_thresholds(sender, instance, created, raw=False, **kwargs):
+    """Ustawia termin najbliższego progu ważności po dodaniu lub zmianie produktu."""
+    if not raw and (created or instance.has_changed('expiry_date', 'is_active')):
+        schedule_product(instance)
+
+@receiver(post_save, sender=Product)
+def check_low_stock(sender, instance, created, raw=False, **kwargs):
     """Sprawdza stan magazynowy produktu i tworzy powiadomienie jeśli jest niski."""
-    if not created and instance.quantity <= instance.min_quantity:
-        create_notification(
-            user=instance.user,
-            notification_type='low_stock',
+    if raw or created or not instance.is_active or not instance.has_changed('quantity', 'is_active'):
+        return
+    if instance.quantity <= LOW_STOCK_THRESHOLD:
+        queue_notification(product_notification(
+            instance, 'low_stock',
             title='Niski stan magazynowy',
             message=f'Produkt "{instance.name}" ma niski stan magazynowy ({instance.quantity} {instance.unit}).',
-            related_object=instance
-        )
+            dedupe_key=notification_key('low_stock', f'product:{instance.pk}', timezone.localdate())
+        ))
 
 @receiver(post_save, sender=ShoppingList)
 def notify_shopping_list_created(sender, instance, created, **kwargs):
@@ -50,4 +60,16 @@ def notify_shopping_list_created(sender, instance, created, **kwargs):
             title='Nowa lista zakupów',
             message=f'Utworzono nową listę zakupów "{instance.name}".',
             related_object=instance
-        ) 
\ No newline at end of file
+        ) 
+
+@receiver(post_save, sender=Notification)
+def count_created_notification(sender, instance, created, raw=False, **kwargs):
+    """Nowe nieprzeczytane powiadomienie zwiększa licznik użytkownika."""
+    if created and not raw and not instance.read:
+        change_unread_count(instance.user_id, 1)
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    """Usunięcie nieprzeczytanego powiadomienia zmniejsza licznik użytkownika."""
+    if not instance.read:
+        change_unread_count(instance.user_id, -1)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .counters import unread_count
+from .feed import serialize_notification
+from .models import Notification, UnreadNotificationCounter
+
+def changed_users(user_ids, state):
+    """
+    Jedno sprawdzenie bazy za wszystkie strumienie procesu: zwraca użytkowników
+    z `user_ids`, którzy od poprzedniego sprawdzenia dostali nowe powiadomienia
+    albo których licznik nieprzeczytanych się zmienił. `state` (słownik) pamięta
+    ostatnie id powiadomienia i liczniki między wywołaniami; użytkownik widziany
+    pierwszy raz jest zawsze zwracany.
+    """
+    changed = set()
+    latest = Notification.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    last_pk = state.get('last_pk')
+    if last_pk is not None and latest > last_pk:
+        changed.update(
+            Notification.objects.filter(pk__gt=last_pk, pk__lte=latest, user_id__in=user_ids)
+            .order_by().values_list('user_id', flat=True).distinct()
+        )
+    state['last_pk'] = latest
+
+    counts = dict(
+        UnreadNotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'count')
+    )
+    known = state.setdefault('counts', {})
+    for user_id in user_ids:
+        if user_id not in known or known[user_id] != counts.get(user_id):
+            changed.add(user_id)
+    state['counts'] = {user_id: counts.get(user_id) for user_id in user_ids}
+    return changed
+
+class NotificationBroker:
+    """
+    Pub/sub w obrębie procesu: budzi strumienie SSE użytkownika, gdy zmieniają
+    się jego powiadomienia. Zmiany z innych procesów (run_jobs, cron) wykrywa
+    jedno zadanie na pętlę zdarzeń, sprawdzające bazę co
+    NOTIFICATION_STREAM_POLL_SECONDS za wszystkie otwarte strumienie naraz -
+    koszt nie rośnie z liczbą kart, a czekający strumień sam bazy nie odpytuje.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._watchers = {}
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._subscribers[user_id].add(waiter)
+            if loop not in self._watchers:
+                self._watchers[loop] = loop.create_task(self._watch(loop))
+        return waiter
+
+    def unsubscribe(self, user_id, waiter):
+        loop = waiter[0]
+        watcher = None
+        with self._lock:
+            self._subscribers[user_id].discard(waiter)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+            if not self._loop_user_ids(loop):
+                watcher = self._watchers.pop(loop, None)
+        if watcher is not None:
+            watcher.cancel()
+
+    def _loop_user_ids(self, loop):
+        return [
+            user_id for user_id, waiters in self._subscribers.items()
+            if any(waiter_loop is loop for waiter_loop, _ in waiters)
+        ]
+
+    async def _watch(self, loop):
+        state = {}
+        while True:
+            await asyncio.sleep(settings.NOTIFICATION_STREAM_POLL_SECONDS)
+            with self._lock:
+                user_ids = self._loop_user_ids(loop)
+            if user_ids:
+                for user_id in await sync_to_async(changed_users)(user_ids, state):
+                    self.publish(user_id)
+
+    def publish(self, user_id):
+        """Może być wołane z dowolnego wątku (np. z sygnału w widoku synchronicznym)."""
+        with self._lock:
+            waiters = list(self._subscribers.get(user_id, ()))
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+broker = NotificationBroker()
+
+def _sse(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, cls=DjangoJSONEncoder)}']
+    return '\n'.join(lines) + '\n\n'
+
+async def notification_events(user_id, last_event_id=None, batch_size=50):
+    """
+    Strumień zdarzeń SSE: `notification` dla każdego nowego powiadomienia
+    (id zdarzenia = id powiadomienia, więc klient wznawia od Last-Event-ID)
+    i `unread` przy zmianie liczby nieprzeczytanych. Bazę odpytuje tylko po
+    obudzeniu przez broker; w czasie ciszy wysyła jedynie komentarz
+    podtrzymujący połączenie co NOTIFICATION_STREAM_KEEPALIVE_SECONDS.
+    """
+    loop_and_event = broker.subscribe(user_id)
+    event = loop_and_event[1]
+    notifications = Notification.objects.filter(user_id=user_id)
+    try:
+        if last_event_id is None:
+            # Nowe połączenie - historia jest dostępna na liście powiadomień
+            latest = await notifications.order_by('-pk').values_list('pk', flat=True).afirst()
+            last_event_id = latest or 0
+
+        last_count = None
+        yield 'retry: 5000\n\n'
+        while True:
+            event.clear()
+            batch = [
+                notification async for notification in
+                notifications.filter(pk__gt=last_event_id).with_targets().order_by('pk')[:batch_size]
+            ]
+            for notification in batch:
+                last_event_id = notification.pk
+                yield _sse('notification', serialize_notification(notification), event_id=notification.pk)
+
+            count = await sync_to_async(unread_count)(user_id)
+            if count != last_count:
+                last_count = count
+                yield _sse('unread', {'count': count})
+
+            if len(batch) == batch_size:
+                continue
+            while not event.is_set():
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Komentarz podtrzymuje połączenie przez proxy
+                    yield ': ping\n\n'
+    finally:
+        broker.unsubscribe(user_id, loop_and_event)
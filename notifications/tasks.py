@@ -0,0 +1,7 @@
+from jobs.queue import task
+from .digest import deliver_digests
+
+@task('notifications.deliver_digests')
+def deliver_digests_task():
+    """Zadanie kolejki: dostarcza podsumowania z zakończonych okresów."""
+    deliver_digests()
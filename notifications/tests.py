@@ -0,0 +1,814 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from asgiref.sync import sync_to_async
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from products.models import Product, Category
+from reports.models import ProductWastage
+from shopping_list.models import ShoppingList
+from jobs.models import Job
+from .counters import unread_count
+from .digest import deliver_digests
+from .models import ExpirySchedule, Notification, NotificationEvent, UnreadNotificationCounter
+from .services import generate_expiry_notifications
+from .stream import broker, changed_users
+from .utils import create_notification
+from .retention import archive_notifications, read_archive, retention_policy
+from .scheduler import next_threshold, process_due, rebuild_expiry_schedule, threshold_time
+
+User = get_user_model()
+
+class NotificationDedupeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Nabiał')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _create_products(self, count):
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Produkt {i}',
+                category=self.category,
+                expiry_date=timezone.localdate() + timedelta(days=3),
+                quantity=Decimal('0.5'),
+                unit='szt',
+                user=self.user
+            )
+            for i in range(count)
+        ])
+        for product in products:
+            ProductWastage.objects.create(
+                user=self.user, product=product, quantity=Decimal('0.1'), unit='szt',
+                wastage_date=timezone.localdate(), reason='Zepsute'
+            )
+
+    def _refresh_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('notifications:refresh'))
+        return len(context.captured_queries)
+
+    def test_refresh_does_not_duplicate(self):
+        """Ponowne odświeżenie nie tworzy tych samych powiadomień drugi raz"""
+        self._create_products(3)
+        self.client.get(reverse('notifications:refresh'))
+        # 3 x ważność, 3 x niski stan, 3 x marnowanie, 1 podsumowanie
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 10)
+        self.client.get(reverse('notifications:refresh'))
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 10)
+
+    def test_refresh_cost_does_not_depend_on_product_count(self):
+        """Odświeżenie to stała liczba zapytań: jedno na regułę i jeden INSERT"""
+        self._create_products(2)
+        few = self._refresh_queries()
+        Notification.objects.all().delete()
+        self._create_products(10)
+        self.assertEqual(self._refresh_queries(), few)
+
+    def test_product_signals_are_deduplicated(self):
+        """Kolejne zapisy produktu nie powielają powiadomień o ważności i stanie"""
+        product = Product.objects.create(
+            name='Mleko', category=self.category, expiry_date=timezone.localdate() + timedelta(days=30),
+            quantity=5, unit='l', user=self.user
+        )
+        for quantity in [1, 0.5, 0.25]:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.expiry_date = timezone.localdate() + timedelta(days=2)
+                product.quantity = quantity
+                product.save()
+        types = list(Notification.objects.filter(user=self.user).values_list('notification_type', flat=True))
+        self.assertEqual(sorted(types), ['expiry', 'low_stock'])
+
+    def test_sweep_command_covers_all_users(self):
+        """Komenda przetwarza wszystkich użytkowników fragmentami i nie powiela wpisów"""
+        self._create_products(2)
+        other = User.objects.create_user(username='inny', email='inny@example.com', password='testpass123')
+        Product.objects.create(
+            name='Ser', category=self.category, expiry_date=timezone.localdate() + timedelta(days=1),
+            quantity=5, unit='szt', user=other
+        )
+
+        out = StringIO()
+        call_command('sweep_notifications', processes=0, shard_size=1, stdout=out)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 7)
+        self.assertEqual(Notification.objects.filter(user=other, notification_type='expiry').count(), 1)
+        self.assertIn('expiry: 3 powiadomień', out.getvalue())
+        self.assertIn('Zapisano powiadomień: 8', out.getvalue())
+
+        out = StringIO()
+        call_command('sweep_notifications', processes=0, stdout=out)
+        self.assertIn('Zapisano powiadomień: 0', out.getvalue())
+
+class ProductSignalBatchingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        category = Category.objects.create(name='Nabiał')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Produkt {i}', category=category, expiry_date=timezone.localdate() + timedelta(days=30),
+                quantity=5, unit='szt', user=self.user
+            )
+            for i in range(10)
+        ])
+
+    def test_dirty_field_tracking(self):
+        """Zmiana pól śledzonych jest wykrywana do zapisu, potem stan jest aktualny"""
+        product = Product.objects.first()
+        self.assertFalse(product.has_changed('quantity', 'expiry_date'))
+        product.name = 'Inna nazwa'
+        self.assertFalse(product.has_changed('quantity', 'expiry_date'))
+        product.quantity = 1
+        self.assertTrue(product.has_changed('quantity'))
+        product.save()
+        self.assertFalse(product.has_changed('quantity'))
+        self.assertTrue(Product(quantity=1).has_changed('quantity'))
+
+    def test_unchanged_product_save_skips_rules(self):
+        """Zapis bez zmian ważności i ilości nie uruchamia reguł powiadomień"""
+        product = Product.objects.first()
+        product.barcode = '5900000000001'
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # tylko UPDATE produktu
+            with self.assertNumQueries(1):
+                product.save()
+        self.assertEqual(callbacks, [])
+
+    def test_bulk_edit_flushes_single_insert(self):
+        """Powiadomienia z całej transakcji są zapisywane jednym INSERT-em po zatwierdzeniu, bez duplikatów"""
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for product in Product.objects.all():
+                        product.quantity = 1
+                        product.expiry_date = timezone.localdate() + timedelta(days=3)
+                        product.save()
+                        product.quantity = 0
+                        product.save()
+                self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self._notification_inserts(queries), 1)
+        self.assertEqual(Notification.objects.filter(notification_type='low_stock').count(), 10)
+        self.assertEqual(Notification.objects.filter(notification_type='expiry').count(), 10)
+
+    def _notification_inserts(self, queries):
+        return sum(
+            query['sql'].startswith('INSERT') and 'INTO "notifications_notification" (' in query['sql']
+            for query in queries.captured_queries
+        )
+
+    def test_rolled_back_savepoint_discards_notifications(self):
+        """Powiadomienia z wycofanego punktu zapisu nie są zapisywane, reszta transakcji tak"""
+        first, second, third = Product.objects.all()[:3]
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    first.quantity = 1
+                    first.save()
+                    try:
+                        with transaction.atomic():
+                            second.expiry_date = timezone.localdate() + timedelta(days=3)
+                            second.save()
+                            raise ValueError
+                    except ValueError:
+                        pass
+                    third.quantity = 1
+                    third.save()
+        self.assertEqual(
+            sorted(Notification.objects.values_list('notification_type', 'product')),
+            [('low_stock', first.pk), ('low_stock', third.pk)]
+        )
+        # Bufor wycofanego punktu zapisu nie jest zapisywany - jeden INSERT zewnętrznego poziomu
+        self.assertEqual(self._notification_inserts(queries), 1)
+
+    def test_one_insert_per_committed_level(self):
+        """Zatwierdzony zagnieżdżony punkt zapisu ma własny bufor - najwyżej jeden INSERT na poziom"""
+        products = list(Product.objects.all())
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for product in products[:5]:
+                        product.quantity = 1
+                        product.save()
+                    with transaction.atomic():
+                        for product in products[5:]:
+                            product.quantity = 1
+                            product.save()
+        self.assertEqual(self._notification_inserts(queries), 2)
+        self.assertEqual(Notification.objects.count(), 10)
+
+    def test_rolled_back_transaction_discards_notifications(self):
+        """Wycofana transakcja nie zostawia powiadomień do zapisania"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    product = Product.objects.first()
+                    product.quantity = 1
+                    product.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            product = Product.objects.last()
+            product.expiry_date = timezone.localdate() + timedelta(days=3)
+            product.save()
+        types = list(Notification.objects.values_list('notification_type', flat=True))
+        self.assertEqual(types, ['expiry'])
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        self.url = reverse('notifications:unread_count')
+
+    def _notify(self, **kwargs):
+        return Notification.objects.create(
+            user=self.user, notification_type='report', title='Raport', message='Raport', **kwargs
+        )
+
+    def _count(self):
+        return self.client.get(self.url).json()['count']
+
+    def test_poll_does_not_count_in_database(self):
+        """Licznik jest odczytem jednego wiersza, bez zapytania COUNT"""
+        self._notify()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self._count(), 1)
+        # sesja + użytkownik + wiersz licznika
+        self.assertEqual(len(context), 3)
+        self.assertNotIn('COUNT', context.captured_queries[-1]['sql'])
+
+    def test_counter_follows_changes(self):
+        """Licznik nadąża za dodaniem, przeczytaniem i usunięciem powiadomień"""
+        first = self._notify()
+        self.assertEqual(self._count(), 1)
+        second = self._notify()
+        self._notify(read=True)
+        self.assertEqual(self._count(), 2)
+
+        first.mark_as_read()
+        first.mark_as_read()
+        self.assertEqual(self._count(), 1)
+
+        second.delete()
+        self.assertEqual(self._count(), 0)
+
+        self._notify()
+        self._notify()
+        self.client.get(reverse('notifications:mark_all_read'))
+        self.assertEqual(self._count(), 0)
+
+    def test_bulk_generation_invalidates_counter(self):
+        """Po zbiorczym generowaniu licznik jest liczony od nowa"""
+        self.assertEqual(self._count(), 0)
+        Product.objects.create(
+            name='Mleko', category=Category.objects.create(name='Nabiał'),
+            expiry_date=timezone.localdate() + timedelta(days=2), quantity=5, unit='l', user=self.user
+        )
+        self.client.get(reverse('notifications:refresh'))
+        self.assertEqual(self._count(), 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        self._notify()
+        self.assertEqual(self._count(), 1)
+        Notification.objects.filter(user=self.user).update(read=True)
+
+        out = StringIO()
+        call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn(f'Użytkownik {self.user.pk}: 1 -> 0', out.getvalue())
+        self.assertEqual(self._count(), 0)
+
+    def test_missing_counter_is_created_from_database(self):
+        """Brakujący wiersz licznika (np. użytkownik sprzed migracji) powstaje z wartością z bazy"""
+        self._notify()
+        self._notify()
+        UnreadNotificationCounter.objects.filter(user=self.user).delete()
+        self.assertEqual(self._count(), 2)
+        self.assertEqual(UnreadNotificationCounter.objects.get(user=self.user).count, 2)
+
+    def test_rolled_back_change_keeps_counter(self):
+        """Licznik zmienia się w transakcji powiadomienia - wycofanie cofa oba"""
+        self._notify()
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            self._notify()
+            raise DatabaseError
+        self.assertEqual(self._count(), 1)
+
+@override_settings(NOTIFICATION_STREAM_POLL_SECONDS=60, NOTIFICATION_STREAM_KEEPALIVE_SECONDS=60)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.url = reverse('notifications:stream')
+
+    def _notify(self, title):
+        return Notification.objects.create(
+            user=self.user, notification_type='report', title=title, message=title
+        )
+
+    async def _open_stream(self, headers=None):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url, headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response.streaming_content
+
+    async def _next(self, stream):
+        return await asyncio.wait_for(anext(stream), timeout=5)
+
+    async def test_requires_login(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_resume_from_last_event_id(self):
+        """Po wznowieniu strumień wysyła tylko powiadomienia po Last-Event-ID"""
+        first = await sync_to_async(self._notify)('Pierwsze')
+        second = await sync_to_async(self._notify)('Drugie')
+        stream = await self._open_stream(headers={'Last-Event-ID': str(first.pk)})
+        try:
+            self.assertEqual(await self._next(stream), b'retry: 5000\n\n')
+            event = (await self._next(stream)).decode()
+            self.assertTrue(event.startswith(f'id: {second.pk}\nevent: notification\n'))
+            self.assertIn('"title": "Drugie"', event)
+            self.assertEqual(await self._next(stream), b'event: unread\ndata: {"count": 2}\n\n')
+        finally:
+            await stream.aclose()
+
+    async def test_new_notification_is_pushed_immediately(self):
+        """Nowe powiadomienie budzi czekający strumień bez odpytywania bazy"""
+        stream = await self._open_stream()
+        try:
+            await self._next(stream)
+            self.assertEqual(await self._next(stream), b'event: unread\ndata: {"count": 0}\n\n')
+            waiting = asyncio.ensure_future(self._next(stream))
+            await asyncio.sleep(0.1)
+
+            def notify():
+                with self.captureOnCommitCallbacks(execute=True):
+                    return self._notify('Nowe')
+            notification = await sync_to_async(notify)()
+
+            event = (await waiting).decode()
+            self.assertTrue(event.startswith(f'id: {notification.pk}\nevent: notification\n'))
+            self.assertEqual(await self._next(stream), b'event: unread\ndata: {"count": 1}\n\n')
+        finally:
+            await stream.aclose()
+
+    @override_settings(NOTIFICATION_STREAM_POLL_SECONDS=0.1)
+    async def test_periodic_check_sees_other_processes(self):
+        """Zmiany z innego procesu (bez brokera tego procesu) trafiają do strumienia po okresowym sprawdzeniu"""
+        stream = await self._open_stream()
+        try:
+            await self._next(stream)
+            self.assertEqual(await self._next(stream), b'event: unread\ndata: {"count": 0}\n\n')
+            await Notification.objects.abulk_create([
+                Notification(user=self.user, notification_type='report', title='Z crona', message='Z crona')
+            ])
+            await UnreadNotificationCounter.objects.filter(user=self.user).aupdate(count=F('count') + 1)
+            self.assertIn(b'event: notification', await self._next(stream))
+            self.assertEqual(await self._next(stream), b'event: unread\ndata: {"count": 1}\n\n')
+        finally:
+            await stream.aclose()
+
+    @override_settings(NOTIFICATION_STREAM_KEEPALIVE_SECONDS=0.05)
+    async def test_keepalive_does_not_query_database(self):
+        """Bezczynny strumień wysyła tylko komentarze podtrzymujące, bez zapytań o licznik"""
+        with mock.patch('notifications.stream.unread_count', wraps=unread_count) as count:
+            stream = await self._open_stream()
+            try:
+                await self._next(stream)
+                await self._next(stream)
+                self.assertEqual(await self._next(stream), b': ping\n\n')
+                self.assertEqual(await self._next(stream), b': ping\n\n')
+            finally:
+                await stream.aclose()
+        self.assertEqual(count.call_count, 1)
+
+    async def test_streams_share_one_database_check(self):
+        """Wszystkie strumienie procesu korzystają z jednego okresowego sprawdzenia bazy"""
+        streams = [await self._open_stream(), await self._open_stream()]
+        try:
+            for stream in streams:
+                await self._next(stream)
+                await self._next(stream)
+            self.assertEqual(len(broker._watchers), 1)
+        finally:
+            for stream in streams:
+                await stream.aclose()
+
+    async def test_last_unsubscribe_stops_database_check(self):
+        """Sprawdzanie bazy działa tylko, dopóki w procesie jest otwarty jakiś strumień"""
+        first = broker.subscribe(self.user.pk)
+        second = broker.subscribe(self.user.pk + 1)
+        watcher = broker._watchers[asyncio.get_running_loop()]
+        broker.unsubscribe(self.user.pk, first)
+        self.assertFalse(watcher.cancelled())
+        broker.unsubscribe(self.user.pk + 1, second)
+        await asyncio.sleep(0)
+        self.assertTrue(watcher.cancelled())
+        self.assertEqual(broker._watchers, {})
+
+    def test_changed_users(self):
+        """Sprawdzenie zwraca użytkowników z nowymi powiadomieniami albo zmienionym licznikiem"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        unread_count(self.user.pk)
+        unread_count(other.pk)
+        state = {}
+        self.assertEqual(changed_users([self.user.pk, other.pk], state), {self.user.pk, other.pk})
+        self.assertEqual(changed_users([self.user.pk, other.pk], state), set())
+
+        # Wiersz z innego procesu, bez zmiany licznika (np. od razu przeczytany)
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='report', title='Z crona', message='Z crona', read=True)
+        ])
+        self.assertEqual(changed_users([self.user.pk, other.pk], state), {self.user.pk})
+
+        UnreadNotificationCounter.objects.filter(user=other).update(count=F('count') + 1)
+        self.assertEqual(changed_users([self.user.pk, other.pk], state), {other.pk})
+        self.assertEqual(changed_users([self.user.pk, other.pk], state), set())
+
+    def test_wsgi_request_is_refused(self):
+        """Pod WSGI strumień nie jest otwierany - przeglądarka przechodzi na odpytywanie"""
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+class NotificationFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        category = Category.objects.create(name='Nabiał')
+        self.product = Product.objects.create(
+            name='Mleko', category=category, expiry_date=timezone.localdate() + timedelta(days=3),
+            quantity=5, unit='l', user=self.user
+        )
+        Notification.objects.bulk_create([
+            Notification(
+                user=self.user, notification_type='expiry', title=f'Powiadomienie {i}',
+                message='Treść', product=self.product, category=category
+            )
+            for i in range(12)
+        ])
+        # Część powiadomień z identycznym czasem - kursor musi rozstrzygać po id
+        Notification.objects.filter(user=self.user, title__in=['Powiadomienie 4', 'Powiadomienie 5', 'Powiadomienie 6']).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        self.url = reverse('notifications:feed')
+
+    def test_cursor_pagination_walks_all_notifications(self):
+        """Kolejne strony nie gubią ani nie powtarzają powiadomień"""
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 5, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(self.url, params).json()
+            seen += [item['id'] for item in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        expected = list(Notification.objects.filter(user=self.user).order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_feed_fields_and_query_count(self):
+        """Produkt i kategoria są pobierane JOIN-em, niezależnie od liczby powiadomień"""
+        self.client.get(self.url)
+        # sesja + użytkownik + ETag (najnowsze, licznik) + strona + licznik
+        with self.assertNumQueries(6):
+            data = self.client.get(self.url, {'limit': 10}).json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['product'], {'id': self.product.pk, 'name': 'Mleko'})
+        self.assertEqual(data['results'][0]['category']['name'], 'Nabiał')
+        self.assertEqual(data['unread_count'], 12)
+
+    def test_conditional_get(self):
+        """Niezmieniona lista daje 304, przeczytanie powiadomienia zmienia ETag"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Notification.objects.filter(user=self.user).first().mark_as_read()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'zły'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 'dużo'}).status_code, 400)
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root)
+        settings = override_settings(NOTIFICATION_ARCHIVE_ROOT=self.archive_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123',
+            notification_preferences={'retention_days': {'expiry': 200, 'report': None}}
+        )
+        for user in [self.user, self.other]:
+            for notification_type, age, read in [
+                ('expiry', 100, True), ('expiry', 100, False), ('expiry', 5, True),
+                ('report', 100, True), ('shopping_list', 100, True),
+            ]:
+                notification = Notification.objects.create(
+                    user=user, notification_type=notification_type, title='Zażółć', message='Treść', read=read
+                )
+                Notification.objects.filter(pk=notification.pk).update(
+                    created_at=timezone.now() - timedelta(days=age)
+                )
+
+    def test_policy_merges_user_overrides(self):
+        policy = retention_policy({'retention_days': {'expiry': 7, 'report': None, 'wastage': 'dużo'}})
+        self.assertEqual(policy['expiry'], 7)
+        self.assertIsNone(policy['report'])
+        self.assertEqual(policy['wastage'], 90)
+
+    def test_archive_moves_expired_read_notifications(self):
+        """Stare przeczytane powiadomienia trafiają do archiwum, reszta zostaje"""
+        stats = archive_notifications(batch_size=2)
+        # użytkownik domyślny: expiry, report, shopping_list; drugi: tylko shopping_list
+        self.assertEqual(stats['rows'], 4)
+        self.assertGreater(stats['bytes'], stats['archived_bytes'])
+
+        archived = list(read_archive(stats['path']))
+        self.assertEqual(len(archived), 4)
+        self.assertEqual(archived[0]['title'], 'Zażółć')
+        self.assertEqual(
+            sorted((row['user_id'], row['notification_type']) for row in archived),
+            sorted([(self.user.pk, 'expiry'), (self.user.pk, 'report'),
+                    (self.user.pk, 'shopping_list'), (self.other.pk, 'shopping_list')])
+        )
+        self.assertFalse(Notification.objects.filter(pk__in=[row['id'] for row in archived]).exists())
+        self.assertEqual(Notification.objects.filter(read=False).count(), 2)
+
+        # Kolejne uruchomienie dopisuje do tego samego pliku, nie ma już czego usuwać
+        self.assertEqual(archive_notifications()['rows'], 0)
+        self.assertEqual(len(list(read_archive(stats['path']))), 4)
+
+    def test_many_custom_policies_build_one_condition_per_policy(self):
+        """Tysiące użytkowników z własną polityką nie rozdmuchują zapytania"""
+        User.objects.bulk_create([
+            User(username=f'u{i}', email=f'u{i}@example.com', notification_preferences={'retention_days': {'expiry': 200 + i % 2}})
+            for i in range(3000)
+        ])
+        self.assertEqual(archive_notifications(archive=False)['rows'], 4)
+
+    def test_command_reports_reclaimed_rows(self):
+        out = StringIO()
+        call_command('archive_notifications', dry_run=True, stdout=out)
+        self.assertIn('Powiadomień do usunięcia: 4', out.getvalue())
+        out = StringIO()
+        call_command('archive_notifications', no_archive=True, stdout=out)
+        self.assertIn('Usunięto powiadomień: 4', out.getvalue())
+        self.assertEqual(os.listdir(self.archive_root), [])
+
+class NotificationDigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123',
+            notification_preferences={'digest': {'expiry': 'day', 'low_stock': 'hour'}, 'digest_email': True}
+        )
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        category = Category.objects.create(name='Nabiał')
+        for user in [self.user, self.other]:
+            Product.objects.bulk_create([
+                Product(
+                    name=f'Produkt {i}', category=category, expiry_date=timezone.localdate() + timedelta(days=3),
+                    quantity=5, unit='szt', user=user
+                )
+                for i in range(40)
+            ])
+
+    def test_digest_users_get_events_instead_of_notifications(self):
+        """Użytkownik z podsumowaniem nie dostaje 40 osobnych powiadomień"""
+        generate_expiry_notifications(self.user)
+        generate_expiry_notifications(self.other)
+        generate_expiry_notifications(self.user)
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+        self.assertEqual(NotificationEvent.objects.filter(user=self.user, period='day').count(), 40)
+        self.assertEqual(Notification.objects.filter(user=self.other).count(), 40)
+        self.assertTrue(Job.objects.filter(name='notifications.deliver_digests', status=Job.PENDING).exists())
+
+    def test_deliver_digests_after_period_ends(self):
+        """Po zakończeniu doby zdarzenia stają się jednym powiadomieniem i jednym e-mailem"""
+        generate_expiry_notifications(self.user)
+        self.assertEqual(deliver_digests()['digests'], 0)
+
+        stats = deliver_digests(now=timezone.now() + timedelta(days=1))
+        self.assertEqual(stats, {'digests': 1, 'events': 40, 'emails': 1})
+        digest = Notification.objects.get(user=self.user)
+        self.assertEqual(digest.notification_type, 'expiry')
+        self.assertEqual(digest.payload['count'], 40)
+        self.assertEqual(len(digest.payload['items']), 40)
+        self.assertIn('i 35 więcej', digest.message)
+        self.assertEqual(unread_count(self.user.pk), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.assertIn(digest.title, mail.outbox[0].body)
+
+        # Dostarczone zdarzenia nie wracają przy kolejnym przebiegu reguł
+        generate_expiry_notifications(self.user)
+        self.assertEqual(deliver_digests(now=timezone.now() + timedelta(days=1))['digests'], 0)
+
+    def test_emails_share_one_connection(self):
+        """Wiadomości z jednej partii idą jednym połączeniem backendu poczty"""
+        self.other.notification_preferences = {'digest': {'expiry': 'hour'}, 'digest_email': True}
+        self.other.save()
+        generate_expiry_notifications(self.user)
+        generate_expiry_notifications(self.other)
+        with mock.patch('notifications.digest.get_connection', wraps=get_connection) as connection_factory:
+            stats = deliver_digests(now=timezone.now() + timedelta(days=1))
+        self.assertEqual(stats['emails'], 2)
+        self.assertEqual(connection_factory.call_count, 1)
+
+class ExpirySchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.category = Category.objects.create(name='Nabiał')
+        self.today = timezone.localdate()
+
+    def _product(self, days, **kwargs):
+        return Product.objects.create(
+            name='Mleko', category=self.category, expiry_date=self.today + timedelta(days=days),
+            quantity=5, unit='l', user=self.user, **kwargs
+        )
+
+    def test_next_threshold(self):
+        now = timezone.now()
+        expiry = self.today + timedelta(days=10)
+        self.assertEqual(next_threshold(expiry, now), (ExpirySchedule.WEEK, threshold_time(expiry, 7)))
+        # próg tygodniowy już minął - do obsłużenia od razu
+        expiry = self.today + timedelta(days=3)
+        self.assertEqual(next_threshold(expiry, now), (ExpirySchedule.WEEK, threshold_time(expiry, 7)))
+        self.assertEqual(
+            next_threshold(expiry, after=threshold_time(expiry, 7)), (ExpirySchedule.DAY, threshold_time(expiry, 1))
+        )
+        self.assertIsNone(next_threshold(expiry, after=threshold_time(expiry, 0)))
+        self.assertIsNone(next_threshold(self.today - timedelta(days=1), now))
+
+    def test_product_changes_maintain_schedule(self):
+        """Dodanie, zmiana daty i dezaktywacja produktu aktualizują kolejkę"""
+        product = self._product(30)
+        self.assertEqual(product.expiry_schedule.due_at, threshold_time(product.expiry_date, 7))
+        product.expiry_date = self.today + timedelta(days=60)
+        product.save()
+        self.assertEqual(ExpirySchedule.objects.get().due_at, threshold_time(product.expiry_date, 7))
+        product.is_active = False
+        product.save()
+        self.assertFalse(ExpirySchedule.objects.exists())
+
+    def test_thresholds_fire_in_order(self):
+        """Każdy próg daje jedno powiadomienie w chwili przekroczenia"""
+        product = self._product(10)
+        self.assertEqual(process_due(), 0)
+
+        moments = [threshold_time(product.expiry_date, days) for days in (7, 1, 0)]
+        for moment in moments:
+            self.assertEqual(process_due(now=moment), 1)
+            # ponowne uruchomienie w tej samej chwili nie ma nic do zrobienia
+            self.assertEqual(process_due(now=moment), 0)
+        self.assertFalse(ExpirySchedule.objects.exists())
+        messages = list(Notification.objects.order_by('pk').values_list('message', flat=True))
+        self.assertEqual(messages, [
+            'Produkt "Mleko" przeterminuje się za 7 dni.',
+            'Produkt "Mleko" przeterminuje się za 1 dni.',
+            'Produkt "Mleko" się przeterminował.',
+        ])
+
+    def test_downtime_skips_stale_thresholds(self):
+        """Po przestoju powstaje tylko powiadomienie o ostatnim przekroczonym progu"""
+        product = self._product(10)
+        after_downtime = threshold_time(product.expiry_date, 0) + timedelta(days=2)
+        self.assertEqual(process_due(now=after_downtime), 1)
+        self.assertEqual(
+            list(Notification.objects.values_list('message', flat=True)),
+            ['Produkt "Mleko" się przeterminował.']
+        )
+        self.assertFalse(ExpirySchedule.objects.exists())
+
+        # Przestój między progiem tygodniowym a dniem przed - tylko "za 1 dni"
+        product = self._product(10)
+        moment = threshold_time(product.expiry_date, 1) + timedelta(hours=1)
+        self.assertEqual(process_due(now=moment), 1)
+        self.assertEqual(
+            Notification.objects.filter(product=product).get().message,
+            'Produkt "Mleko" przeterminuje się za 1 dni.'
+        )
+        self.assertEqual(ExpirySchedule.objects.get(product=product).threshold, ExpirySchedule.EXPIRED)
+
+    def test_work_is_proportional_to_due_items(self):
+        """Obsługa progów nie przegląda produktów, których termin nie nadszedł"""
+        Product.objects.bulk_create([
+            Product(
+                name=f'Produkt {i}', category=self.category, expiry_date=self.today + timedelta(days=30 + i),
+                quantity=5, unit='szt', user=self.user
+            )
+            for i in range(50)
+        ])
+        self.assertEqual(rebuild_expiry_schedule(), 50)
+        soon = self._product(8)
+        moment = threshold_time(soon.expiry_date, 7)
+        # zaległe progi + preferencje + INSERT + licznik nieprzeczytanych + przesunięcie terminu (savepoint i UPDATE)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(process_due(now=moment), 1)
+        self.assertLessEqual(len(queries), 7)
+        self.assertEqual(Notification.objects.get().product, soon)
+
+    def test_command_once(self):
+        product = self._product(3)
+        out = StringIO()
+        call_command('run_expiry_scheduler', once=True, stdout=out)
+        self.assertIn('Obsłużono progów: 1', out.getvalue())
+        self.assertEqual(ExpirySchedule.objects.get(product=product).threshold, ExpirySchedule.DAY)
+
+class NotificationTargetPrefetchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.category = Category.objects.create(name='Nabiał')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _add_notifications(self, count):
+        start = ShoppingList.objects.count()
+        for i in range(start, start + count):
+            product = Product.objects.create(
+                name=f'Produkt {i}', category=self.category, expiry_date=timezone.localdate() + timedelta(days=30),
+                quantity=5, unit='szt', user=self.user
+            )
+            create_notification(self.user, 'expiry', 'Produkt', 'Treść', related_object=product)
+            create_notification(
+                self.user, 'shopping_list', 'Lista', 'Treść',
+                related_object=ShoppingList.objects.create(name=f'Lista {i}', user=self.user)
+            )
+
+    def _list_queries(self, url):
+        # Pierwsze żądanie wypełnia cache licznika i typów zawartości
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_view_query_count_is_constant(self):
+        """Strona listy powiadomień ma stałą liczbę zapytań niezależnie od powiązanych obiektów"""
+        self._add_notifications(1)
+        few, response = self._list_queries(reverse('notifications:list'))
+        self.assertContains(response, 'Dotyczy: Lista 0 - testuser')
+        self._add_notifications(4)
+        many, response = self._list_queries(reverse('notifications:list'))
+        self.assertEqual(few, many)
+        self.assertContains(response, 'Dotyczy: Produkt 4')
+
+    def test_feed_serializes_targets_with_constant_queries(self):
+        self._add_notifications(1)
+        few, response = self._list_queries(reverse('notifications:feed'))
+        self._add_notifications(4)
+        many, response = self._list_queries(reverse('notifications:feed'))
+        self.assertEqual(few, many)
+        target = response.json()['results'][0]['target']
+        self.assertEqual(target['type'], 'shopping_list.shoppinglist')
+        self.assertEqual(target['label'], 'Lista 4 - testuser')
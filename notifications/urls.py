@@ -8,5 +8,7 @@ urlpatterns = [
     path('<int:pk>/mark-read/', views.mark_notification_read, name='mark_read'),
     path('mark-all-read/', views.mark_all_read, name='mark_all_read'),
     path('unread-count/', views.get_unread_count, name='unread_count'),
+    path('feed/', views.notification_feed, name='feed'),
+    path('stream/', views.notification_stream, name='stream'),
     path('refresh/', views.refresh_notifications, name='refresh'),
 ] 
\ No newline at end of file
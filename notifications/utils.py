@@ -1,7 +1,11 @@
+import threading
+import weakref
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from .counters import recount_unread_counts
 from .models import Notification
 
-def create_notification(user, notification_type, title, message, related_object=None):
+def create_notification(user, notification_type, title, message, related_object=None, dedupe_key=None):
     """
     Tworzy nowe powiadomienie dla użytkownika.
     
@@ -11,17 +15,83 @@ def create_notification(user, notification_type, title, message, related_object=
         title: Tytuł powiadomienia
         message: Treść powiadomienia
         related_object: Opcjonalny obiekt powiązany z powiadomieniem
+        dedupe_key: Opcjonalny naturalny klucz (services.notification_key) -
+            jeśli powiadomienie z tym kluczem już istnieje, nowe nie jest tworzone
     """
-    notification = Notification.objects.create(
+    notification = Notification(
         user=user,
         notification_type=notification_type,
         title=title,
-        message=message
+        message=message,
+        dedupe_key=dedupe_key
     )
     
     if related_object:
         notification.content_type = ContentType.objects.get_for_model(related_object)
         notification.object_id = related_object.pk
-        notification.save()
     
-    return notification 
\ No newline at end of file
+    if dedupe_key:
+        Notification.objects.bulk_create([notification], ignore_conflicts=True)
+        recount_unread_counts([user.pk])
+    else:
+        notification.save()
+    return notification
+
+def product_notification(product, notification_type, title, message, dedupe_key):
+    """Niezapisane powiadomienie dotyczące produktu (do save_notifications/queue_notification)."""
+    return Notification(
+        user_id=product.user_id,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        product=product,
+        content_type=ContentType.objects.get_for_model(product),
+        object_id=product.pk,
+        link=f'/products/{product.pk}/',
+        dedupe_key=dedupe_key,
+    )
+
+# Bufory powiadomień czekających na zatwierdzenie, osobno w każdym wątku (jak
+# połączenia z bazą): (baza, punkty zapisu) -> bufor. Jedyną silną referencją
+# bufora jest jego flush w kolejce on_commit - gdy Django porzuci flush przy
+# wycofaniu punktu zapisu lub transakcji, wpis znika razem z nim.
+_local = threading.local()
+
+class PendingNotifications:
+    """Powiadomienia jednego poziomu transakcji, zapisywane jednym INSERT-em."""
+
+    def __init__(self):
+        self.notifications = {}
+
+    def add(self, notification):
+        key = (notification.user_id, notification.dedupe_key or id(notification))
+        self.notifications.setdefault(key, notification)
+
+    def flush(self):
+        from .services import save_notifications
+        notifications, self.notifications = list(self.notifications.values()), {}
+        save_notifications(notifications)
+
+def queue_notification(notification, using=None):
+    """
+    Dodaje powiadomienie do zapisu po zatwierdzeniu bieżącej transakcji (poza
+    transakcją zapisuje od razu). Każdy poziom transakcji (punkt zapisu) ma
+    własny bufor z jednym flushem on_commit zarejestrowanym na tym poziomie,
+    więc wycofany punkt zapisu porzuca tylko swoje powiadomienia, a zatwierdzona
+    transakcja zapisuje najwyżej jeden INSERT na poziom (services.save_notifications).
+    Powtórzony klucz dedupe_key jest zapisywany raz.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        from .services import save_notifications
+        save_notifications([notification])
+        return
+    buffers = getattr(_local, 'pending', None)
+    if buffers is None:
+        buffers = _local.pending = weakref.WeakValueDictionary()
+    level = (connection.alias, tuple(connection.savepoint_ids))
+    pending = buffers.get(level)
+    if pending is None:
+        pending = buffers[level] = PendingNotifications()
+        transaction.on_commit(pending.flush, using=using)
+    pending.add(notification)
@@ -1,23 +1,32 @@
+import hashlib
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import condition
 from django.views.generic import ListView
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from .counters import change_unread_count, unread_count
+from fridge_manager.pagination import CursorPaginationMixin, InvalidCursor
+from .feed import FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE, NOTIFICATION_ORDERING, feed_page, serialize_notification
 from .models import Notification
+from .stream import notification_events
 from .services import generate_all_notifications
 
-class NotificationListView(LoginRequiredMixin, ListView):
+class NotificationListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Notification
     template_name = 'notifications/notification_list.html'
     context_object_name = 'notifications'
     paginate_by = 10
+    cursor_ordering = NOTIFICATION_ORDERING
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.filter(user=self.request.user).with_targets()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['unread_count'] = self.get_queryset().filter(read=False).count()
+        context['unread_count'] = unread_count(self.request.user.pk)
         return context
 
 @login_required
@@ -33,7 +42,10 @@ def mark_notification_read(request, pk):
 @login_required
 def mark_all_read(request):
     """Oznacza wszystkie powiadomienia jako przeczytane."""
-    Notification.objects.filter(user=request.user, read=False).update(read=True)
+    with transaction.atomic():
+        marked = Notification.objects.filter(user=request.user, read=False).update(read=True)
+        if marked:
+            change_unread_count(request.user.pk, -marked)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'status': 'success'})
@@ -42,11 +54,78 @@ def mark_all_read(request):
 @login_required
 def get_unread_count(request):
     """Zwraca liczbę nieprzeczytanych powiadomień."""
-    count = Notification.objects.filter(user=request.user, read=False).count()
-    return JsonResponse({'count': count})
+    return JsonResponse({'count': unread_count(request.user.pk)})
+
+def _feed_limit(request):
+    try:
+        limit = int(request.GET.get('limit', FEED_PAGE_SIZE))
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= FEED_MAX_PAGE_SIZE else None
+
+def _feed_etag(request):
+    """
+    ETag z najnowszego powiadomienia i licznika nieprzeczytanych (wiersz licznika):
+    zmienia się, gdy przybędzie, zniknie lub zostanie przeczytane powiadomienie.
+    """
+    latest = Notification.objects.filter(user=request.user).order_by('-pk').values_list('pk', flat=True).first()
+    raw = ':'.join(map(str, [
+        request.user.pk, latest, unread_count(request.user.pk),
+        request.GET.get('cursor', ''), request.GET.get('limit', ''),
+    ]))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+@login_required
+@condition(etag_func=_feed_etag)
+def notification_feed(request):
+    """
+    Lekka lista powiadomień w JSON dla menu w nagłówku.
+    Parametry: limit (1-50, domyślnie 10) i cursor z pola `next` poprzedniej strony.
+    """
+    limit = _feed_limit(request)
+    if limit is None:
+        return HttpResponse('Nieprawidłowy limit', status=400)
+    try:
+        page = feed_page(request.user, request.GET.get('cursor'), limit)
+    except InvalidCursor:
+        return HttpResponse('Nieprawidłowy kursor', status=400)
+    return JsonResponse({
+        'results': [serialize_notification(notification) for notification in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+        'unread_count': unread_count(request.user.pk),
+    })
 
 @login_required
 def refresh_notifications(request):
     """Odświeża powiadomienia dla użytkownika."""
     generate_all_notifications(request.user)
-    return redirect('notifications:list') 
\ No newline at end of file
+    return redirect('notifications:list') 
+
+async def notification_stream(request):
+    """
+    Strumień Server-Sent Events z nowymi powiadomieniami i liczbą nieprzeczytanych.
+    Widok asynchroniczny - czekające połączenia nie zajmują wątków (serwer ASGI).
+    Pod WSGI (runserver, gunicorn) niekończący się strumień zająłby wątek na stałe,
+    więc odpowiedź 204 każe przeglądarce nie wznawiać połączenia i odpytywać licznik.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return HttpResponse('Nieprawidłowy Last-Event-ID', status=400)
+
+    response = StreamingHttpResponse(
+        notification_events(user.pk, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Wyłącza buforowanie odpowiedzi w nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
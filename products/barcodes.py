@@ -0,0 +1,116 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, IntegerField, Value
+from django.utils import timezone
+from .forms import BarcodeCatalogRowForm
+from .importer import IMPORT_BATCH_SIZE, read_rows, resolve_categories
+from .models import BarcodeCatalogEntry, Product
+
+# Najwięcej kodów w jednym zapytaniu skanera
+BARCODE_BATCH_LIMIT = 100
+BARCODE_MAX_LENGTH = Product._meta.get_field('barcode').max_length
+CATALOG_FIELDS = ['barcode', 'name', 'category', 'default_unit', 'shelf_life_days']
+
+def normalize_barcodes(values):
+    """Kody (napisy) bez białych znaków, bez pustych i powtórzeń, w kolejności podania."""
+    return [barcode for barcode in dict.fromkeys(value.strip() for value in values) if barcode]
+
+def resolve_barcodes(user, barcodes):
+    """
+    Rozpoznaje kody jednym zapytaniem: UNION produktów użytkownika (indeks
+    user+barcode) i katalogu (unikalny indeks barcode), oba przez barcode IN (...).
+    Własny produkt ma pierwszeństwo (najnowszy z danym kodem) - użytkownik
+    nazywa rzeczy po swojemu; z katalogu dochodzi wtedy typowy okres przydatności.
+    Zwraca {kod: dane albo None} w kolejności `barcodes`.
+    """
+    barcodes = normalize_barcodes(barcodes)
+    if not barcodes:
+        return {}
+    columns = ('barcode', 'name', 'category_id', 'category__name', 'unit', 'pk', 'source', 'shelf_life')
+    own = Product.objects.filter(user=user, barcode__in=barcodes).annotate(
+        unit_name=F('unit'), source=Value('product'), shelf_life=Value(None, output_field=IntegerField())
+    )
+    catalog = BarcodeCatalogEntry.objects.filter(barcode__in=barcodes).annotate(
+        unit_name=F('default_unit'), source=Value('catalog'), shelf_life=F('shelf_life_days')
+    )
+    fields = [column if column != 'unit' else 'unit_name' for column in columns]
+    rows = own.values_list(*fields).order_by().union(catalog.values_list(*fields).order_by(), all=True)
+
+    products, entries = {}, {}
+    for row in rows:
+        row = dict(zip(columns, row))
+        if row['source'] == 'catalog':
+            entries[row['barcode']] = row
+        elif row['barcode'] not in products or row['pk'] > products[row['barcode']]['pk']:
+            products[row['barcode']] = row
+
+    today = timezone.localdate()
+    results = {}
+    for barcode in barcodes:
+        product, entry = products.get(barcode), entries.get(barcode)
+        match = product or entry
+        if match is None:
+            results[barcode] = None
+            continue
+        shelf_life = entry['shelf_life'] if entry else None
+        results[barcode] = {
+            'source': match['source'],
+            'name': match['name'],
+            'category': {'id': match['category_id'], 'name': match['category__name']} if match['category_id'] else None,
+            'unit': match['unit'],
+            'product_id': product['pk'] if product else None,
+            'shelf_life_days': shelf_life,
+            'expiry_date': today + timedelta(days=shelf_life) if shelf_life is not None else None,
+        }
+    return results
+
+def save_catalog_batch(rows, categories):
+    """Waliduje partię wierszy katalogu i wstawia lub aktualizuje je jednym zapytaniem."""
+    errors, entries = [], {}
+    form = BarcodeCatalogRowForm()
+    for line_number, data in rows:
+        if '__all__' in data:
+            errors.append({'line': line_number, 'errors': data})
+            continue
+        if form.rebind(data).is_valid():
+            # Powtórzony kod w partii - wygrywa ostatni wiersz (upsert nie może
+            # zmienić tego samego wiersza dwa razy w jednym zapytaniu)
+            entries[form.instance.barcode] = (form.instance, form.cleaned_data['category'])
+        else:
+            errors.append({'line': line_number, 'errors': {field: list(messages) for field, messages in form.errors.items()}})
+
+    with transaction.atomic():
+        resolve_categories({name for entry, name in entries.values() if name}, categories)
+        for entry, name in entries.values():
+            entry.category_id = categories[name] if name else None
+        BarcodeCatalogEntry.objects.bulk_create(
+            [entry for entry, name in entries.values()],
+            update_conflicts=True, unique_fields=['barcode'],
+            update_fields=['name', 'category', 'default_unit', 'shelf_life_days', 'updated_at'],
+        )
+    return len(entries), errors
+
+def load_catalog(binary_file, file_format, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Wczytuje katalog kodów z pliku CSV lub JSON Lines (kolumny jak CATALOG_FIELDS;
+    category, default_unit i shelf_life_days opcjonalne). Istniejące kody są aktualizowane.
+    Zwraca {'rows', 'saved', 'errors'} jak import produktów.
+    """
+    categories = {}
+    result = {'rows': 0, 'saved': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        saved, errors = save_catalog_batch(batch, categories)
+        result['saved'] += saved
+        result['errors'].extend(errors)
+        batch.clear()
+
+    for row in read_rows(binary_file, file_format, CATALOG_FIELDS, optional=('category', 'default_unit', 'shelf_life_days')):
+        result['rows'] += 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return result
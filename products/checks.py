@@ -0,0 +1,26 @@
+from django.core.checks import Error, Tags, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from .search import missing_search_objects
+
+@register(Tags.database)
+def check_search_index(app_configs, databases=None, **kwargs):
+    """
+    Indeks wyszukiwania w SQLite utrzymują wyzwalacze, które znikają po
+    przebudowie tabeli products_product przez migrację - wyszukiwarka
+    przestaje wtedy widzieć nowe i zmienione produkty, nie zgłaszając błędu.
+    """
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        recorder = MigrationRecorder(connection)
+        if not recorder.has_table() or ('products', '0005_product_search') not in recorder.applied_migrations():
+            continue
+        missing = missing_search_objects(connection)
+        if missing:
+            errors.append(Error(
+                f'Brak obiektów indeksu wyszukiwania produktów w bazie {alias}: {", ".join(missing)}.',
+                hint='Uruchom manage.py rebuild_product_search.',
+                id='products.E001',
+            ))
+    return errors
@@ -0,0 +1,172 @@
+from datetime import timedelta
+import django_filters
+from django.db.models import BooleanField, Case, CharField, Count, Value, When
+from django.http import QueryDict
+from django.utils import timezone
+from notifications.services import LOW_STOCK_THRESHOLD
+from .models import Product, Category
+
+# Okna dat ważności: nazwa -> przedziały (kubełki) z zapytania fasetowego, które obejmuje
+EXPIRY_CHOICES = (
+    ('expired', 'Przeterminowane'),
+    ('soon', 'Do 3 dni'),
+    ('week', 'Do 7 dni'),
+    ('later', 'Później'),
+)
+EXPIRY_BUCKETS = {
+    'expired': {'expired'},
+    'soon': {'soon'},
+    'week': {'soon', 'week'},
+    'later': {'later'},
+}
+SOON_DAYS = 3
+WEEK_DAYS = 7
+
+LOW_STOCK_CHOICES = (
+    ('true', 'Niski stan'),
+    ('false', 'Wystarczający stan'),
+)
+
+def expiry_bucket():
+    """Kubełek daty ważności liczony w SQL - rozłączne przedziały względem dzisiaj."""
+    today = timezone.localdate()
+    return Case(
+        When(expiry_date__lt=today, then=Value('expired')),
+        When(expiry_date__lte=today + timedelta(days=SOON_DAYS), then=Value('soon')),
+        When(expiry_date__lte=today + timedelta(days=WEEK_DAYS), then=Value('week')),
+        default=Value('later'),
+        output_field=CharField(),
+    )
+
+def low_stock_flag():
+    return Case(
+        When(quantity__lte=LOW_STOCK_THRESHOLD, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Filtry listy produktów: kategoria, okno daty ważności, niski stan i jednostka.
+    `queryset` to aktywne produkty użytkownika - z niego liczone są też fasety.
+    """
+    category = django_filters.ModelChoiceFilter(queryset=Category.objects.all())
+    expiry = django_filters.ChoiceFilter(choices=EXPIRY_CHOICES, method='filter_expiry')
+    low_stock = django_filters.ChoiceFilter(choices=LOW_STOCK_CHOICES, method='filter_low_stock')
+    unit = django_filters.CharFilter()
+
+    class Meta:
+        model = Product
+        fields = ['category', 'expiry', 'low_stock', 'unit']
+
+    def filter_expiry(self, queryset, name, value):
+        today = timezone.localdate()
+        return {
+            'expired': queryset.filter(expiry_date__lt=today),
+            'soon': queryset.filter(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=SOON_DAYS)),
+            'week': queryset.filter(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=WEEK_DAYS)),
+            'later': queryset.filter(expiry_date__gt=today + timedelta(days=WEEK_DAYS)),
+        }[value]
+
+    def filter_low_stock(self, queryset, name, value):
+        if value == 'true':
+            return queryset.filter(quantity__lte=LOW_STOCK_THRESHOLD)
+        return queryset.filter(quantity__gt=LOW_STOCK_THRESHOLD)
+
+    def selected(self):
+        """
+        Wybrane wartości filtrów w postaci porównywalnej z wierszami faset.
+        Nieprawidłowe wartości są pomijane - tak samo jak przy filtrowaniu `qs`.
+        """
+        if not self.is_bound:
+            return {}
+        self.form.is_valid()
+        data = self.form.cleaned_data
+        selected = {}
+        if data.get('category'):
+            selected['category'] = data['category'].pk
+        if data.get('expiry'):
+            selected['expiry'] = data['expiry']
+        if data.get('low_stock'):
+            selected['low_stock'] = data['low_stock'] == 'true'
+        if data.get('unit'):
+            selected['unit'] = data['unit']
+        return selected
+
+    def facet_rows(self):
+        """
+        Jedno zapytanie grupujące aktywne produkty użytkownika po wszystkich wymiarach
+        naraz. Grup jest tyle, ile kombinacji kategoria x jednostka x okno x stan,
+        niezależnie od liczby produktów.
+        """
+        return list(
+            self.queryset
+            .annotate(bucket=expiry_bucket(), low=low_stock_flag())
+            .values('category_id', 'category__name', 'unit', 'bucket', 'low')
+            .annotate(count=Count('pk'))
+            .order_by()
+        )
+
+    def facets(self):
+        """
+        Liczniki dla każdej opcji każdego filtra. Licznik opcji uwzględnia wybrane
+        pozostałe filtry, ale nie wybór w tym samym filtrze - tyle produktów
+        pokaże lista po przełączeniu na tę opcję.
+        """
+        rows = self.facet_rows()
+        selected = self.selected()
+
+        def matches(row, skip):
+            for name, value in selected.items():
+                if name == skip:
+                    continue
+                if name == 'category' and row['category_id'] != value:
+                    return False
+                if name == 'expiry' and row['bucket'] not in EXPIRY_BUCKETS[value]:
+                    return False
+                if name == 'low_stock' and row['low'] != value:
+                    return False
+                if name == 'unit' and row['unit'] != value:
+                    return False
+            return True
+
+        def count(name, test):
+            return sum(row['count'] for row in rows if matches(row, name) and test(row))
+
+        categories = sorted({(row['category_id'], row['category__name']) for row in rows}, key=lambda item: item[1])
+        units = sorted({row['unit'] for row in rows})
+        return {
+            'category': [
+                self._option('category', pk, label, count('category', lambda row: row['category_id'] == pk), selected)
+                for pk, label in categories
+            ],
+            'expiry': [
+                self._option('expiry', value, label, count('expiry', lambda row: row['bucket'] in EXPIRY_BUCKETS[value]), selected)
+                for value, label in EXPIRY_CHOICES
+            ],
+            'low_stock': [
+                self._option('low_stock', value == 'true', label, count('low_stock', lambda row: row['low'] == (value == 'true')), selected, value)
+                for value, label in LOW_STOCK_CHOICES
+            ],
+            'unit': [
+                self._option('unit', unit, unit, count('unit', lambda row: row['unit'] == unit), selected)
+                for unit in units
+            ],
+        }
+
+    def _option(self, name, value, label, count, selected, param=None):
+        """Opcja fasety z adresem, który ją włącza (lub wyłącza, gdy jest wybrana)."""
+        is_selected = selected.get(name) == value
+        query = self.data.copy() if isinstance(self.data, QueryDict) else QueryDict(mutable=True)
+        query.pop('cursor', None)
+        if is_selected:
+            query.pop(name, None)
+        else:
+            query[name] = value if param is None else param
+        return {
+            'value': value,
+            'label': label,
+            'count': count,
+            'selected': is_selected,
+            'query': query.urlencode(),
+        }
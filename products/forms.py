@@ -1,5 +1,5 @@
 from django import forms
-from .models import Product, Category
+from .models import BarcodeCatalogEntry, Product, Category
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Row, Column, Field
 
@@ -52,4 +52,59 @@ class ProductForm(forms.ModelForm):
                 css_class='form-row'
             ),
             Submit('submit', 'Zapisz produkt', css_class='btn-primary mt-3')
-        ) 
\ No newline at end of file
+        )
+
+
+class BatchRowFormMixin:
+    """
+    Formularz walidujący kolejne wiersze pliku jedną instancją. Konstruktor
+    kopiuje (deepcopy) wszystkie pola, co przy dziesiątkach tysięcy wierszy
+    kosztuje więcej niż sama walidacja - `rebind` podpina tylko nowe dane.
+    """
+    def rebind(self, data):
+        self.data = data
+        self.is_bound = True
+        self._errors = None
+        self.instance = self._meta.model()
+        return self
+
+    def _post_clean(self):
+        # Pola formularza powstały z pól modelu i mają te same walidatory
+        # (max_length, max_digits), więc full_clean() modelu dla każdego wiersza
+        # powtórzyłby tylko tę samą walidację (a unikalność - zapytaniem na wiersz)
+        forms.models.construct_instance(self, self.instance, self._meta.fields)
+
+
+class ProductImportRowForm(BatchRowFormMixin, forms.ModelForm):
+    """
+    Walidacja jednego wiersza importu - te same pola i reguły co ProductForm,
+    ale kategoria podawana jest nazwą (rozwiązywaną potem dla całej partii naraz)
+    i bez układu crispy, zbędnego przy tysiącach wierszy.
+    """
+    category = forms.CharField(max_length=Category._meta.get_field('name').max_length)
+
+    class Meta:
+        model = Product
+        fields = [field for field in ProductForm.Meta.fields if field != 'category']
+
+    def clean_category(self):
+        return self.cleaned_data['category'].strip()
+
+
+class BarcodeCatalogRowForm(BatchRowFormMixin, forms.ModelForm):
+    """Wiersz pliku katalogu kodów kreskowych; kategoria (opcjonalna) podawana nazwą."""
+    category = forms.CharField(max_length=Category._meta.get_field('name').max_length, required=False)
+
+    class Meta:
+        model = BarcodeCatalogEntry
+        fields = ['barcode', 'name', 'default_unit', 'shelf_life_days']
+
+    def clean_barcode(self):
+        return self.cleaned_data['barcode'].strip()
+
+    def clean_category(self):
+        return self.cleaned_data['category'].strip()
+
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(label='Plik CSV lub JSON Lines')
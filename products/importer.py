@@ -0,0 +1,188 @@
+import codecs
+import csv
+import io
+import json
+from django.db import transaction
+from notifications.scheduler import schedule_products
+from notifications.services import generate_all_notifications
+from .forms import ProductImportRowForm
+from .models import Product, Category
+
+# Wiersze walidowane, łączone z kategoriami i zapisywane partiami po tyle
+IMPORT_BATCH_SIZE = 1000
+# Tyle błędów pokazuje strona wyniku importu (raport CSV zawiera wszystkie)
+IMPORT_ERROR_DISPLAY_LIMIT = 200
+IMPORT_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+IMPORT_FIELDS = ['name', 'barcode', 'category', 'expiry_date', 'quantity', 'unit']
+
+class ImportFormatError(ValueError):
+    # Wynik importu przerwanego w środku pliku - partie sprzed błędu są zapisane
+    result = None
+
+def import_format(filename):
+    """Format pliku na podstawie rozszerzenia nazwy."""
+    for extension, file_format in IMPORT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    raise ImportFormatError(f'Nieobsługiwany format pliku: {filename} (dozwolone: {", ".join(IMPORT_FORMATS)})')
+
+def decode_lines(binary_file, bad_lines):
+    """
+    Linie pliku binarnego dekodowane z UTF-8 pojedynczo. Numer linii, której
+    nie da się zdekodować, trafia do `bad_lines`, a linia - z zamiennikami
+    w miejscu błędnych bajtów - idzie dalej, więc odczyt nie jest przerywany.
+    """
+    line_number = 0
+    for chunk in binary_file:
+        for raw in chunk.splitlines(keepends=True):
+            line_number += 1
+            if line_number == 1 and raw.startswith(codecs.BOM_UTF8):
+                raw = raw[len(codecs.BOM_UTF8):]
+            try:
+                yield raw.decode('utf-8')
+            except UnicodeDecodeError:
+                bad_lines.add(line_number)
+                yield raw.decode('utf-8', errors='replace')
+
+def read_rows(binary_file, file_format, fields=IMPORT_FIELDS, optional=('barcode',)):
+    """
+    Strumieniowo czyta plik binarny i zwraca pary (numer wiersza, dane albo błąd).
+    Numer wiersza to numer linii pliku (w CSV wiersz nagłówka ma numer 1).
+    Kolumny `fields` spoza `optional` są w pliku CSV wymagane.
+    Wiersz z bajtami spoza UTF-8 jest błędem tego wiersza, a nie całego pliku.
+    """
+    # Linie zdekodowane z błędem od ostatniego wiersza - czytnik CSV nie czyta
+    # z wyprzedzeniem, więc należą do wiersza, który właśnie zwrócił
+    bad_lines = set()
+    lines = decode_lines(binary_file, bad_lines)
+    encoding_error = {'__all__': ['Wiersz nie jest zapisany w UTF-8']}
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            fieldnames = reader.fieldnames or []
+        except csv.Error as e:
+            raise ImportFormatError(f'Nieprawidłowy nagłówek CSV: {e}')
+        if bad_lines:
+            raise ImportFormatError('Plik musi być zapisany w UTF-8')
+        missing = set(fields) - set(optional) - set(fieldnames)
+        if missing:
+            raise ImportFormatError(f'Brak kolumn: {", ".join(sorted(missing))}')
+        try:
+            for row in reader:
+                if bad_lines:
+                    bad_lines.clear()
+                    yield reader.line_num, encoding_error
+                else:
+                    yield reader.line_num, row
+        except csv.Error as e:
+            raise ImportFormatError(f'Nieprawidłowy CSV w linii {reader.line_num}: {e}')
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            if bad_lines:
+                bad_lines.clear()
+                yield line_number, encoding_error
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'__all__': [f'Nieprawidłowy JSON: {e}']}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, {'__all__': ['Wiersz musi być obiektem JSON']}
+                continue
+            yield line_number, {field: row.get(field) for field in fields}
+
+def resolve_categories(names, cache):
+    """
+    ID kategorii dla nazw z partii: jedno zapytanie o nieznane jeszcze nazwy
+    i jeden bulk_create brakujących. `cache` (nazwa -> ID) przechodzi między partiami.
+    """
+    missing = set(names) - set(cache)
+    if not missing:
+        return
+    # Przy powtarzających się nazwach wygrywa najstarsza kategoria
+    for pk, name in Category.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+        cache[name] = pk
+    created = Category.objects.bulk_create([Category(name=name) for name in sorted(missing - set(cache))])
+    cache.update((category.name, category.pk) for category in created)
+
+def save_batch(user, rows, categories):
+    """Waliduje partię wierszy i zapisuje poprawne w jednej transakcji. Zwraca (liczba, błędy, produkty)."""
+    errors, valid = [], []
+    form = ProductImportRowForm()
+    for line_number, data in rows:
+        if '__all__' in data:
+            errors.append({'line': line_number, 'errors': data})
+            continue
+        if form.rebind(data).is_valid():
+            valid.append((form.instance, form.cleaned_data['category']))
+        else:
+            errors.append({'line': line_number, 'errors': {field: list(messages) for field, messages in form.errors.items()}})
+
+    with transaction.atomic():
+        resolve_categories({name for product, name in valid}, categories)
+        products = []
+        for product, name in valid:
+            product.user = user
+            product.category_id = categories[name]
+            products.append(product)
+        Product.objects.bulk_create(products)
+    return len(products), errors, products
+
+def import_products(user, binary_file, file_format, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importuje produkty użytkownika z pliku CSV lub JSON Lines.
+    Każda partia to osobna transakcja - błędny wiersz nie cofa pozostałych.
+    bulk_create nie wysyła sygnałów, więc zamiast reguł powiadomień dla każdego
+    produktu po imporcie wykonywany jest jeden przegląd reguł użytkownika
+    i jedno zaplanowanie progów ważności.
+    Zwraca {'rows', 'created', 'errors': [{'line', 'errors': {pole: [komunikaty]}}]};
+    ImportFormatError w środku pliku niesie ten wynik dla zapisanych już partii w `result`.
+    """
+    categories = {}
+    result = {'rows': 0, 'created': 0, 'errors': []}
+    imported = []
+    batch = []
+
+    def flush():
+        created, errors, products = save_batch(user, batch, categories)
+        result['created'] += created
+        result['errors'].extend(errors)
+        imported.extend((product.pk, product.expiry_date) for product in products)
+        batch.clear()
+
+    try:
+        for row in read_rows(binary_file, file_format):
+            result['rows'] += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except ImportFormatError as e:
+        if result['rows']:
+            e.result = result
+        raise
+    finally:
+        # Również po błędzie w środku pliku - zapisane partie zostają w bazie
+        if imported:
+            schedule_products(Product(pk=pk, expiry_date=expiry_date) for pk, expiry_date in imported)
+            generate_all_notifications(user)
+    return result
+
+def error_report_csv(errors):
+    """Raport błędów importu jako CSV: linia, pole, komunikat."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['linia', 'pole', 'błąd'])
+    for error in errors:
+        for field, messages in error['errors'].items():
+            for message in messages:
+                writer.writerow([error['line'], '' if field == '__all__' else field, message])
+    return output.getvalue()
@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from products.models import Category, Product
+from products.search import AUTOCOMPLETE_LIMIT, search_product_ids
+
+WORDS = [
+    'mleko', 'ser', 'jogurt', 'masło', 'śmietana', 'kefir', 'twaróg', 'chleb', 'bułka', 'szynka',
+    'kiełbasa', 'jajka', 'pomidor', 'ogórek', 'papryka', 'jabłko', 'banan', 'sok', 'woda', 'herbata',
+    'kawa', 'makaron', 'ryż', 'mąka', 'cukier', 'sól', 'olej', 'kurczak', 'łosoś', 'dżem',
+]
+CATEGORIES = ['Nabiał', 'Pieczywo', 'Mięso', 'Warzywa', 'Owoce', 'Napoje', 'Sypkie', 'Ryby', 'Mrożonki', 'Słodycze']
+QUALIFIERS = ['naturalny', 'light', 'bio', 'wiejski', 'pełnotłusty', 'owocowy', 'żytni', 'wędzony', 'świeży', 'mrożony']
+
+class Command(BaseCommand):
+    help = (
+        'Mierzy czas zapytań podpowiedzi wyszukiwarki na wygenerowanych produktach '
+        '(w transakcji wycofywanej po pomiarze - baza zostaje bez zmian).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--target-ms', type=float, default=10.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username=f'benchmark-{time.time_ns()}')
+            categories = Category.objects.bulk_create([Category(name=name) for name in CATEGORIES])
+            today = timezone.localdate()
+            started = time.perf_counter()
+            Product.objects.bulk_create((
+                Product(
+                    name=f'{rng.choice(WORDS)} {rng.choice(QUALIFIERS)} {i}',
+                    barcode=f'590{i:010d}',
+                    category=rng.choice(categories),
+                    expiry_date=today + timedelta(days=rng.randrange(60)),
+                    quantity=1,
+                    unit='szt',
+                    user=user,
+                )
+                for i in range(options['products'])
+            ), batch_size=2000)
+            self.stdout.write(f"Produktów: {options['products']} ({time.perf_counter() - started:.1f} s)")
+
+            # Zapytania jak przy pisaniu w polu wyszukiwania: prefiksy 2-4 znaków i dwa słowa
+            queries = []
+            for _ in range(options['queries']):
+                word = rng.choice(WORDS)
+                query = word[:rng.randint(2, 4)]
+                if rng.random() < 0.3:
+                    query = f'{word} {rng.choice(QUALIFIERS)[:3]}'
+                queries.append(query)
+            for query in queries[:20]:
+                search_product_ids(user, query, AUTOCOMPLETE_LIMIT)
+
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                search_product_ids(user, query, AUTOCOMPLETE_LIMIT)
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        summary = (
+            f'Podpowiedzi ({len(timings)} zapytań): mediana {statistics.median(timings):.2f} ms, '
+            f'p95 {p95:.2f} ms, maks. {timings[-1]:.2f} ms (cel: {options["target_ms"]:g} ms)'
+        )
+        style = self.style.SUCCESS if p95 <= options['target_ms'] else self.style.WARNING
+        self.stdout.write(style(summary))
@@ -0,0 +1,35 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import IMPORT_BATCH_SIZE, ImportFormatError, error_report_csv, import_format, import_products
+
+class Command(BaseCommand):
+    help = 'Importuje produkty użytkownika z pliku CSV lub JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--errors', help='Ścieżka pliku CSV z raportem błędów')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"Nie ma użytkownika {options['username']}")
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_products(user, file, import_format(options['path']), options['batch_size'])
+        except ImportFormatError as e:
+            if e.result:
+                raise CommandError(f"{e} (przerwano po {e.result['rows']} wierszach, zaimportowano: {e.result['created']})")
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(str(e))
+        if result['errors'] and options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8', newline='') as report:
+                report.write(error_report_csv(result['errors']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Wierszy: {result['rows']}, zaimportowano: {result['created']}, "
+            f"błędnych: {len(result['errors'])} ({time.perf_counter() - started:.1f} s)"
+        ))
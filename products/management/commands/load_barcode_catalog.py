@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.barcodes import load_catalog
+from products.importer import IMPORT_BATCH_SIZE, ImportFormatError, error_report_csv, import_format
+
+class Command(BaseCommand):
+    help = 'Wczytuje katalog kodów kreskowych z pliku CSV lub JSON Lines (istniejące kody są aktualizowane).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--errors', help='Ścieżka pliku CSV z raportem błędów')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                result = load_catalog(file, import_format(options['path']), options['batch_size'])
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        if result['errors'] and options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8', newline='') as report:
+                report.write(error_report_csv(result['errors']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Wierszy: {result['rows']}, zapisano: {result['saved']}, błędnych: {len(result['errors'])}"
+        ))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from products.search import rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Odtwarza indeks wyszukiwania produktów (np. po migracji przebudowującej tabelę produktów).'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Indeks wyszukiwania produktów został odbudowany.'))
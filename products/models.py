@@ -22,12 +22,76 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
-    
+
+    # Pola, których zmiany są śledzone (reguły powiadomień reagują na ilość i daty,
+    # raporty na nazwę i kategorię widoczne w ich wierszach)
+    TRACKED_FIELDS = ('expiry_date', 'quantity', 'is_active', 'name', 'category_id')
+
     def __str__(self):
         return f"{self.name} ({self.quantity} {self.unit})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked_values()
+        return instance
+
+    def _remember_tracked_values(self):
+        # Tylko pola faktycznie wczytane - odroczone (only/defer) nie wywołają zapytania
+        self._loaded_values = {
+            field: self.__dict__[field] for field in self.TRACKED_FIELDS if field in self.__dict__
+        }
+
+    def has_changed(self, *fields):
+        """
+        Czy któreś z pól różni się od wartości wczytanej z bazy.
+        Dla nowego obiektu (lub pola, którego nie wczytano) zwraca True.
+        """
+        loaded = getattr(self, '_loaded_values', {})
+        return any(
+            field not in loaded or loaded[field] != self.__dict__.get(field)
+            for field in fields
+        )
+
+    def save(self, *args, **kwargs):
+        # Sygnały post_save widzą jeszcze stare wartości; po zapisie stają się bieżącymi
+        super().save(*args, **kwargs)
+        self._remember_tracked_values()
     
     class Meta:
         ordering = ['expiry_date']
+        indexes = [
+            # Lista aktywnych produktów użytkownika wg daty ważności. Indeks częściowy,
+            # bo warunek is_active trafia do SQL jako samo pole, a nie porównanie.
+            models.Index(fields=['user', 'expiry_date'], condition=models.Q(is_active=True), name='product_user_active_expiry_idx'),
+            # Przeglądy dat ważności wszystkich użytkowników pomijają produkty nieaktywne
+            models.Index(fields=['expiry_date'], condition=models.Q(is_active=True), name='product_active_expiry_idx'),
+            # Lista filtrowana po kategorii - zawężenie i sortowanie z jednego indeksu
+            models.Index(fields=['user', 'category', 'expiry_date'], condition=models.Q(is_active=True), name='product_user_category_idx'),
+            # Fasety listy: zakres jednego użytkownika, a kolumny grupowania
+            # (kategoria, jednostka, data, ilość) w kolejności indeksu
+            models.Index(
+                fields=['user', 'category', 'unit', 'expiry_date', 'quantity'],
+                condition=models.Q(is_active=True), name='product_user_facets_idx'
+            ),
+            # Rozpoznawanie zeskanowanych kodów: barcode IN (...) w obrębie użytkownika
+            models.Index(fields=['user', 'barcode'], name='product_user_barcode_idx'),
+        ]
+
+class BarcodeCatalogEntry(models.Model):
+    """Lokalny katalog kodów kreskowych - podpowiedzi przy dodawaniu zeskanowanego produktu."""
+    barcode = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=200)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='catalog_entries')
+    default_unit = models.CharField(max_length=20, blank=True)
+    shelf_life_days = models.PositiveIntegerField(null=True, blank=True)  # typowy okres przydatności
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Barcode catalog entries"
+
+    def __str__(self):
+        return f"{self.barcode} - {self.name}"
 
 class ProductConsumption(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='consumptions')
@@ -0,0 +1,283 @@
+import base64
+import binascii
+import json
+import re
+from datetime import date
+from django.db import connection, transaction
+from django.db.models import Q
+from fridge_manager.pagination import CursorPage, InvalidCursor
+from .models import Product
+
+# Domyślna liczba najlepszych dopasowań (search_products); lista produktów
+# stronicuje wyniki kursorem (SearchPaginator) i tego limitu nie ma
+SEARCH_LIMIT = 50
+AUTOCOMPLETE_LIMIT = 10
+# Najwyżej tyle słów z zapytania trafia do wyszukiwarki
+MAX_TERMS = 8
+
+# SQLite: indeks FTS5 (nazwa, kod kreskowy, nazwa kategorii) utrzymywany przez
+# wyzwalacze. unicode61 z remove_diacritics - "zołty" znajduje "Żółty"
+# (ł nie ma rozkładu na literę z akcentem, więc zostaje);
+# indeksy prefiksów 2 i 3 znaków przyspieszają podpowiedzi.
+# Uwaga: gdy migracja przebudowuje tabelę products_product (ALTER w SQLite),
+# wyzwalacze znikają razem ze starą tabelą - wtedy: manage.py rebuild_product_search
+# (brak wyzwalaczy zgłasza check products.E001, np. przy migrate).
+SQLITE_TABLE = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5(
+    name, barcode, category_name, user_id,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+)
+'''
+SQLITE_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts (rowid, name, barcode, category_name, user_id)
+        VALUES (new.id, new.name, coalesce(new.barcode, ''),
+                (SELECT name FROM products_category WHERE id = new.category_id), new.user_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_update
+    AFTER UPDATE OF name, barcode, category_id, user_id ON products_product BEGIN
+        UPDATE products_product_fts SET
+            name = new.name,
+            barcode = coalesce(new.barcode, ''),
+            category_name = (SELECT name FROM products_category WHERE id = new.category_id),
+            user_id = new.user_id
+        WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_delete AFTER DELETE ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_category_fts_update AFTER UPDATE OF name ON products_category BEGIN
+        UPDATE products_product_fts SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM products_product WHERE category_id = new.id);
+    END
+    ''',
+]
+SQLITE_FILL = '''
+INSERT INTO products_product_fts (rowid, name, barcode, category_name, user_id)
+SELECT p.id, p.name, coalesce(p.barcode, ''), c.name, p.user_id
+FROM products_product p JOIN products_category c ON c.id = p.category_id
+'''
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS products_category_fts_update',
+    'DROP TRIGGER IF EXISTS products_product_fts_delete',
+    'DROP TRIGGER IF EXISTS products_product_fts_update',
+    'DROP TRIGGER IF EXISTS products_product_fts_insert',
+    'DROP TABLE IF EXISTS products_product_fts',
+]
+
+# PostgreSQL: indeksy GIN utrzymuje sama baza - tsvector dla wyszukiwania
+# z rankingiem i trigramy dla dopasowań przybliżonych w nazwach
+POSTGRES_CREATE = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    '''
+    CREATE INDEX IF NOT EXISTS products_product_search_idx ON products_product
+    USING gin (to_tsvector('simple', name || ' ' || coalesce(barcode, '')))
+    ''',
+    'CREATE INDEX IF NOT EXISTS products_product_name_trgm_idx ON products_product USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS products_category_name_trgm_idx ON products_category USING gin (name gin_trgm_ops)',
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS products_category_name_trgm_idx',
+    'DROP INDEX IF EXISTS products_product_name_trgm_idx',
+    'DROP INDEX IF EXISTS products_product_search_idx',
+]
+
+def missing_search_objects(db):
+    """Nazwy brakujących tabel i wyzwalaczy indeksu wyszukiwania (tylko SQLite)."""
+    if db.vendor != 'sqlite':
+        return []
+    expected = re.findall(r'IF NOT EXISTS (\w+)', ' '.join([SQLITE_TABLE, *SQLITE_TRIGGERS]))
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN ({})'.format(', '.join(['%s'] * len(expected))),
+            expected,
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+    return [name for name in expected if name not in existing]
+
+def _execute(db, statements):
+    with db.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+def create_search_index(db):
+    """Tworzy indeks wyszukiwania dla bazy połączenia `db` (wołane z migracji)."""
+    if db.vendor == 'sqlite':
+        _execute(db, [SQLITE_TABLE, *SQLITE_TRIGGERS, SQLITE_FILL])
+    elif db.vendor == 'postgresql':
+        _execute(db, POSTGRES_CREATE)
+
+def drop_search_index(db):
+    _execute(db, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(db.vendor, []))
+
+def rebuild_search_index():
+    """Usuwa i tworzy od nowa indeks razem z wyzwalaczami, wypełniając go z tabel."""
+    with transaction.atomic():
+        drop_search_index(connection)
+        create_search_index(connection)
+
+def search_terms(query):
+    """Słowa zapytania bez znaków specjalnych składni FTS/tsquery."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+def search_ranked(user, query, limit=SEARCH_LIMIT, queryset=None, after=None, backwards=False):
+    """
+    Aktywne produkty użytkownika pasujące do zapytania, od najlepszego, jako
+    lista (id, klucz sortowania). Każde słowo musi pasować jako prefiks nazwy,
+    kodu kreskowego lub kategorii. Klucz (trafność, data ważności, id) jednoznacznie
+    wyznacza pozycję wyniku - `after` (klucz) zwraca wyniki za nim, a z `backwards`
+    przed nim, od najbliższego; tak stronicuje SearchPaginator.
+    `queryset` (np. produkty spełniające filtry listy) zawęża wyniki przed LIMIT,
+    więc filtry nie gubią trafień spoza `limit` najlepszych dopasowań.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    restrict, restrict_params = '', []
+    if queryset is not None:
+        subquery, restrict_params = queryset.order_by().values('pk').query.sql_with_params()
+        restrict = f'AND p.id IN ({subquery})'
+    if connection.vendor == 'sqlite':
+        # bm25: nazwa waży najwięcej, potem kod kreskowy i kategoria (mniej = lepiej)
+        keys = ['search_rank', 'expiry_date', 'id']
+        sql = '''
+            SELECT p.id, bm25(products_product_fts, 10.0, 5.0, 2.0, 0.0) AS search_rank, p.expiry_date
+            FROM products_product_fts f
+            JOIN products_product p ON p.id = f.rowid
+            WHERE products_product_fts MATCH %s AND p.is_active {restrict}
+        '''.format(restrict=restrict)
+        words = ' '.join(f'"{term}"*' for term in terms)
+        params = [f'user_id : "{user.pk}" AND {{name barcode category_name}} : ({words})', *restrict_params]
+    elif connection.vendor == 'postgresql':
+        # Trafność z minusem, żeby wszystkie pola klucza rosły
+        keys = ['search_rank', 'search_similarity', 'expiry_date', 'id']
+        sql = '''
+            SELECT p.id,
+                   -ts_rank(to_tsvector('simple', p.name || ' ' || coalesce(p.barcode, '')), to_tsquery('simple', %s)) AS search_rank,
+                   -similarity(p.name, %s) AS search_similarity,
+                   p.expiry_date
+            FROM products_product p
+            JOIN products_category c ON c.id = p.category_id
+            WHERE p.user_id = %s AND p.is_active {restrict} AND (
+                to_tsvector('simple', p.name || ' ' || coalesce(p.barcode, '')) @@ to_tsquery('simple', %s)
+                OR p.name %% %s OR c.name %% %s
+            )
+        '''.format(restrict=restrict)
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        text = ' '.join(terms)
+        params = [tsquery, text, user.pk, *restrict_params, tsquery, text, text]
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(barcode__icontains=term) | Q(category__name__icontains=term)
+        products = Product.objects if queryset is None else queryset
+        products = products.filter(condition, user=user, is_active=True)
+        if after is not None:
+            expiry_date, pk = after
+            lookup = 'lt' if backwards else 'gt'
+            products = products.filter(
+                Q(**{f'expiry_date__{lookup}': expiry_date})
+                | Q(expiry_date=expiry_date, **{f'pk__{lookup}': pk})
+            )
+        ordering = ['-expiry_date', '-pk'] if backwards else ['expiry_date', 'pk']
+        return [
+            (pk, (expiry_date, pk))
+            for pk, expiry_date in products.order_by(*ordering).values_list('pk', 'expiry_date')[:limit]
+        ]
+
+    columns = ', '.join(keys)
+    where = ''
+    if after is not None:
+        where = 'WHERE ({columns}) {op} ({values})'.format(
+            columns=columns, op='<' if backwards else '>', values=', '.join(['%s'] * len(keys))
+        )
+        params += list(after)
+    direction = ' DESC' if backwards else ''
+    sql = 'SELECT id, {columns} FROM ({sql}) ranked {where} ORDER BY {ordering} LIMIT %s'.format(
+        columns=columns, sql=sql, where=where, ordering=', '.join(key + direction for key in keys)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [(row[0], tuple(row[1:])) for row in cursor.fetchall()]
+
+def search_product_ids(user, query, limit=SEARCH_LIMIT, queryset=None):
+    """ID najlepiej pasujących produktów (patrz search_ranked)."""
+    return [pk for pk, key in search_ranked(user, query, limit, queryset)]
+
+def search_products(user, query, limit=SEARCH_LIMIT, queryset=None):
+    """
+    Produkty pasujące do zapytania w kolejności trafności.
+    `queryset` zawęża wyniki, np. do produktów spełniających filtry listy.
+    """
+    ids = search_product_ids(user, query, limit, queryset)
+    if queryset is None:
+        queryset = Product.objects.select_related('category')
+    products = queryset.in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+class SearchPaginator:
+    """
+    Stronicowanie wyników wyszukiwania w kolejności trafności - kursorem jest
+    klucz sortowania (trafność, data ważności, id) wiersza na granicy strony,
+    więc kolejne strony nie mają limitu SEARCH_LIMIT ani OFFSET.
+    Interfejs jak CursorPaginator (CursorPaginationMixin.get_cursor_paginator).
+    """
+    def __init__(self, user, query, queryset, per_page):
+        self.user = user
+        self.query = query
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def encode_cursor(self, key, direction):
+        values = [value.isoformat() if isinstance(value, date) else value for value in key]
+        raw = json.dumps([direction, values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) < 2:
+                raise InvalidCursor(cursor)
+            # Klucz kończy się datą ważności i id; wcześniejsze pola to liczby (trafność)
+            *ranks, expiry_date, pk = values
+            return direction, (
+                *(float(rank) for rank in ranks), date.fromisoformat(expiry_date), int(pk)
+            )
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def page(self, cursor=None):
+        direction, after = 'next', None
+        if cursor:
+            direction, after = self.decode_cursor(cursor)
+        backwards = direction == 'prev'
+        rows = search_ranked(
+            self.user, self.query, self.per_page + 1, self.queryset, after=after, backwards=backwards
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = bool(rows), has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor) and bool(rows)
+
+        products = self.queryset.in_bulk([pk for pk, key in rows])
+        return CursorPage(
+            [products[pk] for pk, key in rows if pk in products],
+            self.encode_cursor(rows[-1][1], 'next') if has_next else None,
+            self.encode_cursor(rows[0][1], 'prev') if has_previous else None,
+            self,
+        )
+
+    def estimated_total(self):
+        # Liczenie wszystkich trafień kosztowałoby tyle co pełne wyszukiwanie
+        return None
@@ -1,3 +1,563 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from unittest import mock, skipUnless
+from io import BytesIO, StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from fridge_manager.pagination import CursorPaginator, InvalidCursor
+from notifications.models import ExpirySchedule
+from .barcodes import load_catalog, resolve_barcodes
+from .checks import check_search_index
+from .models import BarcodeCatalogEntry, Product, Category
+from .importer import error_report_csv, import_products
+from .search import SEARCH_LIMIT, search_product_ids, search_products
 
-# Create your tests here.
+User = get_user_model()
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        category = Category.objects.create(name='Nabiał')
+        # Po kilka produktów z tą samą datą - kolejność rozstrzyga id
+        Product.objects.bulk_create([
+            Product(
+                name=f'Produkt {i}', category=category,
+                expiry_date=timezone.localdate() + timedelta(days=i // 3),
+                quantity=1, unit='szt', user=self.user
+            )
+            for i in range(25)
+        ])
+        self.products = Product.objects.filter(user=self.user)
+        self.expected = list(self.products.order_by('expiry_date', 'id').values_list('pk', flat=True))
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_walk_forward_and_back(self):
+        """Kursory next/prev przechodzą wszystkie wiersze bez powtórzeń w obu kierunkach"""
+        paginator = CursorPaginator(self.products, ('expiry_date', 'id'), 10)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual([product.pk for page in pages for product in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual([product.pk for product in previous], self.expected[10:20])
+        first = paginator.page(previous.previous_cursor)
+        self.assertEqual([product.pk for product in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+    def test_descending_ordering(self):
+        paginator = CursorPaginator(self.products, ('-expiry_date', '-id'), 20)
+        second = paginator.page(paginator.page().next_cursor)
+        self.assertEqual([product.pk for product in second], self.expected[:5][::-1])
+
+    def test_estimated_total(self):
+        self.assertEqual(CursorPaginator(self.products, ('id',), 10, estimate_cap=100).estimated_total(), (25, True))
+        self.assertEqual(CursorPaginator(self.products, ('id',), 10, estimate_cap=20).estimated_total(), (20, False))
+        self.assertIsNone(CursorPaginator(self.products, ('id',), 10).estimated_total())
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(self.products, ('expiry_date', 'id'), 10)
+        for cursor in ['zły', 'WyJ4Il0', 'WyJuZXh0IiwgWyJqdXRybyIsICIxIl1d']:
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+        self.assertEqual(self.client.get(reverse('products:list'), {'cursor': 'zły'}).status_code, 404)
+
+    def test_list_view_pages_cost_the_same(self):
+        """Głęboka strona listy produktów ma tyle zapytań co pierwsza, bez COUNT(*) całej tabeli"""
+        url = reverse('products:list')
+        with CaptureQueriesContext(connection) as first_queries:
+            response = self.client.get(url)
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'cursor': cursor})
+        with CaptureQueriesContext(connection) as deep_queries:
+            response = self.client.get(url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(len(first_queries), len(deep_queries))
+        self.assertNotIn('OFFSET', ' '.join(query['sql'] for query in deep_queries.captured_queries))
+        self.assertEqual([product.pk for product in response.context['products']], self.expected[20:])
+        self.assertContains(response, 'Razem: 25')
+        self.assertContains(response, 'Poprzednia')
+        self.assertNotContains(response, 'Następna')
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.dairy = Category.objects.create(name='Nabiał')
+        self.drinks = Category.objects.create(name='Napoje mleczne')
+        expiry_date = timezone.localdate() + timedelta(days=5)
+
+        def product(name, category, user=None, **kwargs):
+            return Product.objects.create(
+                name=name, category=category, expiry_date=expiry_date,
+                quantity=1, unit='szt', user=user or self.user, **kwargs
+            )
+        self.milk = product('Mleko 3,2%', self.dairy, barcode='5900512300108')
+        self.cheese = product('Ser żółty gouda', self.dairy)
+        self.shake = product('Koktajl truskawkowy', self.drinks)
+        product('Mleko owsiane', self.dairy, user=self.other)
+        product('Mleko zsiadłe', self.dairy, is_active=False)
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _search(self, query):
+        return [product.pk for product in search_products(self.user, query)]
+
+    def test_prefix_diacritics_and_barcode(self):
+        self.assertEqual(self._search('mle'), [self.milk.pk, self.shake.pk])
+        self.assertEqual(self._search('ZOŁTY'), [self.cheese.pk])
+        self.assertEqual(self._search('59005123'), [self.milk.pk])
+        self.assertEqual(self._search('ser gou'), [self.cheese.pk])
+        self.assertEqual(self._search('nabiał ser'), [self.cheese.pk])
+
+    def test_name_matches_rank_above_category_matches(self):
+        """Dopasowanie w nazwie jest wyżej niż w kategorii"""
+        ids = self._search('mleko mleczne') + self._search('mle')
+        self.assertEqual(ids[-2:], [self.milk.pk, self.shake.pk])
+
+    def test_special_characters_are_ignored(self):
+        self.assertEqual(self._search('"mleko* OR NOT'), [])
+        self.assertEqual(self._search('"(mleko)"'), [self.milk.pk])
+        self.assertEqual(self._search('  '), [])
+
+    def test_index_follows_changes(self):
+        """Wyzwalacze aktualizują indeks po zmianie produktu, kategorii i usunięciu"""
+        self.cheese.name = 'Twaróg półtłusty'
+        self.cheese.save()
+        self.assertEqual(self._search('twar'), [self.cheese.pk])
+        self.assertEqual(self._search('gouda'), [])
+
+        self.drinks.name = 'Desery'
+        self.drinks.save()
+        self.assertEqual(self._search('deser'), [self.shake.pk])
+
+        self.milk.delete()
+        self.assertEqual(self._search('mleko'), [])
+
+    def test_list_view_and_autocomplete(self):
+        response = self.client.get(reverse('products:list'), {'q': 'ser'})
+        self.assertEqual(list(response.context['products']), [self.cheese])
+        self.assertContains(response, 'value="ser"')
+
+        # sesja + użytkownik + indeks + dane produktów
+        with self.assertNumQueries(4):
+            data = self.client.get(reverse('products:autocomplete'), {'q': 'mle'}).json()
+        self.assertEqual([item['id'] for item in data['results']], [self.milk.pk, self.shake.pk])
+        self.assertEqual(data['results'][0]['category'], 'Nabiał')
+        self.assertEqual(self.client.get(reverse('products:autocomplete')).json(), {'results': []})
+
+    def test_list_view_paginates_ranked_results(self):
+        """Wyniki wyszukiwania na liście są stronicowane w kolejności trafności, bez limitu SEARCH_LIMIT"""
+        Product.objects.bulk_create([
+            Product(
+                name=f'Jogurt {"naturalny " * (i % 3)}{i}', category=self.dairy,
+                expiry_date=timezone.localdate() + timedelta(days=i % 4), quantity=1, unit='szt', user=self.user
+            )
+            for i in range(SEARCH_LIMIT + 5)
+        ])
+        url = reverse('products:list')
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(url, {'q': 'jogurt', **({'cursor': cursor} if cursor else {})})
+            pages.append([product.pk for product in response.context['products']])
+            cursor = response.context['page_obj'].next_cursor
+            if cursor is None:
+                break
+        self.assertEqual([len(page) for page in pages], [10] * 5 + [5])
+        self.assertEqual(sum(pages, []), search_product_ids(self.user, 'jogurt', limit=100))
+
+        # Powrót o stronę daje te same wyniki
+        previous = response.context['page_obj'].previous_cursor
+        response = self.client.get(url, {'q': 'jogurt', 'cursor': previous})
+        self.assertEqual([product.pk for product in response.context['products']], pages[-2])
+        self.assertEqual(self.client.get(url, {'q': 'jogurt', 'cursor': 'zły'}).status_code, 404)
+
+    def test_rebuild_command(self):
+        call_command('rebuild_product_search', stdout=StringIO())
+        self.assertEqual(self._search('mle'), [self.milk.pk, self.shake.pk])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Wyzwalacze indeksu są tylko w SQLite')
+    def test_check_reports_missing_triggers(self):
+        """Check products.E001 wykrywa wyzwalacze usunięte przez przebudowę tabeli"""
+        self.assertEqual(check_search_index(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER products_product_fts_update')
+        errors = check_search_index(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['products.E001'])
+        self.assertIn('products_product_fts_update', errors[0].msg)
+        # Bez bazy (zwykłe manage.py check) niczego nie sprawdza
+        self.assertEqual(check_search_index(None), [])
+
+        call_command('rebuild_product_search', stdout=StringIO())
+        self.assertEqual(check_search_index(None, databases=['default']), [])
+
+class ProductFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.dairy = Category.objects.create(name='Nabiał')
+        self.bread = Category.objects.create(name='Pieczywo')
+        unused = Category.objects.create(name='Mięso')
+        today = timezone.localdate()
+
+        def product(name, category, days, quantity=5, unit='szt', user=None, **kwargs):
+            return Product.objects.create(
+                name=name, category=category, expiry_date=today + timedelta(days=days),
+                quantity=quantity, unit=unit, user=user or self.user, **kwargs
+            )
+        self.yogurt = product('Jogurt', self.dairy, -1)
+        self.milk = product('Mleko', self.dairy, 2, quantity=1, unit='l')
+        self.cheese = product('Ser', self.dairy, 6, unit='kg')
+        self.roll = product('Bułka', self.bread, 1, quantity=1)
+        self.loaf = product('Chleb', self.bread, 20)
+        product('Stare mleko', self.dairy, 2, is_active=False)
+        product('Kiełbasa', unused, 2, user=other)
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _get(self, **params):
+        return self.client.get(reverse('products:list'), params)
+
+    def _facet(self, response, name):
+        return {option['label']: (option['count'], option['selected']) for option in response.context['facets'][name]}
+
+    def test_filters(self):
+        cases = [
+            ({'category': self.bread.pk}, [self.roll, self.loaf]),
+            ({'expiry': 'expired'}, [self.yogurt]),
+            ({'expiry': 'soon'}, [self.roll, self.milk]),
+            ({'expiry': 'week'}, [self.roll, self.milk, self.cheese]),
+            ({'expiry': 'later'}, [self.loaf]),
+            ({'low_stock': 'true'}, [self.roll, self.milk]),
+            ({'low_stock': 'false', 'category': self.dairy.pk}, [self.yogurt, self.cheese]),
+            ({'unit': 'kg'}, [self.cheese]),
+            # Nieprawidłowa wartość jest pomijana
+            ({'expiry': 'jutro', 'unit': 'l'}, [self.milk]),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(list(self._get(**params).context['products']), expected)
+
+    def test_facet_counts(self):
+        response = self._get()
+        # Tylko kategorie produktów użytkownika, bez produktów nieaktywnych
+        self.assertEqual(self._facet(response, 'category'), {'Nabiał': (3, False), 'Pieczywo': (2, False)})
+        self.assertEqual(self._facet(response, 'expiry'), {
+            'Przeterminowane': (1, False), 'Do 3 dni': (2, False), 'Do 7 dni': (3, False), 'Później': (1, False),
+        })
+        self.assertEqual(self._facet(response, 'low_stock'), {'Niski stan': (2, False), 'Wystarczający stan': (3, False)})
+        self.assertEqual(self._facet(response, 'unit'), {'kg': (1, False), 'l': (1, False), 'szt': (3, False)})
+
+    def test_facet_counts_follow_other_filters(self):
+        """Licznik opcji uwzględnia pozostałe wybrane filtry, a nie wybór w tej samej fasecie"""
+        response = self._get(category=self.dairy.pk, low_stock='true')
+        self.assertEqual(self._facet(response, 'category'), {'Nabiał': (1, True), 'Pieczywo': (1, False)})
+        self.assertEqual(self._facet(response, 'low_stock'), {'Niski stan': (1, True), 'Wystarczający stan': (2, False)})
+        self.assertEqual(self._facet(response, 'unit'), {'kg': (0, False), 'l': (1, False), 'szt': (0, False)})
+
+        # Link wybranej opcji ją wyłącza, link innej - przełącza
+        options = {option['label']: option['query'] for option in response.context['facets']['category']}
+        self.assertEqual(options['Nabiał'], 'low_stock=true')
+        self.assertEqual(options['Pieczywo'], f'category={self.bread.pk}&low_stock=true')
+
+    def test_facets_are_one_query(self):
+        filterset = self._get(unit='szt').context['filter']
+        with self.assertNumQueries(1):
+            filterset.facets()
+
+    @skipUnless(connection.vendor == 'sqlite', 'Test odczytuje plan zapytań w formacie SQLite')
+    def test_facet_query_uses_index(self):
+        filterset = self._get().context['filter']
+        with CaptureQueriesContext(connection) as context:
+            filterset.facet_rows()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {context.captured_queries[0]['sql']}")
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertRegex(plan, r'SEARCH products_product USING (COVERING )?INDEX product_user_facets_idx')
+
+    def test_pagination_keeps_filters(self):
+        Product.objects.bulk_create([
+            Product(
+                name=f'Produkt {i}', category=self.bread, expiry_date=timezone.localdate() + timedelta(days=30),
+                quantity=2, unit='szt', user=self.user
+            )
+            for i in range(12)
+        ])
+        response = self._get(category=self.bread.pk, q='')
+        next_url = f'?category={self.bread.pk}&amp;q=&amp;cursor={response.context["page_obj"].next_cursor}'
+        self.assertContains(response, next_url)
+        response = self.client.get(reverse('products:list') + next_url.replace('&amp;', '&'))
+        self.assertEqual(len(response.context['products']), 4)
+        self.assertTrue(all(product.category == self.bread for product in response.context['products']))
+
+    def test_search_within_filters(self):
+        response = self._get(q='mleko', category=self.bread.pk)
+        self.assertEqual(list(response.context['products']), [])
+        response = self._get(q='mleko', low_stock='true')
+        self.assertEqual(list(response.context['products']), [self.milk])
+        self.assertContains(response, 'name="low_stock" value="true"')
+
+    def test_search_filters_before_limit(self):
+        """Filtry zawężają wyniki wyszukiwania przed limitem, a nie po nim"""
+        Product.objects.bulk_create([
+            Product(
+                name=f'Mleko {i}', category=self.dairy, expiry_date=timezone.localdate() + timedelta(days=5),
+                quantity=2, unit='l', user=self.user
+            )
+            for i in range(SEARCH_LIMIT + 10)
+        ])
+        goat_milk = Product.objects.create(
+            name='Mleko kozie', category=self.dairy, expiry_date=timezone.localdate() + timedelta(days=5),
+            quantity=2, unit='kg', user=self.user
+        )
+        response = self._get(q='mleko', unit='kg')
+        self.assertEqual(list(response.context['products']), [goat_milk])
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.dairy = Category.objects.create(name='Nabiał')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        self.soon = timezone.localdate() + timedelta(days=2)
+        self.later = timezone.localdate() + timedelta(days=30)
+
+    def _csv(self, rows):
+        lines = ['name,barcode,category,expiry_date,quantity,unit'] + rows
+        return BytesIO('\n'.join(lines).encode())
+
+    def test_csv_import_with_row_errors(self):
+        result = import_products(self.user, self._csv([
+            f'Mleko,5900512300108,Nabiał,{self.soon},1,l',
+            f'Chleb,,Pieczywo,{self.later},2,szt',
+            f',,Nabiał,{self.later},1,szt',
+            'Ser,,Nabiał,jutro,abc,kg',
+            f'Bułka,,Pieczywo,{self.later},3,szt',
+        ]), 'csv')
+        self.assertEqual((result['rows'], result['created']), (5, 3))
+        self.assertEqual([error['line'] for error in result['errors']], [4, 5])
+        self.assertEqual(set(result['errors'][1]['errors']), {'expiry_date', 'quantity'})
+
+        products = Product.objects.filter(user=self.user).order_by('name')
+        self.assertEqual([product.name for product in products], ['Bułka', 'Chleb', 'Mleko'])
+        # Istniejąca kategoria jest użyta ponownie, brakująca utworzona raz
+        self.assertEqual(products.get(name='Mleko').category, self.dairy)
+        self.assertEqual(Category.objects.filter(name='Pieczywo').count(), 1)
+
+        report = error_report_csv(result['errors'])
+        self.assertIn('4,name,', report)
+        self.assertIn('5,quantity,', report)
+
+    def test_jsonl_import(self):
+        lines = [
+            json.dumps({'name': 'Jogurt', 'category': 'Nabiał', 'expiry_date': str(self.later), 'quantity': 2.5, 'unit': 'szt'}),
+            '{"name": "Kefir",',
+            '',
+            '[1, 2]',
+        ]
+        result = import_products(self.user, BytesIO('\n'.join(lines).encode()), 'jsonl')
+        self.assertEqual((result['rows'], result['created']), (3, 1))
+        self.assertEqual([error['line'] for error in result['errors']], [2, 4])
+        self.assertEqual(Product.objects.get(user=self.user).quantity, Decimal('2.5'))
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Partia kosztuje stałą liczbę zapytań: kategorie, INSERT produktów, bez sygnałów na wiersz"""
+        def count_queries(rows):
+            with CaptureQueriesContext(connection) as context:
+                import_products(self.user, self._csv([
+                    f'Produkt {i},,Kategoria {i % 3},{self.later},2,szt' for i in range(rows)
+                ]), 'csv')
+            return len(context)
+        count_queries(5)
+        self.assertEqual(count_queries(10), count_queries(40))
+
+    def test_notifications_after_import(self):
+        """Zamiast sygnałów dla każdego wiersza - jeden przegląd reguł i plan progów ważności"""
+        import_products(self.user, self._csv([
+            f'Mleko,,Nabiał,{self.soon},5,l',
+            f'Masło,,Nabiał,{self.later},1,szt',
+        ]), 'csv', batch_size=1)
+        self.assertEqual(
+            sorted(self.user.notifications.values_list('notification_type', 'product__name')),
+            [('expiry', 'Mleko'), ('low_stock', 'Masło')]
+        )
+        self.assertEqual(ExpirySchedule.objects.filter(product__user=self.user).count(), 2)
+
+    def test_import_view(self):
+        upload = SimpleUploadedFile('produkty.csv', self._csv([
+            f'Mleko,,Nabiał,{self.later},1,l',
+            f'Ser,,Nabiał,{self.later},-,kg',
+        ]).getvalue())
+        response = self.client.post(reverse('products:import'), {'file': upload})
+        self.assertContains(response, 'zaimportowano: 1')
+        report_url = reverse('products:import_errors', args=[response.context['result']['report_token']])
+        self.assertContains(response, report_url)
+        report = self.client.get(report_url)
+        self.assertEqual(report['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('3,quantity,', report.content.decode())
+
+        # Raport jest dostępny tylko dla autora importu
+        User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.login(username='other', password='testpass123')
+        self.assertEqual(self.client.get(report_url).status_code, 404)
+
+    def test_invalid_utf8_row_is_row_error(self):
+        content = self._csv([
+            f'Mleko,,Nabiał,{self.soon},1,l',
+            f'Ser,,Nabiał,{self.later},1,kg',
+        ]).getvalue().replace('Ser'.encode(), b'S\xe9r')
+        result = import_products(self.user, BytesIO(content), 'csv', batch_size=1)
+        self.assertEqual((result['rows'], result['created']), (2, 1))
+        self.assertEqual([error['line'] for error in result['errors']], [3])
+        lines = [json.dumps({'name': 'Jogurt', 'category': 'Nabiał', 'expiry_date': str(self.later), 'quantity': 1, 'unit': 'szt'})]
+        result = import_products(self.user, BytesIO(b'\xff\xfe{}\n' + '\n'.join(lines).encode()), 'jsonl')
+        self.assertEqual((result['rows'], result['created']), (2, 1))
+        self.assertEqual([error['line'] for error in result['errors']], [1])
+
+    def test_interrupted_import_keeps_saved_batches(self):
+        """Błąd pliku w środku importu: zapisane partie dostają powiadomienia, a użytkownik ich liczbę"""
+        upload = SimpleUploadedFile('produkty.csv', self._csv([
+            f'Mleko,,Nabiał,{self.soon},1,l',
+            f'Ser,,Nabiał,{self.later},1,kg',
+        ]).getvalue() + b'\n"' + b'x' * 200000)
+        with mock.patch('products.views.import_products', partial(import_products, batch_size=1)):
+            response = self.client.post(reverse('products:import'), {'file': upload})
+        self.assertIn('Nieprawidłowy CSV w linii', response.context['form'].errors['file'][0])
+        self.assertContains(response, 'zaimportowano: 2')
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(ExpirySchedule.objects.filter(product__user=self.user).count(), 2)
+        self.assertTrue(self.user.notifications.filter(product__name='Mleko').exists())
+
+    def test_invalid_files(self):
+        for name, content in [('produkty.xlsx', b'x'), ('produkty.json', b'[]'), ('produkty.csv', b'name,unit\nMleko,l')]:
+            with self.subTest(name=name):
+                response = self.client.post(reverse('products:import'), {'file': SimpleUploadedFile(name, content)})
+                self.assertIsNone(response.context['result'])
+                self.assertTrue(response.context['form'].errors['file'])
+        self.assertFalse(Product.objects.exists())
+
+class BarcodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.dairy = Category.objects.create(name='Nabiał')
+        expiry_date = timezone.localdate() + timedelta(days=5)
+        for name, user in [('Moje mleko (stare)', self.user), ('Moje mleko', self.user), ('Mleko sąsiada', other)]:
+            Product.objects.create(
+                name=name, barcode='5900000000001', category=self.dairy, expiry_date=expiry_date,
+                quantity=1, unit='l', user=user
+            )
+        Product.objects.create(
+            name='Mleko owsiane', barcode='5900000000009', category=self.dairy, expiry_date=expiry_date,
+            quantity=1, unit='l', user=other
+        )
+        load_catalog(BytesIO('\n'.join([
+            'barcode,name,category,default_unit,shelf_life_days',
+            '5900000000001,Mleko UHT 3.2%,Nabiał,l,90',
+            '5900000000002,Chleb żytni,Pieczywo,szt,4',
+            '5900000000003,Sól,,,',
+        ]).encode()), 'csv')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_load_catalog_upserts(self):
+        self.assertEqual(BarcodeCatalogEntry.objects.count(), 3)
+        self.assertEqual(BarcodeCatalogEntry.objects.get(barcode='5900000000003').category, None)
+        result = load_catalog(BytesIO('\n'.join([
+            json.dumps({'barcode': '5900000000002', 'name': 'Chleb', 'category': 'Pieczywo', 'shelf_life_days': 3}),
+            json.dumps({'barcode': '5900000000002', 'name': 'Chleb razowy', 'category': 'Pieczywo', 'shelf_life_days': 5}),
+            json.dumps({'barcode': '5900000000004', 'name': ''}),
+            json.dumps({'barcode': '5900000000005', 'name': 'Jajka', 'shelf_life_days': -1}),
+        ]).encode()), 'jsonl')
+        self.assertEqual((result['rows'], result['saved']), (4, 1))
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4])
+        entry = BarcodeCatalogEntry.objects.get(barcode='5900000000002')
+        self.assertEqual((entry.name, entry.shelf_life_days), ('Chleb razowy', 5))
+        self.assertEqual(Category.objects.filter(name='Pieczywo').count(), 1)
+
+    def test_resolve_in_one_query(self):
+        with self.assertNumQueries(1):
+            results = resolve_barcodes(self.user, [' 5900000000002', '5900000000001', '5900000000009', '', '5900000000002'])
+        self.assertEqual(list(results), ['5900000000002', '5900000000001', '5900000000009'])
+
+        # Własny, najnowszy produkt ma pierwszeństwo; okres przydatności dochodzi z katalogu
+        own = results['5900000000001']
+        self.assertEqual((own['source'], own['name'], own['unit']), ('product', 'Moje mleko', 'l'))
+        self.assertEqual(own['product_id'], Product.objects.get(name='Moje mleko').pk)
+        self.assertEqual(own['expiry_date'], timezone.localdate() + timedelta(days=90))
+
+        bread = results['5900000000002']
+        self.assertEqual((bread['source'], bread['name'], bread['category']['name']), ('catalog', 'Chleb żytni', 'Pieczywo'))
+        self.assertIsNone(bread['product_id'])
+        # Produkty innych użytkowników nie są widoczne
+        self.assertIsNone(results['5900000000009'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Test odczytuje plan zapytań w formacie SQLite')
+    def test_resolve_uses_indexes(self):
+        with CaptureQueriesContext(connection) as context:
+            resolve_barcodes(self.user, ['5900000000001', '5900000000002'])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {context.captured_queries[0]['sql']}")
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('INDEX product_user_barcode_idx', plan)
+        self.assertRegex(plan, r'INDEX sqlite_autoindex_products_barcodecatalogentry')
+        self.assertNotIn('SCAN products_', plan)
+
+    def test_resolve_endpoint(self):
+        url = reverse('products:resolve_barcodes')
+        data = self.client.get(url, {'barcode': ['5900000000003', '123']}).json()
+        self.assertEqual(data['results']['5900000000003']['name'], 'Sól')
+        self.assertIsNone(data['results']['5900000000003']['expiry_date'])
+        self.assertIsNone(data['results']['123'])
+
+        response = self.client.post(url, {'barcodes': ['5900000000002']}, content_type='application/json')
+        self.assertEqual(response.json()['results']['5900000000002']['unit'], 'szt')
+
+        for body in ['nie json', {'barcodes': '5900000000002'}, {'barcodes': [str(i) for i in range(101)]}, {'barcodes': ['1' * 51]},
+                     {'barcodes': ['1'] * 101}, {'barcodes': [None]}, {'barcodes': [5900000000002]}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400)
+
+    def test_create_form_prefilled_from_barcode(self):
+        response = self.client.get(reverse('products:create'), {'barcode': '5900000000002'})
+        initial = response.context['form'].initial
+        self.assertEqual(initial['name'], 'Chleb żytni')
+        self.assertEqual(initial['category'], Category.objects.get(name='Pieczywo').pk)
+        self.assertEqual(initial['expiry_date'], timezone.localdate() + timedelta(days=4))
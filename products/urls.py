@@ -7,6 +7,10 @@ urlpatterns = [
     # Produkty
     path('', views.ProductListView.as_view(), name='list'),
     path('create/', views.ProductCreateView.as_view(), name='create'),
+    path('autocomplete/', views.product_autocomplete, name='autocomplete'),
+    path('barcodes/resolve/', views.resolve_barcodes_view, name='resolve_barcodes'),
+    path('import/', views.product_import, name='import'),
+    path('import/errors/<str:token>/', views.product_import_errors, name='import_errors'),
     path('<int:pk>/', views.product_detail, name='detail'),
     path('<int:pk>/update/', views.ProductUpdateView.as_view(), name='update'),
     path('<int:pk>/delete/', views.ProductDeleteView.as_view(), name='delete'),
@@ -1,24 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+import json
+import uuid
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
+from fridge_manager.pagination import CursorPaginationMixin
 from .models import Product, Category
-from .forms import ProductForm, CategoryForm
+from .barcodes import BARCODE_BATCH_LIMIT, BARCODE_MAX_LENGTH, normalize_barcodes, resolve_barcodes
+from .filters import ProductFilter
+from .forms import ProductForm, CategoryForm, ProductImportForm
+from .importer import (
+    IMPORT_ERROR_DISPLAY_LIMIT, ImportFormatError, error_report_csv, import_format, import_products,
+)
+from .search import AUTOCOMPLETE_LIMIT, SearchPaginator, search_product_ids
 
-class ProductListView(LoginRequiredMixin, ListView):
+class ProductListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Product
     template_name = 'products/product_list.html'
     context_object_name = 'products'
     paginate_by = 10
+    cursor_ordering = ('expiry_date', 'id')
+    estimate_cap = 1000
     
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user, is_active=True)
+        self.search_query = self.request.GET.get('q', '').strip()
+        self.filterset = ProductFilter(
+            self.request.GET,
+            queryset=Product.objects.filter(user=self.request.user, is_active=True),
+            request=self.request,
+        )
+        return self.filterset.qs.select_related('category')
+
+    def get_cursor_paginator(self, queryset, page_size):
+        if self.search_query:
+            # Wyniki wyszukiwania: wg trafności, kursorem po kluczu sortowania wyszukiwarki
+            return SearchPaginator(self.request.user, self.search_query, queryset, page_size)
+        return super().get_cursor_paginator(queryset, page_size)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['filter'] = self.filterset
+        facets = self.filterset.facets()
+        context['facets'] = facets
+        context['facet_groups'] = [
+            ('Kategoria', facets['category']),
+            ('Data ważności', facets['expiry']),
+            ('Stan', facets['low_stock']),
+            ('Jednostka', facets['unit']),
+        ]
+        context['search_query'] = self.search_query
         return context
 
 class ProductCreateView(LoginRequiredMixin, CreateView):
@@ -26,6 +61,22 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
     form_class = ProductForm
     template_name = 'products/product_form.html'
     success_url = reverse_lazy('products:list')
+
+    def get_initial(self):
+        # Dodawanie po zeskanowaniu: ?barcode= wypełnia formularz z produktów lub katalogu
+        initial = super().get_initial()
+        barcode = self.request.GET.get('barcode', '').strip()[:BARCODE_MAX_LENGTH]
+        if barcode:
+            initial['barcode'] = barcode
+            match = resolve_barcodes(self.request.user, [barcode]).get(barcode)
+            if match:
+                initial['name'] = match['name']
+                initial['unit'] = match['unit']
+                if match['category']:
+                    initial['category'] = match['category']['id']
+                if match['expiry_date']:
+                    initial['expiry_date'] = match['expiry_date']
+        return initial
     
     def form_valid(self, form):
         form.instance.user = self.request.user
@@ -57,6 +108,94 @@ class ProductDeleteView(LoginRequiredMixin, DeleteView):
         messages.success(request, 'Produkt został usunięty pomyślnie!')
         return super().delete(request, *args, **kwargs)
 
+@login_required
+def product_autocomplete(request):
+    """Podpowiedzi dla pola wyszukiwania (JSON) - ten sam indeks co wyszukiwarka listy."""
+    ids = search_product_ids(request.user, request.GET.get('q', ''), AUTOCOMPLETE_LIMIT)
+    products = {
+        product['id']: product
+        for product in Product.objects.filter(pk__in=ids).values('id', 'name', 'barcode', 'category__name', 'expiry_date')
+    }
+    return JsonResponse({'results': [
+        {
+            'id': pk,
+            'name': products[pk]['name'],
+            'barcode': products[pk]['barcode'],
+            'category': products[pk]['category__name'],
+            'expiry_date': products[pk]['expiry_date'],
+            'url': reverse('products:detail', args=[pk]),
+        }
+        for pk in ids if pk in products
+    ]})
+
+# Raport błędów importu czeka w cache na pobranie przez godzinę
+IMPORT_REPORT_TIMEOUT = 3600
+
+def _import_report_key(user, token):
+    return f'product-import-errors:{user.pk}:{token}'
+
+@login_required
+def product_import(request):
+    """Import produktów z pliku CSV lub JSON Lines z raportem błędów dla każdego wiersza."""
+    form = ProductImportForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == 'POST' and form.is_valid():
+        upload = form.cleaned_data['file']
+        try:
+            result = import_products(request.user, upload.file, import_format(upload.name))
+        except ImportFormatError as e:
+            form.add_error('file', str(e))
+            # Import przerwany w środku pliku - wcześniejsze partie zostały zapisane
+            result = e.result
+            if result:
+                messages.warning(request, f"Import przerwany, zaimportowano produkty: {result['created']} z {result['rows']}.")
+        else:
+            messages.success(request, f"Zaimportowano produkty: {result['created']} z {result['rows']}.")
+        if result and result['errors']:
+            result['report_token'] = uuid.uuid4().hex
+            cache.set(
+                _import_report_key(request.user, result['report_token']),
+                error_report_csv(result['errors']), IMPORT_REPORT_TIMEOUT
+            )
+    return render(request, 'products/product_import.html', {
+        'form': form,
+        'result': result,
+        'shown_errors': result['errors'][:IMPORT_ERROR_DISPLAY_LIMIT] if result else [],
+    })
+
+@login_required
+def product_import_errors(request, token):
+    report = cache.get(_import_report_key(request.user, token))
+    if report is None:
+        raise Http404('Raport błędów wygasł')
+    response = HttpResponse(report, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="bledy_importu.csv"'
+    return response
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def resolve_barcodes_view(request):
+    """
+    Rozpoznaje naraz wiele zeskanowanych kodów: GET ?barcode=...&barcode=...
+    albo POST z JSON {"barcodes": [...]}. Odpowiedź: {"results": {kod: dane albo null}}.
+    """
+    if request.method == 'POST':
+        try:
+            barcodes = json.loads(request.body)['barcodes']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Oczekiwano JSON {"barcodes": [...]}'}, status=400)
+        if not isinstance(barcodes, list) or not all(isinstance(barcode, str) for barcode in barcodes):
+            return JsonResponse({'error': 'Pole barcodes musi być listą napisów'}, status=400)
+    else:
+        barcodes = request.GET.getlist('barcode')
+    # Limit przed normalizacją - nie przetwarzamy dowolnie długiej listy
+    if len(barcodes) > BARCODE_BATCH_LIMIT:
+        return JsonResponse({'error': f'Najwyżej {BARCODE_BATCH_LIMIT} kodów naraz'}, status=400)
+    barcodes = normalize_barcodes(barcodes)
+    if any(len(barcode) > BARCODE_MAX_LENGTH for barcode in barcodes):
+        return JsonResponse({'error': 'Zbyt długi kod kreskowy'}, status=400)
+    return JsonResponse({'results': resolve_barcodes(request.user, barcodes)})
+
 @login_required
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk, user=request.user)
@@ -0,0 +1,80 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from .models import ReportDataVersion
+
+_MISSING = object()
+STATS_KEYS = ('hits', 'misses')
+
+def get_data_version(user_id):
+    """
+    Zwraca wersję danych raportowych użytkownika. Zmienia się przy każdej
+    zmianie zużycia, wydatków lub marnowania, więc nadaje się do kluczy cache.
+    """
+    version = ReportDataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    return version or 0
+
+def bump_data_version(user_id):
+    """
+    Unieważnia wszystkie wyniki zapisane dla poprzedniej wersji danych.
+    Wersja rośnie w tej samej transakcji co zmiana danych: inne procesy widzą
+    nową wersję dopiero razem z nowymi danymi, a równoległe podbicia się nie gubią.
+    """
+    if ReportDataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1):
+        return
+    # Pierwsza zmiana - wiersz mógł właśnie powstać w innym procesie
+    ReportDataVersion.objects.bulk_create([ReportDataVersion(user_id=user_id)], ignore_conflicts=True)
+    ReportDataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+def _count(name):
+    key = f'reports:cache-stats:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+def cache_stats():
+    """Liczniki trafień i chybień cache raportów (w obrębie backendu cache)."""
+    stats = {name: cache.get(f'reports:cache-stats:{name}', 0) for name in STATS_KEYS}
+    requests = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / requests, 4) if requests else None
+    return stats
+
+def cached_for_user(user_id, name, compute, timeout=None):
+    """
+    Zwraca wynik `compute()` z cache, pod kluczem zależnym od wersji danych
+    użytkownika - zmiana danych automatycznie unieważnia wszystkie jego wpisy.
+
+    Przy chybieniu wartość liczy tylko jeden proces (blokada przez cache.add),
+    pozostali czekają na wynik do REPORT_CACHE_LOCK_TIMEOUT sekund, zamiast
+    jednocześnie odpytywać bazę. Na backendzie bez atomowego add (FileBasedCache)
+    blokada może wpuścić dwa procesy - policzą wynik dwa razy, ale pod tą samą,
+    poprawną wersją danych.
+    """
+    key = f'reports:{user_id}:{get_data_version(user_id)}:{name}'
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count('hits')
+        return value
+
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.REPORT_CACHE_LOCK_TIMEOUT
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                _count('hits')
+                return value
+        # Blokada wygasła bez wyniku - liczymy sami
+
+    _count('misses')
+    try:
+        value = compute()
+        cache.set(key, value, timeout or settings.REPORT_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return value
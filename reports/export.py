@@ -1,132 +1,277 @@
 import csv
-from io import StringIO
-from datetime import datetime, timedelta
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-import pdfkit
-from .models import ProductConsumption, ShoppingExpense, ProductWastage
-from django.db.models import Sum, Avg
-import os
-
-def export_to_csv(model, queryset, filename):
-    """
-    Eksportuje dane do pliku CSV.
-    """
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Dodaj nagłówki
-    if model == ProductConsumption:
-        writer.writerow(['Data', 'Produkt', 'Kategoria', 'Ilość', 'Jednostka'])
-        for item in queryset:
-            writer.writerow([
-                item.consumption_date.strftime('%Y-%m-%d'),
-                item.product.name,
-                item.product.category.name,
-                item.quantity,
-                item.unit
-            ])
-    elif model == ShoppingExpense:
-        writer.writerow(['Data', 'Lista zakupów', 'Kwota'])
-        for item in queryset:
-            writer.writerow([
-                item.shopping_date.strftime('%Y-%m-%d'),
-                item.shopping_list.name,
-                item.total_amount
-            ])
-    elif model == ProductWastage:
-        writer.writerow(['Data', 'Produkt', 'Kategoria', 'Ilość', 'Jednostka', 'Powód'])
-        for item in queryset:
-            writer.writerow([
-                item.wastage_date.strftime('%Y-%m-%d'),
-                item.product.name,
-                item.product.category.name,
-                item.quantity,
-                item.unit,
-                item.reason
-            ])
-
-    response = HttpResponse(output.getvalue(), content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename}_{datetime.now().strftime("%Y%m%d")}.csv"'
-    return response
+import gzip
+import tempfile
+from datetime import timedelta
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from jobs.queue import enqueue
+from .models import (
+    ProductConsumption, ShoppingExpense, ProductWastage,
+    DailyConsumptionRollup, DailyExpenseRollup, DailyWastageRollup, ReportExport,
+)
+from .pdf import render_report_pdf
+from .rollups import rollup_summary
 
-def export_to_pdf(template_name, context, filename):
+# Raporty
+
+@dataclass(frozen=True)
+class ReportSpec:
     """
-    Eksportuje dane do pliku PDF.
+    Deklaracja raportu do eksportu: źródło danych, kolumny i podsumowanie.
+    Wszystkie formaty korzystają z tych samych zapytań.
     """
-    html_string = render_to_string(template_name, context)
-    
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}_{datetime.now().strftime("%Y%m%d")}.pdf"'
-    
-    try:
-        # Konfiguracja wkhtmltopdf
-        config = pdfkit.configuration(wkhtmltopdf='C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe')
-        pdf = pdfkit.from_string(html_string, False, configuration=config)
-        response.write(pdf)
-        return response
-    except Exception as e:
-        return HttpResponse(f'Wystąpił błąd podczas generowania PDF: {str(e)}')
+    name: str
+    title: str
+    model: type
+    rollup: type
+    date_field: str
+    # (ścieżka pola dla values_list, nagłówek kolumny)
+    columns: tuple
+    # (klucz z rollup_summary, etykieta)
+    summary_labels: tuple
+
+    @property
+    def fields(self):
+        return [field for field, header in self.columns]
+
+    @property
+    def headers(self):
+        return [header for field, header in self.columns]
+
+    def get_queryset(self, user, start_date, end_date):
+        return self.model.objects.filter(
+            user=user,
+            **{f'{self.date_field}__range': (start_date, end_date)}
+        ).order_by(f'-{self.date_field}', '-pk')
+
+    def iter_rows(self, user, start_date, end_date, chunk_size=2000):
+        """
+        Wiersze jako krotki. values_list() rozwiązuje relacje JOIN-em w SQL,
+        a iterator() czyta wynik porcjami, więc pamięć nie rośnie z liczbą wierszy.
+        """
+        queryset = self.get_queryset(user, start_date, end_date)
+        return queryset.values_list(*self.fields).iterator(chunk_size=chunk_size)
+
+    def get_summary(self, user, start_date, end_date):
+        """Podsumowanie liczone z dziennych agregatów."""
+        return rollup_summary(self.rollup.objects.filter(
+            user=user,
+            date__range=(start_date, end_date)
+        ))
+
+REPORTS = {
+    'expense': ReportSpec(
+        name='expense',
+        title='Raport wydatków',
+        model=ShoppingExpense,
+        rollup=DailyExpenseRollup,
+        date_field='shopping_date',
+        columns=(
+            ('shopping_date', 'Data'),
+            ('shopping_list__name', 'Lista zakupów'),
+            ('total_amount', 'Kwota'),
+        ),
+        summary_labels=(
+            ('entry_count', 'Liczba zakupów'),
+            ('total', 'Łączna kwota'),
+            ('average', 'Średni wydatek'),
+        ),
+    ),
+    'consumption': ReportSpec(
+        name='consumption',
+        title='Raport zużycia produktów',
+        model=ProductConsumption,
+        rollup=DailyConsumptionRollup,
+        date_field='consumption_date',
+        columns=(
+            ('consumption_date', 'Data'),
+            ('product__name', 'Produkt'),
+            ('product__category__name', 'Kategoria'),
+            ('quantity', 'Ilość'),
+            ('unit', 'Jednostka'),
+        ),
+        summary_labels=(
+            ('entry_count', 'Liczba zużyć'),
+            ('total', 'Łączna ilość'),
+            ('average', 'Średnia ilość'),
+        ),
+    ),
+    'wastage': ReportSpec(
+        name='wastage',
+        title='Raport marnowania produktów',
+        model=ProductWastage,
+        rollup=DailyWastageRollup,
+        date_field='wastage_date',
+        columns=(
+            ('wastage_date', 'Data'),
+            ('product__name', 'Produkt'),
+            ('product__category__name', 'Kategoria'),
+            ('quantity', 'Ilość'),
+            ('unit', 'Jednostka'),
+            ('reason', 'Powód'),
+        ),
+        summary_labels=(
+            ('entry_count', 'Liczba przypadków'),
+            ('total', 'Łączna ilość'),
+            ('average', 'Średnia ilość'),
+        ),
+    ),
+}
+
+# Formaty
+
+@dataclass(frozen=True)
+class ExportFormat:
+    name: str
+    content_type: str
+    extension: str
+    # writer(report, user, start_date, end_date) -> iterator fragmentów pliku (str lub bytes)
+    writer: object
+
+EXPORT_FORMATS = {}
+
+def export_format(name, content_type, extension):
+    """Rejestruje funkcję jako writer formatu eksportu."""
+    def decorator(writer):
+        EXPORT_FORMATS[name] = ExportFormat(name, content_type, extension, writer)
+        return writer
+    return decorator
+
+class Echo:
+    """Pseudo-plik dla csv.writer - zwraca zapisany wiersz zamiast go buforować."""
+    def write(self, value):
+        return value
 
-def export_expense_report(request, format='csv'):
+def iter_chunks(lines, chunk_size=2000):
+    """Łączy kolejne linie w porcje po `chunk_size`, żeby nie wysyłać każdej osobno."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def iter_csv(rows, headers, chunk_size=2000):
+    """Generuje plik CSV porcjami po `chunk_size` wierszy."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    yield from iter_chunks((writer.writerow(row) for row in rows), chunk_size)
+
+@export_format('csv', 'text/csv; charset=utf-8', 'csv')
+def write_csv(report, user, start_date, end_date):
+    return iter_csv(report.iter_rows(user, start_date, end_date), report.headers)
+
+@export_format('jsonl', 'application/x-ndjson; charset=utf-8', 'jsonl')
+def write_jsonl(report, user, start_date, end_date):
+    """JSON Lines: jeden obiekt na wiersz, klucze to ścieżki pól."""
+    fields = report.fields
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    rows = report.iter_rows(user, start_date, end_date)
+    return iter_chunks(encoder.encode(dict(zip(fields, row))) + '\n' for row in rows)
+
+@export_format('pdf', 'application/pdf', 'pdf')
+def write_pdf(report, user, start_date, end_date):
     """
-    Eksportuje raport wydatków.
+    PDF z tabelą danych i podsumowaniem - patrz reports.pdf. Dokument powstaje
+    od razu (nie w generatorze), żeby ReportPdfError pojawił się przed wysłaniem
+    nagłówków odpowiedzi, a nie w połowie strumienia.
     """
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    expenses = ShoppingExpense.objects.filter(
-        user=request.user,
-        shopping_date__gte=thirty_days_ago
-    ).order_by('-shopping_date')
-
-    if format == 'csv':
-        return export_to_csv(ShoppingExpense, expenses, 'raport_wydatkow')
-    else:
-        context = {
-            'expenses': expenses,
-            'total_expenses': expenses.aggregate(total=Sum('total_amount'))['total'] or 0,
-            'avg_expense': expenses.aggregate(avg=Avg('total_amount'))['avg'] or 0,
-            'date': datetime.now().strftime('%Y-%m-%d')
-        }
-        return export_to_pdf('reports/pdf/expense_report.html', context, 'raport_wydatkow')
-
-def export_consumption_report(request, format='csv'):
+    return [render_report_pdf(report, user, start_date, end_date)]
+
+def export_report(report, export_format, user, start_date, end_date):
     """
-    Eksportuje raport zużycia.
+    Zwraca odpowiedź strumieniową z raportem `report` (ReportSpec)
+    w formacie `export_format` (ExportFormat) za okres [start_date, end_date].
     """
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    consumptions = ProductConsumption.objects.filter(
-        user=request.user,
-        consumption_date__gte=thirty_days_ago
-    ).order_by('-consumption_date')
-
-    if format == 'csv':
-        return export_to_csv(ProductConsumption, consumptions, 'raport_zuzycia')
-    else:
-        context = {
-            'consumptions': consumptions,
-            'total_consumption': consumptions.aggregate(total=Sum('quantity'))['total'] or 0,
-            'avg_consumption': consumptions.aggregate(avg=Avg('quantity'))['avg'] or 0,
-            'date': datetime.now().strftime('%Y-%m-%d')
-        }
-        return export_to_pdf('reports/pdf/consumption_report.html', context, 'raport_zuzycia')
-
-def export_wastage_report(request, format='csv'):
+    response = StreamingHttpResponse(
+        export_format.writer(report, user, start_date, end_date),
+        content_type=export_format.content_type
+    )
+    filename = f'{report.name}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{export_format.extension}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# Eksport w tle
+
+def create_export(user, report_name, format_name, start_date, end_date):
+    """Zapisuje zlecenie eksportu i dodaje je do kolejki zadań."""
+    export = ReportExport.objects.create(
+        user=user,
+        report=report_name,
+        format=format_name,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    # Błąd eksportu jest ostateczny - użytkownik może zlecić go ponownie
+    enqueue('reports.build_export', payload={'export_id': export.pk}, max_attempts=1)
+    return export
+
+def _export_chunks(report, export_format, export):
+    """Fragmenty pliku eksportu; PDF dostaje dłuższy limit REPORT_EXPORT_PDF_TIMEOUT."""
+    args = (report, export.user, export.start_date, export.end_date)
+    if export_format.name == 'pdf':
+        return [render_report_pdf(*args, timeout=settings.REPORT_EXPORT_PDF_TIMEOUT)]
+    return export_format.writer(*args)
+
+def build_export_artifact(export):
     """
-    Eksportuje raport marnowania.
+    Generuje plik eksportu tym samym writerem co eksport synchroniczny,
+    kompresuje go w locie do pliku tymczasowego i zapisuje w MEDIA_ROOT.
     """
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    wastages = ProductWastage.objects.filter(
-        user=request.user,
-        wastage_date__gte=thirty_days_ago
-    ).order_by('-wastage_date')
-
-    if format == 'csv':
-        return export_to_csv(ProductWastage, wastages, 'raport_marnowania')
-    else:
-        context = {
-            'wastages': wastages,
-            'total_wastage': wastages.count(),
-            'avg_wastage': wastages.aggregate(avg=Avg('quantity'))['avg'] or 0,
-            'date': datetime.now().strftime('%Y-%m-%d')
-        }
-        return export_to_pdf('reports/pdf/wastage_report.html', context, 'raport_marnowania') 
\ No newline at end of file
+    ReportExport.objects.filter(pk=export.pk).update(status=ReportExport.RUNNING)
+    report = REPORTS[export.report]
+    export_format = EXPORT_FORMATS[export.format]
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode='wb') as archive:
+                for chunk in _export_chunks(report, export_format, export):
+                    archive.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            tmp.seek(0)
+            export.file.save(export.download_name, File(tmp), save=False)
+    except Exception as e:
+        export.status = ReportExport.FAILED
+        export.error = str(e)
+        export.finished_at = timezone.now()
+        export.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+
+    ttl = settings.REPORT_EXPORT_TTL
+    export.status = ReportExport.DONE
+    export.size = export.file.size
+    export.finished_at = timezone.now()
+    export.expires_at = export.finished_at + timedelta(seconds=ttl)
+    export.save(update_fields=['status', 'file', 'size', 'finished_at', 'expires_at'])
+    schedule_exports_purge(ttl)
+
+def schedule_exports_purge(delay):
+    """Planuje sprzątanie eksportów; w kolejce czeka najwyżej jedno takie zadanie."""
+    enqueue('reports.purge_expired_exports', delay=delay, dedupe_key='report-exports-purge')
+
+def purge_expired_exports(now=None):
+    """Usuwa wygasłe eksporty razem z plikami. Zwraca liczbę usuniętych eksportów."""
+    now = now or timezone.now()
+    expired = ReportExport.objects.filter(expires_at__lte=now)
+    # Nieudane eksporty nie mają daty ważności - sprzątamy je po tym samym czasie
+    failed = ReportExport.objects.filter(
+        status=ReportExport.FAILED,
+        finished_at__lte=now - timedelta(seconds=settings.REPORT_EXPORT_TTL),
+    )
+    count = 0
+    for export in (expired | failed).iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        count += 1
+
+    # Kolejne sprzątanie na termin najbliższego wygaśnięcia
+    next_expiry = ReportExport.objects.aggregate(next_expiry=Min('expires_at'))['next_expiry']
+    if next_expiry is not None:
+        schedule_exports_purge(max((next_expiry - now).total_seconds(), 0))
+    return count
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from reports.export import purge_expired_exports
+
+class Command(BaseCommand):
+    help = 'Usuwa wygasłe eksporty raportów razem z plikami.'
+
+    def handle(self, *args, **options):
+        count = purge_expired_exports()
+        self.stdout.write(self.style.SUCCESS(f'Usunięto eksportów: {count}'))
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from reports.cache import bump_data_version
+from reports.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Przebudowuje od zera dzienne agregaty zużycia, wydatków i marnowania.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID użytkownika (domyślnie wszyscy)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Liczba wierszy na jeden INSERT')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user'] is not None:
+            try:
+                user = get_user_model().objects.get(pk=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Użytkownik o ID {options['user']} nie istnieje.")
+
+        created = rebuild_rollups(user=user, batch_size=options['batch_size'])
+        # Wyniki liczone ze starych agregatów tracą ważność
+        user_ids = [user.pk] if user else get_user_model().objects.values_list('pk', flat=True).iterator()
+        for user_id in user_ids:
+            bump_data_version(user_id)
+        for rollup, count in created.items():
+            self.stdout.write(f'{rollup._meta.verbose_name_plural}: {count} wierszy')
+        self.stdout.write(self.style.SUCCESS('Agregaty zostały przebudowane.'))
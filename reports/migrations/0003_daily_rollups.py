@@ -0,0 +1,111 @@
+# Generated by Django 5.0.2 on 2026-10-18 06:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    sources = [
+        ('ProductConsumption', 'DailyConsumptionRollup', 'consumption_date', 'quantity', ('user_id', 'product_id')),
+        ('ShoppingExpense', 'DailyExpenseRollup', 'shopping_date', 'total_amount', ('user_id',)),
+        ('ProductWastage', 'DailyWastageRollup', 'wastage_date', 'quantity', ('user_id', 'product_id')),
+    ]
+    for source_name, rollup_name, date_field, value_field, key_fields in sources:
+        source = apps.get_model('reports', source_name)
+        rollup = apps.get_model('reports', rollup_name)
+        rows = source.objects.order_by().values(*key_fields, date_field).annotate(
+            rollup_count=Count('id'),
+            rollup_total=Sum(value_field),
+        )
+        rollup.objects.bulk_create(
+            [
+                rollup(
+                    **{field: row[field] for field in key_fields},
+                    date=row[date_field],
+                    entry_count=row['rollup_count'],
+                    total=row['rollup_total'] or 0,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_productconsumption'),
+        ('reports', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyConsumptionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dzienne zużycie',
+                'verbose_name_plural': 'Dzienne zużycie',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dzienne wydatki',
+                'verbose_name_plural': 'Dzienne wydatki',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyWastageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dzienne marnowanie',
+                'verbose_name_plural': 'Dzienne marnowanie',
+                'ordering': ['-date'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyconsumptionrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'product', 'date'), name='unique_daily_consumption_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyexpenserollup',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_expense_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailywastagerollup',
+            constraint=models.UniqueConstraint(fields=('user', 'product', 'date'), name='unique_daily_wastage_rollup'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
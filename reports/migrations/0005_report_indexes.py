@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_report_export'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productconsumption',
+            index=models.Index(fields=['user', '-consumption_date'], name='consumption_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productwastage',
+            index=models.Index(fields=['user', '-wastage_date'], name='wastage_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingexpense',
+            index=models.Index(fields=['user', '-shopping_date'], name='expense_user_date_idx'),
+        ),
+    ]
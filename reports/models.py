@@ -14,6 +14,9 @@ class ProductConsumption(models.Model):
 
     class Meta:
         ordering = ['-consumption_date']
+        indexes = [
+            models.Index(fields=['user', '-consumption_date'], name='consumption_user_date_idx'),
+        ]
         verbose_name = 'Zużycie produktu'
         verbose_name_plural = 'Zużycie produktów'
 
@@ -30,6 +33,9 @@ class ShoppingExpense(models.Model):
 
     class Meta:
         ordering = ['-shopping_date']
+        indexes = [
+            models.Index(fields=['user', '-shopping_date'], name='expense_user_date_idx'),
+        ]
         verbose_name = 'Wydatek na zakupy'
         verbose_name_plural = 'Wydatki na zakupy'
 
@@ -62,8 +68,125 @@ class ProductWastage(models.Model):
 
     class Meta:
         ordering = ['-wastage_date']
+        indexes = [
+            models.Index(fields=['user', '-wastage_date'], name='wastage_user_date_idx'),
+        ]
         verbose_name = 'Marnowanie produktu'
         verbose_name_plural = 'Marnowanie produktów'
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} {self.unit} ({self.wastage_date})"
+
+class DailyRollup(models.Model):
+    """
+    Dzienny agregat zdarzeń użytkownika utrzymywany przyrostowo przez sygnały
+    (patrz reports/rollups.py). Raporty czytają agregaty zamiast surowych wierszy.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    date = models.DateField()
+    entry_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-date']
+
+class DailyConsumptionRollup(DailyRollup):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+
+    class Meta(DailyRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product', 'date'], name='unique_daily_consumption_rollup'),
+        ]
+        verbose_name = 'Dzienne zużycie'
+        verbose_name_plural = 'Dzienne zużycie'
+
+    def __str__(self):
+        return f"{self.product.name} - {self.date}: {self.entry_count} / {self.total}"
+
+class DailyExpenseRollup(DailyRollup):
+
+    class Meta(DailyRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_expense_rollup'),
+        ]
+        verbose_name = 'Dzienne wydatki'
+        verbose_name_plural = 'Dzienne wydatki'
+
+    def __str__(self):
+        return f"Wydatki {self.date}: {self.entry_count} / {self.total} zł"
+
+class DailyWastageRollup(DailyRollup):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+
+    class Meta(DailyRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product', 'date'], name='unique_daily_wastage_rollup'),
+        ]
+        verbose_name = 'Dzienne marnowanie'
+        verbose_name_plural = 'Dzienne marnowanie'
+
+    def __str__(self):
+        return f"{self.product.name} - {self.date}: {self.entry_count} / {self.total}"
+
+class ReportDataVersion(models.Model):
+    """
+    Wersja danych raportowych użytkownika, część kluczy cache (reports/cache.py).
+    Podbijana przez F() w transakcji zmiany danych, więc wspólna dla wszystkich
+    procesów i niezależna od atomowości operacji backendu cache.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Wersja danych raportów'
+        verbose_name_plural = 'Wersje danych raportów'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
+
+class ReportExport(models.Model):
+    """
+    Eksport raportu wykonywany w tle (kolejka jobs). Gotowy plik jest zapisywany
+    w MEDIA_ROOT jako .gz i usuwany po upływie REPORT_EXPORT_TTL.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Oczekujący'),
+        (RUNNING, 'W trakcie'),
+        (DONE, 'Gotowy'),
+        (FAILED, 'Błąd'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    report = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    file = models.FileField(upload_to='exports/%Y/%m/%d', blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Eksport raportu'
+        verbose_name_plural = 'Eksporty raportów'
+
+    def __str__(self):
+        return f"{self.report}.{self.format} ({self.get_status_display()})"
+
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
+
+    @property
+    def download_name(self):
+        return f"{self.report}_{self.start_date:%Y%m%d}_{self.end_date:%Y%m%d}.{self.format}.gz"
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 from notifications.models import Notification
+from notifications.services import notification_key, save_notifications
 from .models import ShoppingExpense, ProductWastage
 from products.models import ProductConsumption
+from jobs.queue import enqueue
 
 def check_budget_exceeded(user, threshold=1000):
     """
@@ -16,12 +19,13 @@ def check_budget_exceeded(user, threshold=1000):
     ).aggregate(total=Sum('total_amount'))['total'] or 0
 
     if total_expenses > threshold:
-        Notification.objects.create(
+        save_notifications([Notification(
             user=user,
             title='Przekroczono próg budżetowy',
             message=f'W ostatnich 30 dniach wydano {total_expenses:.2f} zł, co przekracza próg {threshold} zł.',
-            notification_type='budget'
-        )
+            notification_type='budget',
+            dedupe_key=notification_key('budget', 'expenses-30d', timezone.localdate())
+        )])
 
 def check_high_wastage(user, threshold=5):
     """
@@ -34,12 +38,13 @@ def check_high_wastage(user, threshold=5):
     ).count()
 
     if total_wastage > threshold:
-        Notification.objects.create(
+        save_notifications([Notification(
             user=user,
             title='Wysokie marnowanie produktów',
             message=f'W ostatnich 30 dniach odnotowano {total_wastage} przypadków marnowania produktów, co przekracza próg {threshold}.',
-            notification_type='wastage'
-        )
+            notification_type='wastage',
+            dedupe_key=notification_key('wastage', 'wastage-30d', timezone.localdate())
+        )])
 
 def check_consumption_trends(user):
     """
@@ -63,20 +68,22 @@ def check_consumption_trends(user):
 
     # Jeśli zużycie wzrosło o więcej niż 50%
     if second_half > first_half * 1.5:
-        Notification.objects.create(
+        save_notifications([Notification(
             user=user,
             title='Znaczący wzrost zużycia',
             message='W ostatnich 15 dniach odnotowano znaczący wzrost zużycia produktów w porównaniu do poprzednich 15 dni.',
-            notification_type='consumption'
-        )
+            notification_type='consumption',
+            dedupe_key=notification_key('consumption', 'trend-up', timezone.localdate())
+        )])
     # Jeśli zużycie spadło o więcej niż 50%
     elif second_half < first_half * 0.5:
-        Notification.objects.create(
+        save_notifications([Notification(
             user=user,
             title='Znaczący spadek zużycia',
             message='W ostatnich 15 dniach odnotowano znaczący spadek zużycia produktów w porównaniu do poprzednich 15 dni.',
-            notification_type='consumption'
-        )
+            notification_type='consumption',
+            dedupe_key=notification_key('consumption', 'trend-down', timezone.localdate())
+        )])
 
 def generate_report_notifications(user):
     """
@@ -84,4 +91,17 @@ def generate_report_notifications(user):
     """
     check_budget_exceeded(user)
     check_high_wastage(user)
-    check_consumption_trends(user) 
\ No newline at end of file
+    check_consumption_trends(user) 
+
+def schedule_report_notifications(user):
+    """
+    Zleca wygenerowanie powiadomień raportowych w tle (komenda run_jobs).
+    Kolejne wywołania w oknie REPORT_NOTIFICATIONS_DEBOUNCE_SECONDS są łączone
+    w jedno zadanie na użytkownika.
+    """
+    enqueue(
+        'reports.generate_report_notifications',
+        payload={'user_id': user.pk},
+        delay=settings.REPORT_NOTIFICATIONS_DEBOUNCE_SECONDS,
+        dedupe_key=f'report-notifications:{user.pk}',
+    )
@@ -0,0 +1,122 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from jobs.pool import init_worker_process
+from .cache import get_data_version
+
+_pool = None
+
+class ReportPdfError(Exception):
+    """PDF nie powstał w wyznaczonym czasie albo pula procesów uległa awarii."""
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+def render_pdf(title, headers, rows, summary_lines=()):
+    """
+    Składa dokument PDF z tabelą (ReportLab platypus) i zwraca go jako bytes.
+    Przyjmuje wyłącznie proste typy, więc może działać w osobnym procesie bez Django.
+    """
+    buffer = BytesIO()
+    styles = getSampleStyleSheet()
+    elements = [
+        Paragraph(title, styles['Heading1']),
+        Paragraph(f"Wygenerowano: {datetime.now().strftime('%d.%m.%Y %H:%M')}", styles['Normal']),
+        Spacer(1, 12),
+    ]
+    for line in summary_lines:
+        elements.append(Paragraph(line, styles['Normal']))
+    if summary_lines:
+        elements.append(Spacer(1, 12))
+
+    table = Table([list(headers)] + list(rows), repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    elements.append(table)
+    SimpleDocTemplate(buffer, pagesize=A4, title=title).build(elements)
+    return buffer.getvalue()
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.REPORT_PDF_WORKERS, initializer=init_worker_process)
+    return _pool
+
+def _discard_pool():
+    """Porzuca pulę, w której zginął proces - następne zlecenie utworzy nową."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def run_in_pool(func, *args, timeout):
+    """
+    Wykonuje `func(*args)` w puli REPORT_PDF_WORKERS procesów i czeka najwyżej
+    `timeout` sekund. Przekroczenie czasu i awaria puli kończą się ReportPdfError.
+    """
+    try:
+        future = _get_pool().submit(func, *args)
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        # Zadanie jeszcze czekające w kolejce nie zajmie już procesu
+        future.cancel()
+        raise ReportPdfError(f'Generowanie PDF przekroczyło {timeout} s')
+    except BrokenProcessPool:
+        _discard_pool()
+        raise ReportPdfError('Proces generujący PDF uległ awarii')
+
+def build_report_pdf(report_name, user_id, start_date, end_date):
+    """
+    Odpytuje bazę i składa PDF raportu. Działa w procesie puli - dostaje tylko
+    parametry zapytania, więc wiersze raportu nie są kopiowane między procesami.
+    """
+    from .export import REPORTS
+    report = REPORTS[report_name]
+    rows = [
+        [str(value) for value in row]
+        for row in report.iter_rows(user_id, start_date, end_date)
+    ]
+    summary = report.get_summary(user_id, start_date, end_date)
+    summary_lines = [f'{label}: {summary[field]}' for field, label in report.summary_labels]
+    return render_pdf(report.title, report.headers, rows, summary_lines)
+
+def report_pdf_cache_key(report, user, start_date, end_date):
+    """Klucz cache: skrót (użytkownik, raport, zakres dat, wersja danych)."""
+    version = get_data_version(user.pk)
+    raw = f'{user.pk}:{report.name}:{start_date:%Y-%m-%d}:{end_date:%Y-%m-%d}:{version}'
+    return 'reports:pdf:' + hashlib.sha256(raw.encode()).hexdigest()
+
+def render_report_pdf(report, user, start_date, end_date, timeout=None):
+    """
+    Zwraca PDF raportu. Gotowe pliki są trzymane w cache, dopóki dane
+    użytkownika się nie zmienią. Zapytanie i składanie dokumentu odbywają się
+    w puli REPORT_PDF_WORKERS procesów (0 - w bieżącym procesie), więc nie blokują
+    wątku obsługującego żądanie dłużej niż `timeout` (domyślnie REPORT_PDF_TIMEOUT)
+    sekund; po tym czasie zgłaszany jest ReportPdfError.
+    """
+    key = report_pdf_cache_key(report, user, start_date, end_date)
+    pdf = cache.get(key)
+    if pdf is not None:
+        return pdf
+
+    args = (report.name, user.pk, start_date, end_date)
+    if settings.REPORT_PDF_WORKERS > 0:
+        pdf = run_in_pool(build_report_pdf, *args, timeout=timeout or settings.REPORT_PDF_TIMEOUT)
+    else:
+        pdf = build_report_pdf(*args)
+    cache.set(key, pdf, settings.REPORT_PDF_CACHE_TIMEOUT)
+    return pdf
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from .models import (
+    ProductConsumption, ShoppingExpense, ProductWastage,
+    DailyConsumptionRollup, DailyExpenseRollup, DailyWastageRollup,
+)
+
+# Źródło -> (model agregatu, pole daty, pole wartości, pola klucza poza datą)
+ROLLUP_SPECS = {
+    ProductConsumption: (DailyConsumptionRollup, 'consumption_date', 'quantity', ('user_id', 'product_id')),
+    ShoppingExpense: (DailyExpenseRollup, 'shopping_date', 'total_amount', ('user_id',)),
+    ProductWastage: (DailyWastageRollup, 'wastage_date', 'quantity', ('user_id', 'product_id')),
+}
+
+def rollup_key(instance):
+    """
+    Zwraca (klucz agregatu, wartość) dla zdarzenia. Daty i kwoty są normalizowane
+    tak samo jak przy zapisie do bazy, więc datetime trafia do właściwego dnia.
+    """
+    rollup, date_field, value_field, key_fields = ROLLUP_SPECS[type(instance)]
+    opts = type(instance)._meta
+    key = {field: getattr(instance, field) for field in key_fields}
+    key['date'] = opts.get_field(date_field).to_python(getattr(instance, date_field))
+    value = opts.get_field(value_field).to_python(getattr(instance, value_field))
+    return key, value
+
+def apply_rollup_delta(model, key, count, value):
+    """
+    Dodaje (count > 0) lub odejmuje (count < 0) zdarzenia z dziennego agregatu.
+    Odejmowanie nigdy nie tworzy wierszy - przy kaskadowym usuwaniu produktu
+    agregat mógł już zniknąć.
+    """
+    rollup = ROLLUP_SPECS[model][0]
+    with transaction.atomic():
+        if count > 0:
+            obj, created = rollup.objects.get_or_create(
+                **key, defaults={'entry_count': count, 'total': value}
+            )
+            if not created:
+                rollup.objects.filter(pk=obj.pk).update(
+                    entry_count=F('entry_count') + count,
+                    total=F('total') + value,
+                )
+        else:
+            rows = rollup.objects.filter(**key)
+            rows.update(entry_count=F('entry_count') + count, total=F('total') - value)
+            rows.filter(entry_count__lte=0).delete()
+
+def rebuild_rollups(user=None, batch_size=1000):
+    """
+    Przebudowuje agregaty od zera na podstawie surowych zdarzeń.
+    Zwraca słownik {model agregatu: liczba utworzonych wierszy}.
+    """
+    created = {}
+    with transaction.atomic():
+        for model, (rollup, date_field, value_field, key_fields) in ROLLUP_SPECS.items():
+            events = model.objects.all()
+            rollups = rollup.objects.all()
+            if user is not None:
+                events = events.filter(user=user)
+                rollups = rollups.filter(user=user)
+            rollups.delete()
+
+            rows = events.order_by().values(*key_fields, date_field).annotate(
+                rollup_count=Count('id'),
+                rollup_total=Sum(value_field),
+            )
+            objects = (
+                rollup(
+                    **{field: row[field] for field in key_fields},
+                    date=row[date_field],
+                    entry_count=row['rollup_count'],
+                    total=row['rollup_total'] or 0,
+                )
+                for row in rows.iterator(chunk_size=batch_size)
+            )
+            created[rollup] = 0
+            while batch := list(islice(objects, batch_size)):
+                rollup.objects.bulk_create(batch)
+                created[rollup] += len(batch)
+    return created
+
+def rollup_summary(rollups):
+    """Zwraca liczbę zdarzeń, sumę i średnią na zdarzenie dla zbioru agregatów."""
+    totals = rollups.aggregate(entry_count=Sum('entry_count'), total=Sum('total'))
+    entry_count = totals['entry_count'] or 0
+    total = totals['total'] or Decimal('0')
+    average = (total / entry_count).quantize(Decimal('0.01')) if entry_count else 0
+    return {'entry_count': entry_count, 'total': total, 'average': average}
+
+def rollup_monthly_trends(rollups):
+    """Sumy miesięczne agregatów w formacie [{'month': 'YYYY-MM-DD', 'total': ...}]."""
+    trends = rollups.annotate(
+        month=TruncMonth('date')
+    ).values('month').annotate(
+        total=Sum('total')
+    ).order_by('month')
+    return [
+        {'month': trend['month'].strftime('%Y-%m-%d'), 'total': trend['total']}
+        for trend in trends
+    ]
+
+# Serie dostępne w API trendów
+TREND_SERIES = {
+    'expense': DailyExpenseRollup,
+    'consumption': DailyConsumptionRollup,
+    'wastage': DailyWastageRollup,
+}
+
+TREND_GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+def trend_periods(start_date, end_date, granularity):
+    """Początki kolejnych okresów (dni, tygodni od poniedziałku, miesięcy) w zakresie dat."""
+    if granularity == 'week':
+        current = start_date - timedelta(days=start_date.weekday())
+    elif granularity == 'month':
+        current = start_date.replace(day=1)
+    else:
+        current = start_date
+    while current <= end_date:
+        yield current
+        if granularity == 'week':
+            current += timedelta(days=7)
+        elif granularity == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+
+def rollup_trends(rollups, granularity, start_date, end_date, periods=None):
+    """
+    Sumy i liczby zdarzeń w okresach `granularity` - jedno zapytanie grupujące.
+    Okresy bez danych mają wartość 0, więc listy są zgodne z `trend_periods`.
+    """
+    trunc = TREND_GRANULARITIES[granularity]
+    rows = rollups.filter(date__range=(start_date, end_date)).annotate(
+        period=trunc('date')
+    ).values('period').annotate(
+        total=Sum('total'),
+        entry_count=Sum('entry_count')
+    ).order_by()
+    by_period = {row['period']: row for row in rows}
+    if periods is None:
+        periods = list(trend_periods(start_date, end_date, granularity))
+
+    values, counts = [], []
+    for period in periods:
+        row = by_period.get(period)
+        values.append(row['total'] if row else Decimal('0'))
+        counts.append(row['entry_count'] if row else 0)
+    return {'values': values, 'counts': counts}
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from .models import DailyConsumptionRollup, DailyExpenseRollup, DailyWastageRollup
+
+@dataclass(frozen=True)
+class DashboardStats:
+    """Wskaźniki dashboardu za ostatnie `days` dni."""
+    since: date
+    consumption_count: int = 0
+    consumption_quantity: Decimal = Decimal('0')
+    expense_count: int = 0
+    expense_amount: Decimal = Decimal('0')
+    wastage_count: int = 0
+    wastage_quantity: Decimal = Decimal('0')
+    expense_trends: list = field(default_factory=list)
+    top_products: list = field(default_factory=list)
+
+    def as_context(self):
+        """Kontekst w formacie oczekiwanym przez szablon reports/dashboard.html."""
+        return {
+            'consumption_stats': {
+                'total_consumptions': self.consumption_count,
+                'total_quantity': self.consumption_quantity,
+            },
+            'expense_stats': {
+                'total_expenses': self.expense_count,
+                'total_amount': self.expense_amount,
+            },
+            'wastage_stats': {
+                'total_wastages': self.wastage_count,
+                'total_quantity': self.wastage_quantity,
+            },
+            'expense_trends': self.expense_trends,
+            'top_products': self.top_products,
+        }
+
+def _month_starts(since, until):
+    """Zwraca pierwsze dni kolejnych miesięcy zachodzących na przedział [since, until]."""
+    month = since.replace(day=1)
+    while month <= until:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+def _rollup_value(rollup, since, aggregate):
+    """Podzapytanie zwracające jedną agregowaną wartość agregatów użytkownika."""
+    return Subquery(
+        rollup.objects.filter(
+            user=OuterRef('pk'),
+            date__gte=since
+        ).order_by().values('user').annotate(value=aggregate).values('value')[:1]
+    )
+
+def get_dashboard_stats(user, days=30, top_products_limit=5):
+    """
+    Liczy wszystkie wskaźniki dashboardu w dwóch zapytaniach.
+
+    Pierwsze zapytanie zbiera liczniki i sumy z trzech tabel agregatów oraz
+    miesięczne sumy wydatków (agregacja warunkowa - jedna suma na miesiąc).
+    Drugie zwraca najczęściej zużywane produkty.
+    """
+    today = timezone.localdate()
+    since = today - timedelta(days=days)
+    months = list(_month_starts(since, today))
+
+    annotations = {
+        'consumption_count': _rollup_value(DailyConsumptionRollup, since, Sum('entry_count')),
+        'consumption_quantity': _rollup_value(DailyConsumptionRollup, since, Sum('total')),
+        'expense_count': _rollup_value(DailyExpenseRollup, since, Sum('entry_count')),
+        'expense_amount': _rollup_value(DailyExpenseRollup, since, Sum('total')),
+        'wastage_count': _rollup_value(DailyWastageRollup, since, Sum('entry_count')),
+        'wastage_quantity': _rollup_value(DailyWastageRollup, since, Sum('total')),
+    }
+    for index, month in enumerate(months):
+        next_month = months[index + 1] if index + 1 < len(months) else None
+        month_filter = Q(date__gte=month)
+        if next_month is not None:
+            month_filter &= Q(date__lt=next_month)
+        annotations[f'expense_month_{index}'] = _rollup_value(
+            DailyExpenseRollup, since, Sum('total', filter=month_filter)
+        )
+
+    row = get_user_model().objects.filter(pk=user.pk).annotate(
+        **annotations
+    ).values(*annotations).get()
+
+    expense_trends = []
+    for index, month in enumerate(months):
+        total = row[f'expense_month_{index}']
+        if total is not None:
+            expense_trends.append({'month': month.strftime('%Y-%m-%d'), 'total': total})
+
+    top_products = list(
+        DailyConsumptionRollup.objects.filter(
+            user=user,
+            date__gte=since
+        ).values(
+            'product__name'
+        ).annotate(
+            total_quantity=Sum('total'),
+            count=Sum('entry_count')
+        ).order_by('-total_quantity')[:top_products_limit]
+    )
+
+    return DashboardStats(
+        since=since,
+        consumption_count=row['consumption_count'] or 0,
+        consumption_quantity=row['consumption_quantity'] or Decimal('0'),
+        expense_count=row['expense_count'] or 0,
+        expense_amount=row['expense_amount'] or Decimal('0'),
+        wastage_count=row['wastage_count'] or 0,
+        wastage_quantity=row['wastage_quantity'] or Decimal('0'),
+        expense_trends=expense_trends,
+        top_products=top_products,
+    )
@@ -0,0 +1,76 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from products.models import Product, Category
+from shopping_list.models import ShoppingList
+from .models import ProductConsumption, ShoppingExpense, ProductWastage
+from .cache import bump_data_version
+from .rollups import rollup_key, apply_rollup_delta
+
+@receiver(pre_save, sender=ProductConsumption)
+@receiver(pre_save, sender=ShoppingExpense)
+@receiver(pre_save, sender=ProductWastage)
+def remember_rollup_key(sender, instance, raw=False, **kwargs):
+    """Zapamiętuje poprzedni klucz agregatu edytowanego zdarzenia."""
+    if raw or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    instance._previous_rollup_key = rollup_key(previous) if previous else None
+
+@receiver(post_save, sender=ProductConsumption)
+@receiver(post_save, sender=ShoppingExpense)
+@receiver(post_save, sender=ProductWastage)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    """Aktualizuje dzienne agregaty po dodaniu lub edycji zdarzenia."""
+    if raw:
+        return
+    current = rollup_key(instance)
+    previous = None if created else getattr(instance, '_previous_rollup_key', None)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_rollup_delta(sender, previous[0], -1, previous[1])
+    apply_rollup_delta(sender, current[0], 1, current[1])
+
+@receiver(post_delete, sender=ProductConsumption)
+@receiver(post_delete, sender=ShoppingExpense)
+@receiver(post_delete, sender=ProductWastage)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Odejmuje usunięte zdarzenie z dziennego agregatu."""
+    key, value = rollup_key(instance)
+    apply_rollup_delta(sender, key, -1, value)
+
+@receiver(post_save, sender=ProductConsumption)
+@receiver(post_save, sender=ShoppingExpense)
+@receiver(post_save, sender=ProductWastage)
+@receiver(post_delete, sender=ProductConsumption)
+@receiver(post_delete, sender=ShoppingExpense)
+@receiver(post_delete, sender=ProductWastage)
+def bump_report_data_version(sender, instance, raw=False, **kwargs):
+    """Każda zmiana danych raportowych unieważnia wyniki zapisane w cache."""
+    if raw:
+        return
+    bump_data_version(instance.user_id)
+
+# Wiersze raportów pokazują nazwy produktów, kategorii i list zakupów -
+# ich zmiana też musi unieważnić zapisane wyniki (np. gotowe PDF-y)
+
+@receiver(post_save, sender=Product)
+def bump_version_on_product_rename(sender, instance, created, raw=False, **kwargs):
+    if raw or created or not instance.has_changed('name', 'category_id'):
+        return
+    bump_data_version(instance.user_id)
+
+@receiver(post_save, sender=ShoppingList)
+def bump_version_on_shopping_list_change(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    bump_data_version(instance.user_id)
+
+@receiver(post_save, sender=Category)
+def bump_version_on_category_change(sender, instance, created, raw=False, **kwargs):
+    """Kategorie są wspólne - unieważnia wyniki każdego użytkownika z produktami w tej kategorii."""
+    if raw or created:
+        return
+    user_ids = Product.objects.filter(category=instance).values_list('user_id', flat=True).order_by().distinct()
+    for user_id in user_ids:
+        bump_data_version(user_id)
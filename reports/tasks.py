@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from jobs.queue import task
+from .export import build_export_artifact, purge_expired_exports
+from .models import ReportExport
+from .notifications import generate_report_notifications
+
+@task('reports.generate_report_notifications')
+def generate_report_notifications_task(user_id):
+    """Zadanie kolejki: sprawdza progi raportowe jednego użytkownika."""
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is not None:
+        generate_report_notifications(user)
+
+@task('reports.build_export')
+def build_export_task(export_id):
+    """Zadanie kolejki: generuje plik zleconego eksportu."""
+    export = ReportExport.objects.select_related('user').filter(pk=export_id).first()
+    if export is not None:
+        build_export_artifact(export)
+
+@task('reports.purge_expired_exports')
+def purge_expired_exports_task():
+    """Zadanie kolejki: usuwa wygasłe pliki eksportów."""
+    purge_expired_exports()
@@ -0,0 +1,88 @@
+import threading
+from decimal import Decimal
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from products.models import Product, Category
+from reports.cache import cached_for_user, cache_stats, get_data_version
+from reports.models import ProductConsumption
+
+User = get_user_model()
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.product = Product.objects.create(
+            name='Mleko', category=Category.objects.create(name='Nabiał'),
+            expiry_date=timezone.localdate() + timedelta(days=3), quantity=1, unit='l', user=self.user
+        )
+        self._consume(Decimal('1.00'))
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _consume(self, quantity):
+        ProductConsumption.objects.create(
+            user=self.user, product=self.product, quantity=quantity, unit='l',
+            consumption_date=timezone.localdate()
+        )
+
+    def test_trends_api_served_from_cache(self):
+        """Drugie wywołanie API trendów nie liczy agregatów ponownie"""
+        url = reverse('reports:consumption_trends_api')
+        first = self.client.get(url).json()
+        # sesja + użytkownik + wersja danych
+        with self.assertNumQueries(3):
+            second = self.client.get(url).json()
+        self.assertEqual(first, second)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_report_view_and_api_share_trends(self):
+        """Widok raportu i API trendów korzystają z tego samego wpisu"""
+        self.client.get(reverse('reports:consumption_report'))
+        self.client.get(reverse('reports:consumption_trends_api'))
+        self.assertEqual(cache_stats()['hits'], 1)
+
+    def test_data_change_invalidates_user_entries(self):
+        """Zapis i usunięcie zdarzenia podbijają wersję danych użytkownika w tej samej transakcji"""
+        url = reverse('reports:consumption_trends_api')
+        self.assertEqual(Decimal(self.client.get(url).json()[0]['total']), Decimal('1.00'))
+        version = get_data_version(self.user.pk)
+
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            self._consume(Decimal('2.50'))
+            raise DatabaseError
+        # Wycofana zmiana nie podbija wersji
+        self.assertEqual(get_data_version(self.user.pk), version)
+
+        self._consume(Decimal('2.50'))
+        self.assertEqual(get_data_version(self.user.pk), version + 1)
+        self.assertEqual(Decimal(self.client.get(url).json()[0]['total']), Decimal('3.50'))
+
+        ProductConsumption.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(url).json(), [])
+
+    def test_concurrent_miss_waits_for_single_computation(self):
+        """Gdy wartość już ktoś liczy, kolejne żądanie czeka na jego wynik"""
+        key = f'reports:{self.user.pk}:{get_data_version(self.user.pk)}:wolne'
+        cache.add(f'{key}:lock', 1)
+        threading.Timer(0.1, cache.set, args=[key, 'wynik']).start()
+
+        def compute():
+            raise AssertionError('Wartość liczona drugi raz')
+
+        self.assertEqual(cached_for_user(self.user.pk, 'wolne', compute), 'wynik')
+
+    def test_cache_stats_endpoint_requires_staff(self):
+        url = reverse('reports:cache_stats_api')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertEqual(self.client.get(url).json()['hits'], 0)
@@ -0,0 +1,94 @@
+from decimal import Decimal
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from products.models import Product, Category
+from shopping_list.models import ShoppingList
+from reports.models import ProductConsumption, ShoppingExpense, ProductWastage
+from reports.services import DashboardStats, get_dashboard_stats
+
+User = get_user_model()
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Nabiał')
+        self.products = [
+            Product.objects.create(
+                name=f'Produkt {i}',
+                category=self.category,
+                expiry_date=timezone.localdate() + timedelta(days=5),
+                quantity=2,
+                unit='szt',
+                user=self.user
+            )
+            for i in range(3)
+        ]
+        shopping_list = ShoppingList.objects.create(name='Zakupy', user=self.user)
+        today = timezone.localdate()
+        for i in range(20):
+            ProductConsumption.objects.create(
+                user=self.user,
+                product=self.products[i % 3],
+                quantity=Decimal('1.00'),
+                unit='szt',
+                consumption_date=today - timedelta(days=i)
+            )
+            ShoppingExpense.objects.create(
+                user=self.user,
+                shopping_list=shopping_list,
+                total_amount=Decimal('10.00'),
+                shopping_date=today - timedelta(days=i)
+            )
+        ProductWastage.objects.create(
+            user=self.user,
+            product=self.products[0],
+            quantity=Decimal('0.50'),
+            unit='szt',
+            wastage_date=today,
+            reason='Przeterminowany'
+        )
+        # Zdarzenie spoza okna 30 dni nie wchodzi do statystyk
+        ShoppingExpense.objects.create(
+            user=self.user,
+            shopping_list=shopping_list,
+            total_amount=Decimal('999.00'),
+            shopping_date=today - timedelta(days=60)
+        )
+
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_stats_values(self):
+        """Serwis zwraca poprawne wskaźniki"""
+        stats = get_dashboard_stats(self.user)
+        self.assertIsInstance(stats, DashboardStats)
+        self.assertEqual(stats.consumption_count, 20)
+        self.assertEqual(stats.consumption_quantity, Decimal('20.00'))
+        self.assertEqual(stats.expense_count, 20)
+        self.assertEqual(stats.expense_amount, Decimal('200.00'))
+        self.assertEqual(stats.wastage_count, 1)
+        self.assertEqual(stats.wastage_quantity, Decimal('0.50'))
+        self.assertEqual(sum(trend['total'] for trend in stats.expense_trends), Decimal('200.00'))
+        self.assertEqual(len(stats.top_products), 3)
+
+    def test_stats_query_count(self):
+        """Wskaźniki dashboardu liczone są w dwóch zapytaniach"""
+        with self.assertNumQueries(2):
+            get_dashboard_stats(self.user)
+
+    def test_dashboard_query_count(self):
+        """Liczba zapytań dashboardu nie zależy od liczby zdarzeń"""
+        # sesja + użytkownik + zlecenie powiadomień (1) + wersja danych (1) + wskaźniki (2)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('reports:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['expense_stats']['total_expenses'], 20)
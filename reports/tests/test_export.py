@@ -0,0 +1,195 @@
+import os
+import time
+from unittest import mock
+from decimal import Decimal
+from datetime import timedelta
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from products.models import Product, Category
+from reports.models import ProductConsumption
+from reports.export import iter_chunks, iter_csv, REPORTS
+from reports.pdf import ReportPdfError, render_pdf, run_in_pool
+
+User = get_user_model()
+
+@override_settings(REPORT_PDF_WORKERS=0)
+class StreamingCsvExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Nabiał')
+        products = [
+            Product.objects.create(
+                name=f'Produkt {i}',
+                category=self.category,
+                expiry_date=timezone.localdate() + timedelta(days=5),
+                quantity=2,
+                unit='szt',
+                user=self.user
+            )
+            for i in range(5)
+        ]
+        ProductConsumption.objects.bulk_create([
+            ProductConsumption(
+                user=self.user,
+                product=products[i % 5],
+                quantity=Decimal('1.50'),
+                unit='szt',
+                consumption_date=timezone.localdate() - timedelta(days=i % 10)
+            )
+            for i in range(50)
+        ])
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_chunks_are_bounded(self):
+        """Generator zwraca nagłówek i porcje po chunk_size wierszy"""
+        chunks = list(iter_csv(
+            ProductConsumption.objects.filter(user=self.user).values_list(
+                'consumption_date', 'product__name', 'product__category__name', 'quantity'
+            ).iterator(),
+            ['Data', 'Produkt', 'Kategoria', 'Ilość'],
+            chunk_size=20
+        ))
+        self.assertEqual(chunks[0], 'Data,Produkt,Kategoria,Ilość\r\n')
+        self.assertEqual([chunk.count('\r\n') for chunk in chunks[1:]], [20, 20, 10])
+        self.assertIn('Nabiał', chunks[1])
+
+    def test_export_view_streams_with_single_data_query(self):
+        """Eksport CSV jest strumieniowany, a relacje pobiera jeden JOIN"""
+        # sesja + użytkownik + jedno zapytanie z danymi
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('reports:export_consumption_csv'))
+            content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(content.count('\r\n'), 51)
+
+    def test_every_report_and_format_share_query_path(self):
+        """Każdy format każdego raportu to jedno zapytanie z danymi (PDF: + podsumowanie i wersja danych)"""
+        for report in REPORTS:
+            for format, queries in [('csv', 3), ('jsonl', 3), ('pdf', 5)]:
+                with self.subTest(report=report, format=format):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(reverse('reports:export_report', args=[report, format]))
+                        content = b''.join(response.streaming_content)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn(f'{report}_', response['Content-Disposition'])
+                    if format == 'pdf':
+                        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_jsonl_rows(self):
+        """JSON Lines zawiera jeden obiekt na wiersz"""
+        response = self.client.get(reverse('reports:export_report', args=['consumption', 'jsonl']))
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 50)
+        self.assertIn('"product__category__name": "Nabiał"', lines[0])
+
+    def test_date_range_and_invalid_parameters(self):
+        """Zakres dat zawęża eksport, błędne parametry dają 400/404"""
+        today = timezone.localdate()
+        response = self.client.get(
+            reverse('reports:export_report', args=['consumption', 'csv']),
+            {'start': today.isoformat(), 'end': today.isoformat()}
+        )
+        self.assertEqual(b''.join(response.streaming_content).count(b'\r\n'), 6)
+
+        url = reverse('reports:export_report', args=['consumption', 'csv'])
+        self.assertEqual(self.client.get(url, {'start': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'wczoraj'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('reports:export_report', args=['consumption', 'xml'])).status_code, 400)
+        self.assertEqual(self.client.get(reverse('reports:export_report', args=['inny', 'csv'])).status_code, 404)
+
+    async def test_export_is_not_buffered_under_asgi(self):
+        """Pod ASGI eksport wysyła porcje w miarę ich generowania, a nie cały plik naraz"""
+        produced = []
+
+        def small_chunks(lines, chunk_size=2000):
+            for chunk in iter_chunks(lines, chunk_size=10):
+                produced.append(chunk)
+                yield chunk
+
+        await self.async_client.aforce_login(self.user)
+        with mock.patch('reports.export.iter_chunks', small_chunks):
+            response = await self.async_client.get(reverse('reports:export_consumption_csv'))
+            self.assertTrue(response.is_async)
+            stream = response.streaming_content
+            self.assertEqual(await anext(stream), 'Data,Produkt,Kategoria,Ilość,Jednostka\r\n'.encode())
+            self.assertEqual((await anext(stream)).count(b'\r\n'), 10)
+            # Generator stoi na pierwszej porcji - reszta danych nie została jeszcze odczytana
+            self.assertEqual(len(produced), 1)
+            rest = b''.join([chunk async for chunk in stream])
+        self.assertEqual(rest.count(b'\r\n'), 40)
+        self.assertEqual(len(produced), 5)
+
+    def test_pdf_is_cached_until_data_changes(self):
+        """Powtórne pobranie niezmienionego raportu PDF nie odpytuje bazy"""
+        url = reverse('reports:export_report', args=['consumption', 'pdf'])
+        first = b''.join(self.client.get(url).streaming_content)
+        # sesja + użytkownik + wersja danych, PDF z cache
+        with self.assertNumQueries(3):
+            second = b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(first, second)
+
+        ProductConsumption.objects.filter(user=self.user).first().delete()
+        with self.assertNumQueries(5):
+            b''.join(self.client.get(url).streaming_content)
+
+    def test_pdf_is_rebuilt_after_rename(self):
+        """Nazwy produktów i kategorii są w wierszach raportu - ich zmiana unieważnia PDF"""
+        url = reverse('reports:export_report', args=['consumption', 'pdf'])
+        b''.join(self.client.get(url).streaming_content)
+        for obj in [Product.objects.filter(user=self.user).first(), self.category]:
+            obj.name = 'Nowa nazwa'
+            obj.save()
+            with self.subTest(model=type(obj).__name__), self.assertNumQueries(5):
+                b''.join(self.client.get(url).streaming_content)
+
+        # Zapis bez zmiany nazwy nie unieważnia wyników
+        product = Product.objects.filter(user=self.user).first()
+        product.quantity = 7
+        product.save()
+        with self.assertNumQueries(3):
+            b''.join(self.client.get(url).streaming_content)
+
+    @override_settings(REPORT_PDF_WORKERS=1)
+    def test_pdf_timeout_returns_503(self):
+        url = reverse('reports:export_report', args=['consumption', 'pdf'])
+        with mock.patch('reports.pdf.run_in_pool', side_effect=ReportPdfError('Generowanie PDF przekroczyło 60 s')):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('eksport w tle', response.content.decode())
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+def _crash():
+    os._exit(1)
+
+@override_settings(REPORT_PDF_WORKERS=1)
+class PdfPoolTests(SimpleTestCase):
+    """Pula procesów PDF: wynik, przekroczenie czasu i odtworzenie po awarii."""
+
+    def _render(self):
+        return run_in_pool(render_pdf, 'Raport', ['Kolumna'], [['wartość']], timeout=30)
+
+    def test_renders_in_pool(self):
+        self.assertTrue(self._render().startswith(b'%PDF'))
+
+    def test_timeout(self):
+        with self.assertRaisesMessage(ReportPdfError, 'przekroczyło'):
+            run_in_pool(_sleep, 1, timeout=0.1)
+
+    def test_pool_is_rebuilt_after_crash(self):
+        self._render()
+        with self.assertRaisesMessage(ReportPdfError, 'awarii'):
+            run_in_pool(_crash, timeout=30)
+        self.assertTrue(self._render().startswith(b'%PDF'))
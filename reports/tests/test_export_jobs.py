@@ -0,0 +1,143 @@
+import gzip
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from asgiref.sync import sync_to_async
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from jobs.models import Job
+from products.models import Product, Category
+from reports.models import ProductWastage, ReportExport
+from reports.export import purge_expired_exports
+from reports.pdf import ReportPdfError
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, REPORT_PDF_WORKERS=0)
+class ReportExportJobTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        product = Product.objects.create(
+            name='Chleb',
+            category=Category.objects.create(name='Pieczywo'),
+            expiry_date=timezone.localdate() + timedelta(days=2),
+            quantity=1,
+            unit='szt',
+            user=self.user
+        )
+        ProductWastage.objects.bulk_create([
+            ProductWastage(
+                user=self.user,
+                product=product,
+                quantity=Decimal('0.50'),
+                unit='szt',
+                wastage_date=timezone.localdate() - timedelta(days=i),
+                reason='Czerstwy'
+            )
+            for i in range(20)
+        ])
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _run_export(self, format='csv'):
+        response = self.client.post(reverse('reports:export_report_async', args=['wastage', format]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], ReportExport.PENDING)
+        call_command('run_jobs', processes=0, once=True, stdout=StringIO())
+        return ReportExport.objects.get(pk=response.json()['id'])
+
+    def test_export_runs_in_background_and_downloads_compressed(self):
+        """Eksport w tle daje ten sam plik co eksport synchroniczny, skompresowany"""
+        export = self._run_export()
+        status = self.client.get(reverse('reports:export_status', args=[export.pk])).json()
+        self.assertEqual(status['status'], ReportExport.DONE)
+        self.assertGreater(export.expires_at, timezone.now())
+
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        archive = b''.join(response.streaming_content)
+        self.assertEqual(len(archive), export.size)
+
+        expected = b''.join(self.client.get(reverse('reports:export_report', args=['wastage', 'csv'])).streaming_content)
+        self.assertEqual(gzip.decompress(archive), expected)
+        # Sprzątanie czeka w kolejce na termin wygaśnięcia
+        self.assertTrue(Job.objects.filter(name='reports.purge_expired_exports', status=Job.PENDING).exists())
+
+    def test_download_supports_ranges(self):
+        """Pobieranie można wznowić od dowolnego bajtu"""
+        export = self._run_export('pdf')
+        url = reverse('reports:export_download', args=[export.pk])
+        archive = b''.join(self.client.get(url).streaming_content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{export.size}')
+        self.assertEqual(b''.join(response.streaming_content), archive[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), archive[-5:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={export.size}-')
+        self.assertEqual(response.status_code, 416)
+
+    async def test_download_is_streamed_under_asgi(self):
+        """Pod ASGI pobranie czyta plik porcjami zamiast buforować go w pamięci"""
+        export = await sync_to_async(self._run_export)('pdf')
+        archive = await sync_to_async(lambda: export.file.read())()
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse('reports:export_download', args=[export.pk]), headers={'Range': 'bytes=10-'}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), archive[10:])
+
+    @override_settings(REPORT_PDF_WORKERS=1, REPORT_PDF_TIMEOUT=60, REPORT_EXPORT_PDF_TIMEOUT=900)
+    def test_pdf_export_uses_its_own_timeout(self):
+        """PDF w tle ma osobny limit czasu; jego przekroczenie oznacza eksport jako nieudany"""
+        error = ReportPdfError('Generowanie PDF przekroczyło 900 s')
+        with mock.patch('reports.pdf.run_in_pool', side_effect=error) as run_in_pool:
+            export = self._run_export('pdf')
+        self.assertEqual(run_in_pool.call_args.kwargs['timeout'], 900)
+        self.assertEqual(export.status, ReportExport.FAILED)
+        self.assertIn('900 s', export.error)
+
+    def test_expired_exports_are_purged(self):
+        """Wygasły eksport nie jest wydawany, a sprzątanie usuwa plik i wpis"""
+        export = self._run_export()
+        path = export.file.path
+        ReportExport.objects.filter(pk=export.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client.get(reverse('reports:export_download', args=[export.pk])).status_code, 410)
+
+        self.assertEqual(purge_expired_exports(), 1)
+        self.assertFalse(ReportExport.objects.filter(pk=export.pk).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_other_users_cannot_see_export(self):
+        """Eksport widzi tylko jego właściciel"""
+        export = self._run_export()
+        User.objects.create_user(username='inny', email='inny@example.com', password='testpass123')
+        self.client.login(username='inny', password='testpass123')
+        self.assertEqual(self.client.get(reverse('reports:export_status', args=[export.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('reports:export_download', args=[export.pk])).status_code, 404)
@@ -0,0 +1,107 @@
+import re
+from decimal import Decimal
+from datetime import timedelta
+from django.db import connection
+from unittest import skipUnless
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from notifications.models import Notification
+from products.models import Product, Category
+from shopping_list.models import ShoppingList
+from reports.models import ProductConsumption, ShoppingExpense, ProductWastage
+
+User = get_user_model()
+
+INDEXED_TABLES = [
+    ProductConsumption._meta.db_table,
+    ShoppingExpense._meta.db_table,
+    ProductWastage._meta.db_table,
+    Product._meta.db_table,
+    Notification._meta.db_table,
+]
+
+@skipUnless(connection.vendor == 'sqlite', 'Test odczytuje plan zapytań w formacie SQLite')
+@override_settings(REPORT_PDF_WORKERS=0)
+class QueryPlanTests(TestCase):
+    """Zapytania widoków po (użytkownik, data/flaga) korzystają z indeksów."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        today = timezone.localdate()
+        product = Product.objects.create(
+            name='Mleko', category=Category.objects.create(name='Nabiał'),
+            expiry_date=today + timedelta(days=3), quantity=1, unit='l', user=self.user
+        )
+        ProductConsumption.objects.create(
+            user=self.user, product=product, quantity=Decimal('1'), unit='l', consumption_date=today
+        )
+        ProductWastage.objects.create(
+            user=self.user, product=product, quantity=Decimal('1'), unit='l', wastage_date=today, reason='Zepsute'
+        )
+        ShoppingExpense.objects.create(
+            user=self.user, shopping_list=ShoppingList.objects.create(name='Zakupy', user=self.user),
+            total_amount=Decimal('10.00'), shopping_date=today
+        )
+        Notification.objects.create(user=self.user, notification_type='expiry', title='Mleko', message='Mleko')
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+
+    def _query_plans(self, urls):
+        with CaptureQueriesContext(connection) as context:
+            for url in urls:
+                response = self.client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200, url)
+        plans = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            tables = [table for table in INDEXED_TABLES if re.search(rf'FROM "{table}"', sql)]
+            if not sql.startswith('SELECT') or not tables:
+                continue
+            with connection.cursor() as cursor:
+                # captured_queries zawiera SQL z wstawionymi parametrami
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append((sql, tables, [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertUsesIndexes(self, urls):
+        plans = self._query_plans(urls)
+        self.assertTrue(plans)
+        for sql, tables, plan in plans:
+            for table in tables:
+                with self.subTest(sql=sql):
+                    # Pełny przegląd tabeli albo sortowanie całego wyniku poza indeksem
+                    bad_steps = [
+                        step for step in plan
+                        if re.fullmatch(rf'SCAN {table}', step) or step == 'USE TEMP B-TREE FOR ORDER BY'
+                    ]
+                    self.assertEqual(bad_steps, [], plan)
+
+    def test_report_views(self):
+        self.assertUsesIndexes([
+            reverse('reports:consumption_report'),
+            reverse('reports:expense_report'),
+            reverse('reports:wastage_report'),
+            reverse('reports:export_report', args=['consumption', 'csv']),
+            reverse('reports:export_report', args=['expense', 'csv']),
+            reverse('reports:export_report', args=['wastage', 'csv']),
+        ])
+
+    def test_product_views(self):
+        self.assertUsesIndexes([reverse('products:list')])
+
+    def test_notification_views(self):
+        self.assertUsesIndexes([
+            reverse('notifications:list'),
+            reverse('notifications:unread_count'),
+        ])
@@ -0,0 +1,126 @@
+from decimal import Decimal
+from io import StringIO
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from products.models import Product, Category
+from shopping_list.models import ShoppingList
+from reports.models import (
+    ProductConsumption, ShoppingExpense, ProductWastage,
+    DailyConsumptionRollup, DailyExpenseRollup, DailyWastageRollup,
+)
+
+User = get_user_model()
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Nabiał')
+        self.product = Product.objects.create(
+            name='Mleko',
+            category=self.category,
+            expiry_date=timezone.localdate() + timedelta(days=5),
+            quantity=2,
+            unit='l',
+            user=self.user
+        )
+        self.shopping_list = ShoppingList.objects.create(name='Zakupy', user=self.user)
+        self.today = timezone.localdate()
+
+    def add_consumption(self, quantity, days_ago=0):
+        return ProductConsumption.objects.create(
+            user=self.user,
+            product=self.product,
+            quantity=quantity,
+            unit='l',
+            consumption_date=self.today - timedelta(days=days_ago)
+        )
+
+    def test_insert_creates_and_increments_rollup(self):
+        """Dodanie zdarzeń zwiększa dzienny agregat"""
+        self.add_consumption(Decimal('1.50'))
+        self.add_consumption(Decimal('0.50'))
+        rollup = DailyConsumptionRollup.objects.get(user=self.user, product=self.product, date=self.today)
+        self.assertEqual(rollup.entry_count, 2)
+        self.assertEqual(rollup.total, Decimal('2.00'))
+
+    def test_update_moves_event_between_days(self):
+        """Edycja daty przenosi zdarzenie do innego agregatu"""
+        consumption = self.add_consumption(Decimal('1.00'))
+        consumption.consumption_date = self.today - timedelta(days=3)
+        consumption.quantity = Decimal('4.00')
+        consumption.save()
+        self.assertFalse(DailyConsumptionRollup.objects.filter(date=self.today).exists())
+        rollup = DailyConsumptionRollup.objects.get(date=self.today - timedelta(days=3))
+        self.assertEqual(rollup.entry_count, 1)
+        self.assertEqual(rollup.total, Decimal('4.00'))
+
+    def test_delete_decrements_and_removes_empty_rollup(self):
+        """Usunięcie zdarzeń zmniejsza agregat i usuwa pusty wiersz"""
+        first = self.add_consumption(Decimal('1.00'))
+        second = self.add_consumption(Decimal('2.00'))
+        first.delete()
+        rollup = DailyConsumptionRollup.objects.get(date=self.today)
+        self.assertEqual(rollup.entry_count, 1)
+        self.assertEqual(rollup.total, Decimal('2.00'))
+        second.delete()
+        self.assertFalse(DailyConsumptionRollup.objects.exists())
+
+    def test_product_cascade_delete(self):
+        """Kaskadowe usunięcie produktu nie zostawia agregatów"""
+        self.add_consumption(Decimal('1.00'))
+        ProductWastage.objects.create(
+            user=self.user,
+            product=self.product,
+            quantity=Decimal('1.00'),
+            unit='l',
+            wastage_date=self.today,
+            reason='Przeterminowany'
+        )
+        self.product.delete()
+        self.assertFalse(DailyConsumptionRollup.objects.exists())
+        self.assertFalse(DailyWastageRollup.objects.exists())
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        """Komenda przebudowy odtwarza te same agregaty co sygnały"""
+        for days_ago in range(5):
+            self.add_consumption(Decimal('1.25'), days_ago=days_ago % 2)
+            ShoppingExpense.objects.create(
+                user=self.user,
+                shopping_list=self.shopping_list,
+                total_amount=Decimal('10.00'),
+                shopping_date=self.today - timedelta(days=days_ago)
+            )
+        expected = set(DailyConsumptionRollup.objects.values_list('date', 'entry_count', 'total'))
+        expected_expenses = set(DailyExpenseRollup.objects.values_list('date', 'entry_count', 'total'))
+
+        DailyConsumptionRollup.objects.all().delete()
+        DailyExpenseRollup.objects.update(total=0)
+        call_command('rebuild_report_rollups', stdout=StringIO())
+
+        self.assertEqual(set(DailyConsumptionRollup.objects.values_list('date', 'entry_count', 'total')), expected)
+        self.assertEqual(set(DailyExpenseRollup.objects.values_list('date', 'entry_count', 'total')), expected_expenses)
+
+    def test_report_views_read_rollups(self):
+        """Raporty i API trendów liczą statystyki z agregatów"""
+        self.add_consumption(Decimal('1.00'))
+        self.add_consumption(Decimal('2.00'), days_ago=1)
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+
+        response = client.get(reverse('reports:consumption_report'))
+        self.assertEqual(response.context['total_consumption'], Decimal('3.00'))
+        self.assertEqual(response.context['avg_consumption'], Decimal('1.50'))
+        self.assertEqual(response.context['total_products'], 1)
+
+        response = client.get(reverse('reports:consumption_trends_api'))
+        self.assertEqual(sum(Decimal(str(row['total'])) for row in response.json()), Decimal('3.00'))
@@ -0,0 +1,95 @@
+from decimal import Decimal
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from products.models import Product, Category
+from shopping_list.models import ShoppingList
+from reports.models import ProductConsumption, ShoppingExpense
+
+User = get_user_model()
+
+class TrendsApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        product = Product.objects.create(
+            name='Mleko', category=Category.objects.create(name='Nabiał'),
+            expiry_date=date(2024, 3, 1), quantity=1, unit='l', user=self.user
+        )
+        shopping_list = ShoppingList.objects.create(name='Zakupy', user=self.user)
+        for day, amount in [(date(2024, 1, 2), '10.00'), (date(2024, 1, 3), '5.00'), (date(2024, 2, 20), '7.50')]:
+            ShoppingExpense.objects.create(
+                user=self.user, shopping_list=shopping_list, total_amount=Decimal(amount), shopping_date=day
+            )
+        ProductConsumption.objects.create(
+            user=self.user, product=product, quantity=Decimal('2'), unit='l', consumption_date=date(2024, 1, 10)
+        )
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        self.url = reverse('reports:trends_api')
+
+    def test_multiple_series_with_zero_filled_weeks(self):
+        """Kilka serii w jednym żądaniu, puste tygodnie mają zera"""
+        response = self.client.get(self.url, {
+            'series': 'expense,consumption',
+            'granularity': 'week',
+            'start': '2024-01-01',
+            'end': '2024-01-31',
+        })
+        data = response.json()
+        self.assertEqual(data['labels'], ['2024-01-01', '2024-01-08', '2024-01-15', '2024-01-22', '2024-01-29'])
+        self.assertEqual([Decimal(value) for value in data['series']['expense']['values']], [15, 0, 0, 0, 0])
+        self.assertEqual(data['series']['expense']['counts'], [2, 0, 0, 0, 0])
+        self.assertEqual([Decimal(value) for value in data['series']['consumption']['values']], [0, 2, 0, 0, 0])
+        self.assertNotIn('wastage', data['series'])
+
+    def test_month_and_day_granularity(self):
+        response = self.client.get(self.url, {
+            'series': 'expense', 'granularity': 'month', 'start': '2023-12-15', 'end': '2024-03-01',
+        })
+        data = response.json()
+        self.assertEqual(data['labels'], ['2023-12-01', '2024-01-01', '2024-02-01', '2024-03-01'])
+        self.assertEqual([Decimal(value) for value in data['series']['expense']['values']], [0, 15, Decimal('7.5'), 0])
+
+        response = self.client.get(self.url, {'series': 'expense', 'start': '2024-01-01', 'end': '2024-01-03'})
+        self.assertEqual(response.json()['series']['expense']['counts'], [0, 1, 1])
+
+    def test_one_grouped_query_per_series(self):
+        """Każda seria to jedno zapytanie grupujące"""
+        params = {'start': '2024-01-01', 'end': '2024-12-31', 'granularity': 'day'}
+        # sesja + użytkownik + wersja danych (ETag i cache) + trzy serie
+        with self.assertNumQueries(7):
+            self.client.get(self.url, params)
+
+    def test_etag_conditional_response(self):
+        """Niezmienione dane dają 304 bez liczenia trendów"""
+        params = {'series': 'expense', 'start': '2024-01-01', 'end': '2024-01-31'}
+        etag = self.client.get(self.url, params)['ETag']
+        # sesja + użytkownik + wersja danych
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        ShoppingExpense.objects.filter(user=self.user).first().delete()
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'series': 'inne'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'granularity': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2024-02-01', 'end': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2000-01-01', 'end': '2024-01-01'}).status_code, 400)
+
+    def test_default_range_is_last_30_days(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(len(data['labels']), 31)
+        self.assertEqual(data['end'], timezone.localdate().isoformat())
+        self.assertEqual(set(data['series']), {'expense', 'consumption', 'wastage'})
@@ -1,29 +1,37 @@
-from django.shortcuts import render, redirect
+import hashlib
+import re
+from itertools import islice
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import ListView, CreateView, TemplateView
+from django.views.generic import CreateView, TemplateView
 from django.contrib import messages
-from django.db.models import Sum, Count, Avg
-from django.db.models.functions import TruncMonth
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from django.core.serializers.json import DjangoJSONEncoder
 from django.http import JsonResponse
-from .models import ProductConsumption, ShoppingExpense, CategoryExpense, ProductWastage
+from .models import (
+    ProductConsumption, ShoppingExpense, ProductWastage,
+    DailyConsumptionRollup, DailyExpenseRollup, DailyWastageRollup, ReportExport,
+)
 from .forms import ProductConsumptionForm, ShoppingExpenseForm, ProductWastageForm
-from .notifications import generate_report_notifications
-from django.urls import reverse_lazy
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from .export import export_to_csv, export_to_pdf
-import csv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from datetime import datetime
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from .notifications import schedule_report_notifications
+from .cache import cached_for_user, cache_stats, get_data_version
+from .rollups import (
+    rollup_summary, rollup_monthly_trends, rollup_trends, trend_periods,
+    TREND_SERIES, TREND_GRANULARITIES,
+)
+from .services import get_dashboard_stats
+from django.urls import reverse, reverse_lazy
+from django.views.decorators.http import condition, require_POST
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from .export import REPORTS, EXPORT_FORMATS, create_export, export_report as render_export
+from .pdf import ReportPdfError
+from fridge_manager.streaming import stream_for_request
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'reports/dashboard.html'
@@ -31,53 +39,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-
-        # Generuj powiadomienia
-        generate_report_notifications(user)
-
-        # Statystyki zużycia
-        consumption_data = ProductConsumption.objects.filter(
-            user=user,
-            consumption_date__gte=thirty_days_ago
-        )
-        context['consumption_stats'] = {
-            'total_consumptions': consumption_data.count(),
-            'total_quantity': consumption_data.aggregate(total=Sum('quantity'))['total'] or 0
-        }
-        context['top_products'] = consumption_data.values(
-            'product__name'
-        ).annotate(
-            total_quantity=Sum('quantity'),
-            count=Count('id')
-        ).order_by('-total_quantity')[:5]
-
-        # Statystyki wydatków
-        expense_data = ShoppingExpense.objects.filter(
-            user=user,
-            shopping_date__gte=thirty_days_ago
-        )
-        context['expense_stats'] = {
-            'total_expenses': expense_data.count(),
-            'total_amount': expense_data.aggregate(total=Sum('total_amount'))['total'] or 0
-        }
 
-        # Statystyki marnowania
-        wastage_data = ProductWastage.objects.filter(
-            user=user,
-            wastage_date__gte=thirty_days_ago
-        )
-        context['wastage_stats'] = {
-            'total_wastages': wastage_data.count(),
-            'total_quantity': wastage_data.aggregate(total=Sum('quantity'))['total'] or 0
-        }
+        # Powiadomienia raportowe liczone są w tle; odświeżenia dashboardu nie
+        # zapisują zadania częściej niż raz na okno łączenia
+        debounce = settings.REPORT_NOTIFICATIONS_DEBOUNCE_SECONDS
+        if cache.add(f'report-notifications-scheduled:{user.pk}', 1, debounce):
+            schedule_report_notifications(user)
 
-        # Trendy wydatków
-        context['expense_trends'] = expense_data.annotate(
-            month=TruncMonth('shopping_date')
-        ).values('month').annotate(
-            total=Sum('total_amount')
-        ).order_by('month')
+        # Wskaźniki liczone w dwóch zapytaniach (reports/services.py), trzymane w cache
+        stats = cached_for_user(user.pk, f'dashboard:{timezone.localdate()}', lambda: get_dashboard_stats(user))
+        context.update(stats.as_context())
 
         return context
 
@@ -91,7 +62,7 @@ class ProductConsumptionCreateView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         response = super().form_valid(form)
         messages.success(self.request, 'Zużycie produktu zostało dodane.')
-        generate_report_notifications(self.request.user)
+        schedule_report_notifications(self.request.user)
         return response
 
 class ShoppingExpenseCreateView(LoginRequiredMixin, CreateView):
@@ -104,7 +75,7 @@ class ShoppingExpenseCreateView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         response = super().form_valid(form)
         messages.success(self.request, 'Wydatek został dodany.')
-        generate_report_notifications(self.request.user)
+        schedule_report_notifications(self.request.user)
         return response
 
 class ProductWastageCreateView(LoginRequiredMixin, CreateView):
@@ -117,569 +88,352 @@ class ProductWastageCreateView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         response = super().form_valid(form)
         messages.success(self.request, 'Marnowanie produktu zostało dodane.')
-        generate_report_notifications(self.request.user)
+        schedule_report_notifications(self.request.user)
         return response
 
 @login_required
 def expense_report(request):
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
+    month_ago = timezone.localdate() - timedelta(days=30)
 
     expenses = ShoppingExpense.objects.filter(
         user=request.user,
         shopping_date__gte=month_ago
     ).order_by('-shopping_date')
 
-    total_expenses = expenses.aggregate(total=Sum('total_amount'))['total'] or 0
-    avg_expense = expenses.aggregate(avg=Avg('total_amount'))['avg'] or 0
-    total_shopping_trips = expenses.count()
-
-    # Przygotuj dane dla wykresu
-    expense_trends = expenses.annotate(
-        month=TruncMonth('shopping_date')
-    ).values('month').annotate(
-        total=Sum('total_amount')
-    ).order_by('month')
-
-    # Konwertuj daty na format JSON
-    for trend in expense_trends:
-        trend['month'] = trend['month'].strftime('%Y-%m-%d')
+    # Statystyki liczone z dziennych agregatów
+    rollups = DailyExpenseRollup.objects.filter(
+        user=request.user,
+        date__gte=month_ago
+    )
+    summary = cached_for_user(request.user.pk, f'expense-summary:{month_ago}', lambda: rollup_summary(rollups))
+    total_expenses = summary['total']
+    avg_expense = summary['average']
+    total_shopping_trips = summary['entry_count']
+
+    # Przygotuj dane dla wykresu (wspólny wpis cache z API trendów)
+    expense_trends = cached_for_user(
+        request.user.pk, f'expense-trends:{month_ago}', lambda: rollup_monthly_trends(rollups)
+    )
 
     context = {
         'expenses': expenses,
         'total_expenses': total_expenses,
         'avg_expense': avg_expense,
         'total_shopping_trips': total_shopping_trips,
-        'expense_trends': DjangoJSONEncoder().encode(list(expense_trends)),
+        'expense_trends': DjangoJSONEncoder().encode(expense_trends),
     }
     return render(request, 'reports/expense_report.html', context)
 
 @login_required
 def consumption_report(request):
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
+    month_ago = timezone.localdate() - timedelta(days=30)
 
     consumptions = ProductConsumption.objects.filter(
         user=request.user,
         consumption_date__gte=month_ago
     ).order_by('-consumption_date')
 
-    total_consumption = consumptions.aggregate(total=Sum('quantity'))['total'] or 0
-    avg_consumption = consumptions.aggregate(avg=Avg('quantity'))['avg'] or 0
-    total_products = consumptions.values('product').distinct().count()
-
-    # Przygotuj dane dla wykresu
-    consumption_trends = consumptions.annotate(
-        month=TruncMonth('consumption_date')
-    ).values('month').annotate(
-        total=Sum('quantity')
-    ).order_by('month')
+    # Statystyki liczone z dziennych agregatów
+    rollups = DailyConsumptionRollup.objects.filter(
+        user=request.user,
+        date__gte=month_ago
+    )
+    summary = cached_for_user(
+        request.user.pk,
+        f'consumption-summary:{month_ago}',
+        lambda: {**rollup_summary(rollups), 'products': rollups.values('product').distinct().count()}
+    )
+    total_consumption = summary['total']
+    avg_consumption = summary['average']
+    total_products = summary['products']
 
-    # Konwertuj daty na format JSON
-    for trend in consumption_trends:
-        trend['month'] = trend['month'].strftime('%Y-%m-%d')
+    # Przygotuj dane dla wykresu (wspólny wpis cache z API trendów)
+    consumption_trends = cached_for_user(
+        request.user.pk, f'consumption-trends:{month_ago}', lambda: rollup_monthly_trends(rollups)
+    )
 
     context = {
         'consumptions': consumptions,
         'total_consumption': total_consumption,
         'avg_consumption': avg_consumption,
         'total_products': total_products,
-        'consumption_trends': DjangoJSONEncoder().encode(list(consumption_trends)),
+        'consumption_trends': DjangoJSONEncoder().encode(consumption_trends),
     }
     return render(request, 'reports/consumption_report.html', context)
 
 @login_required
 def wastage_report(request):
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
+    month_ago = timezone.localdate() - timedelta(days=30)
 
     wastages = ProductWastage.objects.filter(
         user=request.user,
         wastage_date__gte=month_ago
     ).order_by('-wastage_date')
 
-    total_wastage = wastages.aggregate(total=Sum('quantity'))['total'] or 0
-    avg_wastage = wastages.aggregate(avg=Avg('quantity'))['avg'] or 0
-    total_products = wastages.values('product').distinct().count()
-
-    # Przygotuj dane dla wykresu
-    wastage_trends = wastages.annotate(
-        month=TruncMonth('wastage_date')
-    ).values('month').annotate(
-        total=Sum('quantity')
-    ).order_by('month')
+    # Statystyki liczone z dziennych agregatów
+    rollups = DailyWastageRollup.objects.filter(
+        user=request.user,
+        date__gte=month_ago
+    )
+    summary = cached_for_user(
+        request.user.pk,
+        f'wastage-summary:{month_ago}',
+        lambda: {**rollup_summary(rollups), 'products': rollups.values('product').distinct().count()}
+    )
+    total_wastage = summary['total']
+    avg_wastage = summary['average']
+    total_products = summary['products']
 
-    # Konwertuj daty na format JSON
-    for trend in wastage_trends:
-        trend['month'] = trend['month'].strftime('%Y-%m-%d')
+    # Przygotuj dane dla wykresu (wspólny wpis cache z API trendów)
+    wastage_trends = cached_for_user(
+        request.user.pk, f'wastage-trends:{month_ago}', lambda: rollup_monthly_trends(rollups)
+    )
 
     context = {
         'wastages': wastages,
         'total_wastage': total_wastage,
         'avg_wastage': avg_wastage,
         'total_products': total_products,
-        'wastage_trends': DjangoJSONEncoder().encode(list(wastage_trends)),
+        'wastage_trends': DjangoJSONEncoder().encode(wastage_trends),
     }
     return render(request, 'reports/wastage_report.html', context)
 
-def export_expense_report(request, format):
-    """Eksportuje raport wydatków do CSV lub PDF."""
-    if format not in ['csv', 'pdf']:
-        return HttpResponse('Nieprawidłowy format', status=400)
-    
-    # Pobierz dane
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=30)
-    
-    expenses = ShoppingExpense.objects.filter(
-        user=request.user,
-        shopping_date__range=[start_date, end_date]
-    ).order_by('-shopping_date')
-    
-    total_expenses = expenses.aggregate(total=Sum('total_amount'))['total'] or 0
-    avg_expense = expenses.aggregate(avg=Avg('total_amount'))['avg'] or 0
-    
-    context = {
-        'expenses': expenses,
-        'total_expenses': total_expenses,
-        'avg_expense': avg_expense,
-        'start_date': start_date,
-        'end_date': end_date,
-    }
-    
-    if format == 'csv':
-        response = export_to_csv(
-            expenses,
-            ['shopping_date', 'shopping_list__name', 'total_amount'],
-            ['Data', 'Lista zakupów', 'Kwota']
-        )
-        response['Content-Disposition'] = 'attachment; filename="expense_report.csv"'
-        return response
-    else:
-        html = render_to_string('reports/pdf/expense_report.html', context)
-        response = export_to_pdf(html, 'expense_report.pdf')
-        return response
-
-def export_consumption_report(request, format):
-    """Eksportuje raport zużycia do CSV lub PDF."""
-    if format not in ['csv', 'pdf']:
-        return HttpResponse('Nieprawidłowy format', status=400)
-    
-    # Pobierz dane
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=30)
-    
-    consumptions = ProductConsumption.objects.filter(
-        user=request.user,
-        consumption_date__range=[start_date, end_date]
-    ).order_by('-consumption_date')
-    
-    total_consumption = consumptions.count()
-    avg_consumption = consumptions.aggregate(avg=Avg('quantity'))['avg'] or 0
-    
-    context = {
-        'consumptions': consumptions,
-        'total_consumption': total_consumption,
-        'avg_consumption': avg_consumption,
-        'start_date': start_date,
-        'end_date': end_date,
-    }
-    
-    if format == 'csv':
-        response = export_to_csv(
-            consumptions,
-            ['consumption_date', 'product__name', 'product__category__name', 'quantity', 'unit'],
-            ['Data', 'Produkt', 'Kategoria', 'Ilość', 'Jednostka']
-        )
-        response['Content-Disposition'] = 'attachment; filename="consumption_report.csv"'
-        return response
-    else:
-        html = render_to_string('reports/pdf/consumption_report.html', context)
-        response = export_to_pdf(html, 'consumption_report.pdf')
-        return response
-
-def export_wastage_report(request, format):
-    """Eksportuje raport marnowania do CSV lub PDF."""
-    if format not in ['csv', 'pdf']:
-        return HttpResponse('Nieprawidłowy format', status=400)
-    
-    # Pobierz dane
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=30)
-    
-    wastages = ProductWastage.objects.filter(
-        user=request.user,
-        wastage_date__range=[start_date, end_date]
-    ).order_by('-wastage_date')
-    
-    total_wastage = wastages.count()
-    avg_wastage = wastages.aggregate(avg=Avg('quantity'))['avg'] or 0
-    
-    context = {
-        'wastages': wastages,
-        'total_wastage': total_wastage,
-        'avg_wastage': avg_wastage,
-        'start_date': start_date,
-        'end_date': end_date,
-    }
-    
-    if format == 'csv':
-        response = export_to_csv(
-            wastages,
-            ['wastage_date', 'product__name', 'product__category__name', 'quantity', 'unit', 'reason'],
-            ['Data', 'Produkt', 'Kategoria', 'Ilość', 'Jednostka', 'Powód']
-        )
-        response['Content-Disposition'] = 'attachment; filename="wastage_report.csv"'
-        return response
-    else:
-        html = render_to_string('reports/pdf/wastage_report.html', context)
-        response = export_to_pdf(html, 'wastage_report.pdf')
-        return response
-
 @login_required
 def expense_trends_api(request):
     """API endpoint zwracający dane trendów wydatków."""
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
+    month_ago = timezone.localdate() - timedelta(days=30)
 
-    expenses = ShoppingExpense.objects.filter(
+    rollups = DailyExpenseRollup.objects.filter(
         user=request.user,
-        shopping_date__gte=month_ago
+        date__gte=month_ago
     )
 
-    trends = expenses.annotate(
-        month=TruncMonth('shopping_date')
-    ).values('month').annotate(
-        total=Sum('total_amount')
-    ).order_by('month')
-
-    # Konwertuj daty na format JSON
-    for trend in trends:
-        trend['month'] = trend['month'].strftime('%Y-%m-%d')
-
-    return JsonResponse(list(trends), safe=False)
+    trends = cached_for_user(
+        request.user.pk, f'expense-trends:{month_ago}', lambda: rollup_monthly_trends(rollups)
+    )
+    return JsonResponse(trends, safe=False)
 
 @login_required
 def consumption_trends_api(request):
     """API endpoint zwracający dane trendów zużycia."""
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
+    month_ago = timezone.localdate() - timedelta(days=30)
 
-    consumptions = ProductConsumption.objects.filter(
+    rollups = DailyConsumptionRollup.objects.filter(
         user=request.user,
-        consumption_date__gte=month_ago
+        date__gte=month_ago
     )
 
-    trends = consumptions.annotate(
-        month=TruncMonth('consumption_date')
-    ).values('month').annotate(
-        total=Sum('quantity')
-    ).order_by('month')
-
-    # Konwertuj daty na format JSON
-    for trend in trends:
-        trend['month'] = trend['month'].strftime('%Y-%m-%d')
-
-    return JsonResponse(list(trends), safe=False)
+    trends = cached_for_user(
+        request.user.pk, f'consumption-trends:{month_ago}', lambda: rollup_monthly_trends(rollups)
+    )
+    return JsonResponse(trends, safe=False)
 
 @login_required
 def wastage_trends_api(request):
     """API endpoint zwracający dane trendów marnowania."""
-    now = timezone.now()
-    month_ago = now - timedelta(days=30)
+    month_ago = timezone.localdate() - timedelta(days=30)
 
-    wastages = ProductWastage.objects.filter(
+    rollups = DailyWastageRollup.objects.filter(
         user=request.user,
-        wastage_date__gte=month_ago
+        date__gte=month_ago
     )
 
-    trends = wastages.annotate(
-        month=TruncMonth('wastage_date')
-    ).values('month').annotate(
-        total=Sum('quantity')
-    ).order_by('month')
-
-    # Konwertuj daty na format JSON
-    for trend in trends:
-        trend['month'] = trend['month'].strftime('%Y-%m-%d')
-
-    return JsonResponse(list(trends), safe=False)
-
-@login_required
-def export_expense_csv(request):
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    expenses = ShoppingExpense.objects.filter(
-        user=request.user,
-        shopping_date__gte=thirty_days_ago
-    ).order_by('-shopping_date')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="expenses.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Data', 'Lista zakupów', 'Kwota'])
-    
-    for expense in expenses:
-        writer.writerow([
-            expense.shopping_date,
-            expense.shopping_list.name,
-            expense.total_amount
-        ])
-    
-    return response
+    trends = cached_for_user(
+        request.user.pk, f'wastage-trends:{month_ago}', lambda: rollup_monthly_trends(rollups)
+    )
+    return JsonResponse(trends, safe=False)
+
+# Najwięcej punktów jednej serii w API trendów
+TRENDS_MAX_PERIODS = 1000
+
+def _trends_params(request):
+    """Parametry API trendów albo None, jeśli są nieprawidłowe."""
+    series = [name for name in request.GET.get('series', ','.join(TREND_SERIES)).split(',') if name]
+    granularity = request.GET.get('granularity', 'day')
+    date_range = _requested_date_range(request)
+    if not series or any(name not in TREND_SERIES for name in series):
+        return None
+    if granularity not in TREND_GRANULARITIES or date_range is None:
+        return None
+    return series, granularity, date_range[0], date_range[1]
+
+def _trends_etag(request):
+    """ETag zależy tylko od parametrów i wersji danych - liczony jednym odczytem wersji po kluczu głównym."""
+    params = _trends_params(request)
+    if params is None:
+        return None
+    raw = f'{request.user.pk}:{get_data_version(request.user.pk)}:{params}'
+    return hashlib.sha1(raw.encode()).hexdigest()
 
 @login_required
-def export_expense_pdf(request):
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    expenses = ShoppingExpense.objects.filter(
-        user=request.user,
-        shopping_date__gte=thirty_days_ago
-    ).order_by('-shopping_date')
-    
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="expenses.pdf"'
-    
-    p = canvas.Canvas(response, pagesize=letter)
-    p.setTitle("Raport wydatków")
-    
-    # Nagłówek
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(1*inch, 10*inch, "Raport wydatków")
-    p.setFont("Helvetica", 12)
-    
-    # Data
-    p.drawString(1*inch, 9.5*inch, f"Data: {datetime.now().strftime('%Y-%m-%d')}")
-    
-    # Tabela
-    y = 9*inch
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(1*inch, y, "Data")
-    p.drawString(3*inch, y, "Lista zakupów")
-    p.drawString(6*inch, y, "Kwota")
-    
-    p.setFont("Helvetica", 10)
-    y -= 0.5*inch
-    
-    for expense in expenses:
-        p.drawString(1*inch, y, str(expense.shopping_date))
-        p.drawString(3*inch, y, expense.shopping_list.name)
-        p.drawString(6*inch, y, f"{expense.total_amount} zł")
-        y -= 0.3*inch
-        
-        if y < 1*inch:
-            p.showPage()
-            y = 9*inch
-    
-    p.showPage()
-    p.save()
-    
-    return response
+@condition(etag_func=_trends_etag)
+def trends_api(request):
+    """
+    Trendy wydatków, zużycia i marnowania w jednym żądaniu.
+    Parametry: series=expense,consumption,wastage; granularity=day|week|month;
+    start i end w formacie RRRR-MM-DD (domyślnie ostatnie 30 dni).
+    """
+    params = _trends_params(request)
+    if params is None:
+        return HttpResponse('Nieprawidłowe parametry', status=400)
+    series, granularity, start_date, end_date = params
+    periods = list(islice(trend_periods(start_date, end_date, granularity), TRENDS_MAX_PERIODS + 1))
+    if len(periods) > TRENDS_MAX_PERIODS:
+        return HttpResponse('Zbyt wiele punktów - wybierz większą jednostkę lub krótszy zakres', status=400)
+
+    def compute():
+        return {
+            name: rollup_trends(
+                TREND_SERIES[name].objects.filter(user=request.user),
+                granularity, start_date, end_date, periods
+            )
+            for name in series
+        }
 
-@login_required
-def export_consumption_csv(request):
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    consumptions = ProductConsumption.objects.filter(
-        user=request.user,
-        consumption_date__gte=thirty_days_ago
-    ).order_by('-consumption_date')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="consumption.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Data', 'Produkt', 'Ilość', 'Jednostka'])
-    
-    for consumption in consumptions:
-        writer.writerow([
-            consumption.consumption_date,
-            consumption.product.name,
-            consumption.quantity,
-            consumption.unit
-        ])
-    
-    return response
+    data = cached_for_user(
+        request.user.pk,
+        f'trends:{",".join(series)}:{granularity}:{start_date}:{end_date}',
+        compute
+    )
+    return JsonResponse({
+        'granularity': granularity,
+        'start': start_date,
+        'end': end_date,
+        'labels': [period.isoformat() for period in periods],
+        'series': data,
+    })
+
+@staff_member_required
+def cache_stats_api(request):
+    """Liczniki trafień i chybień cache raportów."""
+    return JsonResponse(cache_stats())
+
+def _requested_date_range(request):
+    """
+    Zakres dat z parametrów ?start=RRRR-MM-DD&end=RRRR-MM-DD,
+    domyślnie ostatnie 30 dni. Zwraca None dla błędnego zakresu.
+    """
+    end_date = timezone.localdate()
+    start_date = end_date - timedelta(days=30)
+    try:
+        if request.GET.get('start'):
+            start_date = parse_date(request.GET['start'])
+        if request.GET.get('end'):
+            end_date = parse_date(request.GET['end'])
+    except ValueError:
+        return None
+    if start_date is None or end_date is None or start_date > end_date:
+        return None
+    return start_date, end_date
 
 @login_required
-def export_consumption_pdf(request):
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    consumptions = ProductConsumption.objects.filter(
-        user=request.user,
-        consumption_date__gte=thirty_days_ago
-    ).order_by('-consumption_date')
-    
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="consumption.pdf"'
-    
-    p = canvas.Canvas(response, pagesize=letter)
-    p.setTitle("Raport zużycia")
-    
-    # Nagłówek
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(1*inch, 10*inch, "Raport zużycia produktów")
-    p.setFont("Helvetica", 12)
-    
-    # Data
-    p.drawString(1*inch, 9.5*inch, f"Data: {datetime.now().strftime('%Y-%m-%d')}")
-    
-    # Tabela
-    y = 9*inch
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(1*inch, y, "Data")
-    p.drawString(3*inch, y, "Produkt")
-    p.drawString(6*inch, y, "Ilość")
-    p.drawString(7.5*inch, y, "Jednostka")
-    
-    p.setFont("Helvetica", 10)
-    y -= 0.5*inch
-    
-    for consumption in consumptions:
-        p.drawString(1*inch, y, str(consumption.consumption_date))
-        p.drawString(3*inch, y, consumption.product.name)
-        p.drawString(6*inch, y, str(consumption.quantity))
-        p.drawString(7.5*inch, y, consumption.unit)
-        y -= 0.3*inch
-        
-        if y < 1*inch:
-            p.showPage()
-            y = 9*inch
-    
-    p.showPage()
-    p.save()
-    
-    return response
+def export_report(request, report, format):
+    """Eksportuje raport (expense, consumption, wastage) w wybranym formacie."""
+    if report not in REPORTS:
+        raise Http404('Nieznany raport')
+    if format not in EXPORT_FORMATS:
+        return HttpResponse('Nieprawidłowy format', status=400)
+    date_range = _requested_date_range(request)
+    if date_range is None:
+        return HttpResponse('Nieprawidłowy zakres dat', status=400)
+
+    try:
+        response = render_export(REPORTS[report], EXPORT_FORMATS[format], request.user, *date_range)
+    except ReportPdfError as e:
+        return HttpResponse(f'{e} - zleć eksport w tle', status=503)
+    return stream_for_request(request, response)
+
+def _export_status(export):
+    data = {
+        'id': export.pk,
+        'report': export.report,
+        'format': export.format,
+        'status': export.status,
+        'created_at': export.created_at,
+        'finished_at': export.finished_at,
+        'expires_at': export.expires_at,
+        'size': export.size,
+        'error': export.error,
+        'status_url': reverse('reports:export_status', args=[export.pk]),
+        'download_url': None,
+    }
+    if export.status == ReportExport.DONE and not export.is_expired:
+        data['download_url'] = reverse('reports:export_download', args=[export.pk])
+    return data
 
 @login_required
-def export_wastage_csv(request):
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    wastages = ProductWastage.objects.filter(
-        user=request.user,
-        wastage_date__gte=thirty_days_ago
-    ).order_by('-wastage_date')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="wastage.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Data', 'Produkt', 'Ilość', 'Jednostka', 'Powód'])
-    
-    for wastage in wastages:
-        writer.writerow([
-            wastage.wastage_date,
-            wastage.product.name,
-            wastage.quantity,
-            wastage.unit,
-            wastage.reason
-        ])
-    
-    return response
+@require_POST
+def export_report_async(request, report, format):
+    """Zleca eksport w tle i od razu zwraca jego identyfikator i adres statusu."""
+    if report not in REPORTS:
+        raise Http404('Nieznany raport')
+    if format not in EXPORT_FORMATS:
+        return HttpResponse('Nieprawidłowy format', status=400)
+    date_range = _requested_date_range(request)
+    if date_range is None:
+        return HttpResponse('Nieprawidłowy zakres dat', status=400)
 
-@login_required
-def export_wastage_pdf(request):
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    wastages = ProductWastage.objects.filter(
-        user=request.user,
-        wastage_date__gte=thirty_days_ago
-    ).order_by('-wastage_date')
-    
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="wastage.pdf"'
-    
-    p = canvas.Canvas(response, pagesize=letter)
-    p.setTitle("Raport marnowania")
-    
-    # Nagłówek
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(1*inch, 10*inch, "Raport marnowania produktów")
-    p.setFont("Helvetica", 12)
-    
-    # Data
-    p.drawString(1*inch, 9.5*inch, f"Data: {datetime.now().strftime('%Y-%m-%d')}")
-    
-    # Tabela
-    y = 9*inch
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(1*inch, y, "Data")
-    p.drawString(2.5*inch, y, "Produkt")
-    p.drawString(5*inch, y, "Ilość")
-    p.drawString(6.5*inch, y, "Jednostka")
-    p.drawString(8*inch, y, "Powód")
-    
-    p.setFont("Helvetica", 10)
-    y -= 0.5*inch
-    
-    for wastage in wastages:
-        p.drawString(1*inch, y, str(wastage.wastage_date))
-        p.drawString(2.5*inch, y, wastage.product.name)
-        p.drawString(5*inch, y, str(wastage.quantity))
-        p.drawString(6.5*inch, y, wastage.unit)
-        p.drawString(8*inch, y, wastage.reason)
-        y -= 0.3*inch
-        
-        if y < 1*inch:
-            p.showPage()
-            y = 9*inch
-    
-    p.showPage()
-    p.save()
-    
-    return response
+    export = create_export(request.user, report, format, *date_range)
+    return JsonResponse(_export_status(export), status=202)
 
 @login_required
-def export_expenses_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="wydatki.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Data', 'Produkt', 'Kwota', 'Status'])
-    
-    expenses = ShoppingExpense.objects.filter(user=request.user).order_by('-shopping_date')
-    for expense in expenses:
-        writer.writerow([
-            expense.shopping_date.strftime('%d.%m.%Y'),
-            expense.product.name,
-            f"{expense.amount:.2f}",
-            expense.get_status_display()
-        ])
-    
-    return response
+def export_status(request, pk):
+    """Status eksportu zleconego w tle."""
+    export = get_object_or_404(ReportExport, pk=pk, user=request.user)
+    return JsonResponse(_export_status(export))
+
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+def _iter_file_range(file, length, chunk_size=64 * 1024):
+    try:
+        while length > 0:
+            data = file.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
 
 @login_required
-def export_expenses_pdf(request):
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="wydatki.pdf"'
-    
-    doc = SimpleDocTemplate(response, pagesize=letter)
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title = Paragraph("Raport wydatków", styles['Heading1'])
-    elements.append(title)
-    
-    data = [['Data', 'Produkt', 'Kwota', 'Status']]
-    expenses = ShoppingExpense.objects.filter(user=request.user).order_by('-shopping_date')
-    for expense in expenses:
-        data.append([
-            expense.shopping_date.strftime('%d.%m.%Y'),
-            expense.product.name,
-            f"{expense.amount:.2f} zł",
-            expense.get_status_display()
-        ])
-    
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(table)
-    
-    doc.build(elements)
-    return response
+def export_download(request, pk):
+    """
+    Pobranie gotowego eksportu (.gz). Obsługuje nagłówek Range z jednym
+    zakresem bajtów, więc przerwane pobieranie można wznowić.
+    """
+    export = get_object_or_404(ReportExport, pk=pk, user=request.user)
+    if export.status != ReportExport.DONE:
+        return HttpResponse('Eksport nie jest jeszcze gotowy', status=409)
+    if export.is_expired or not export.file:
+        return HttpResponse('Eksport wygasł', status=410)
+
+    size = export.size
+    start, end, status = 0, size - 1, 200
+    match = RANGE_RE.fullmatch(request.headers.get('Range', '').strip())
+    if match and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # bytes=-N: ostatnie N bajtów
+            start = max(size - int(last), 0) if int(last) else size
+        if start > end or start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        status = 206
+
+    file = export.file.open('rb')
+    file.seek(start)
+    response = StreamingHttpResponse(
+        _iter_file_range(file, end - start + 1),
+        status=status,
+        content_type='application/gzip'
+    )
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{export.download_name}"'
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return stream_for_request(request, response)
@@ -4,14 +4,17 @@ from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
+from fridge_manager.pagination import CursorPaginationMixin
 from django.http import JsonResponse
 from .models import ShoppingList, ShoppingListItem
 from .forms import ShoppingListForm, ShoppingListItemForm
 
-class ShoppingListView(LoginRequiredMixin, ListView):
+class ShoppingListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = ShoppingList
     template_name = 'shopping_list/shopping_list.html'
     context_object_name = 'shopping_lists'
+    paginate_by = 12
+    cursor_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         return ShoppingList.objects.filter(user=self.request.user, is_active=True)